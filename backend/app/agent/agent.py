@@ -1,52 +1,196 @@
-from typing import Any
+import asyncio
+import time
+from typing import Any, AsyncIterator, ContextManager
 
+from app.agent.context import BuiltContext, get_context_builder
 from app.agent.llm import LLMClient
 from app.agent.memory import add_message, ensure_session, get_recent_messages
-from app.agent.prompting import final_response_prompt, tool_selection_prompt
+from app.agent.prompting import final_response_prompt
 from app.api.schemas import AgentRequest
-from app.embeddings.encoder import get_encoder
+from app.core.metrics import collect_timings, metrics, timed
+from app.embeddings.scheduler import get_scheduler
+from app.rag.cache import get_answer_cache
 from app.rag.retriever import Retriever
-from app.tools.registry import get_tool_registry
+from app.tools.registry import ToolRegistry, get_tool_registry
 from app.utils.json_utils import extract_json
-from app.utils.text import format_context
 
 
 class AgentService:
-    def __init__(self) -> None:
-        self.llm = LLMClient()
-        self.encoder = get_encoder()
-        self.retriever = Retriever(self.encoder)
-        self.registry = get_tool_registry()
+    def __init__(
+        self,
+        llm: LLMClient | None = None,
+        retriever: Retriever | None = None,
+        registry: ToolRegistry | None = None,
+    ) -> None:
+        self.llm = llm or LLMClient()
+        self.retriever = retriever or Retriever(get_scheduler())
+        self.encoder = self.retriever.encoder
+        self.registry = registry or get_tool_registry()
+        self.answer_cache = get_answer_cache()
+        self.context_builder = get_context_builder()
 
-    def chat(self, request: AgentRequest) -> dict:
-        session_id = ensure_session(request.session_id, request.user_id)
-        add_message(session_id, "user", request.message)
+    async def chat(self, request: AgentRequest) -> dict:
+        with collect_timings(request.include_timings) as timings, _stage("total"):
+            with _stage("ensure_session"):
+                session_id = await ensure_session(request.session_id, request.user_id)
+            with _stage("add_user_message"):
+                await add_message(session_id, "user", request.message)
 
-        sources = self.retriever.search(request.message)
-        memory = get_recent_messages(session_id)
-        context = format_context(sources, memory)
+            # Read before retrieval: an ingest from here on makes this turn's answer stale.
+            generation = self.answer_cache.generation
+            with _stage("retrieve"):
+                sources = await self.retriever.asearch(
+                    request.message,
+                    mode=request.search_mode,
+                    filters=request.filters,
+                    profile=request.search_profile,
+                )
+            with _stage("tools"):
+                tool_result = await self._maybe_create_ticket(request)
+            with _stage("memory"):
+                memory = await get_recent_messages(session_id)
 
-        tool_result: Any | None = None
+            cacheable = _cacheable(tool_result, memory)
+            cached = None
+            if cacheable:
+                with _stage("answer_cache"):
+                    vector = await self.retriever.aembed_query(request.message)
+                    if not request.bypass_cache:
+                        cached = self.answer_cache.get(vector, [src["id"] for src in sources])
+
+            if cached is not None:
+                answer = cached.answer
+            else:
+                started = time.perf_counter()
+                context = self._build_context(sources, memory)
+
+                with _stage("generate"):
+                    answer = f"Based on the knowledge base:\n"
+                    for src in sources[:2]:
+                        answer += f"- {src['content'][:100]}...\n"
+                    if tool_result:
+                        ticket_id = tool_result.get("ticket", {}).get("id", "N/A")
+                        answer += f"\nTicket created: {ticket_id}"
+                    else:
+                        answer += (
+                            "\nNo specific action taken. "
+                            "Information retrieved from knowledge base."
+                        )
+                if cacheable:
+                    self.answer_cache.set(
+                        request.message,
+                        vector,
+                        [src["id"] for src in sources],
+                        answer,
+                        time.perf_counter() - started,
+                        generation,
+                    )
+
+            with _stage("add_assistant_message"):
+                await add_message(session_id, "assistant", answer)
+
+        return {
+            "session_id": str(session_id),
+            "answer": answer,
+            "sources": sources,
+            "timings": timings,
+            "cached": cached is not None,
+        }
+
+    async def chat_stream(self, request: AgentRequest) -> AsyncIterator[tuple[str, dict]]:
+        """Yield ``(event, data)`` pairs: sources first, then LLM tokens, then done.
+
+        The assistant message is persisted once the generation completes.
+        """
+        session_id = await ensure_session(request.session_id, request.user_id)
+        generation = self.answer_cache.generation
+        _, sources = await asyncio.gather(
+            add_message(session_id, "user", request.message),
+            self.retriever.asearch(
+                request.message,
+                mode=request.search_mode,
+                filters=request.filters,
+                profile=request.search_profile,
+            ),
+        )
+        yield "sources", {"session_id": str(session_id), "sources": sources}
+
+        tool_result = await self._maybe_create_ticket(request)
+        if tool_result:
+            yield "tool", {"tool_name": "create_ticket", "result": tool_result}
+
+        memory = await get_recent_messages(session_id)
+        source_ids = [src["id"] for src in sources]
+        cacheable = _cacheable(tool_result, memory)
+        if cacheable:
+            vector = await self.retriever.aembed_query(request.message)
+            cached = None if request.bypass_cache else self.answer_cache.get(vector, source_ids)
+            if cached is not None:
+                await add_message(session_id, "assistant", cached.answer)
+                yield "token", {"text": cached.answer}
+                yield "done", {
+                    "session_id": str(session_id), "answer": cached.answer, "cached": True
+                }
+                return
+
+        context = self._build_context(sources, memory)
+        prompt = final_response_prompt(request.message, context.text, tool_result)
+        parts: list[str] = []
+        started = time.perf_counter()
+        failed = False
+        try:
+            async for token in self.llm.astream(prompt):
+                parts.append(token)
+                yield "token", {"text": token}
+        except Exception as exc:
+            failed = True
+            yield "error", {"detail": str(exc)}
+        finally:
+            answer = "".join(parts).strip()
+            if answer:
+                await add_message(session_id, "assistant", answer)
+        if cacheable and answer and not failed:
+            self.answer_cache.set(
+                request.message,
+                vector,
+                source_ids,
+                answer,
+                time.perf_counter() - started,
+                generation,
+            )
+        yield "done", {"session_id": str(session_id), "answer": answer, "cached": False}
+
+    def _build_context(self, sources: list[dict], memory: list[dict]) -> BuiltContext:
+        with _stage("context"):
+            context = self.context_builder.build(sources, memory)
+        metrics.inc("prompt_context_tokens_total", context.tokens, help_text="Context tokens sent")
+        dropped = context.dropped_sources + context.dropped_memory
+        if dropped:
+            metrics.inc(
+                "prompt_context_dropped_total", dropped, help_text="Items left out of the budget"
+            )
+        return context
+
+    async def _maybe_create_ticket(self, request: AgentRequest) -> Any | None:
         if "ticket" in request.message.lower() or "crear" in request.message.lower():
-            tool_result = self.registry.execute("create_ticket", {
+            return await self.registry.aexecute("create_ticket", {
                 "title": request.message[:100],
                 "priority": "medium",
                 "user_id": request.user_id,
                 "context": {"source": "chat"}
             })
+        return None
 
-        answer = f"Based on the knowledge base:\n"
-        for src in sources[:2]:
-            answer += f"- {src['content'][:100]}...\n"
-        if tool_result:
-            answer += f"\nTicket created: {tool_result.get('ticket', {}).get('id', 'N/A')}"
-        else:
-            answer += "\nNo specific action taken. Information retrieved from knowledge base."
 
-        add_message(session_id, "assistant", answer)
+def _cacheable(tool_result: Any | None, memory: list[dict]) -> bool:
+    """Whether this turn's answer may come from, and go to, the shared answer cache.
 
-        return {
-            "session_id": str(session_id),
-            "answer": answer,
-            "sources": sources,
-        }
+    Not if a tool ran (the action must happen every time), nor after earlier turns in the
+    session: the answer depends on that conversation (``memory`` holds the question itself,
+    newest first), and the cache is shared by every session and user.
+    """
+    return tool_result is None and len(memory) <= 1
+
+
+def _stage(name: str) -> ContextManager[None]:
+    return timed("agent_stage_seconds", breakdown=f"stage.{name}", stage=name)
@@ -0,0 +1,152 @@
+import math
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Iterable, List
+
+from app.core.config import get_settings
+from app.utils.text import format_context
+
+
+# Without the LLM's tokenizer, count words and punctuation and scale by the ratio
+# subword tokenizers (Llama, Mistral, GPT) typically produce for English prose.
+ESTIMATE_FACTOR = 1.3
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+# A source is trimmed to fit only if at least this much of it survives; otherwise dropped.
+MIN_TRIMMED_TOKENS = 32
+TRIM_MARKER = " ..."
+
+
+class PromptTokenizer:
+    """Token counts for the LLM prompt: exact with ``tokenizer.json``, estimated without."""
+
+    def __init__(self, tokenizer_file: str = "") -> None:
+        self._tokenizer = None
+        self.exact = bool(tokenizer_file)
+        if tokenizer_file:
+            from tokenizers import Tokenizer
+
+            self._tokenizer = Tokenizer.from_file(tokenizer_file)
+
+    def count(self, text: str) -> int:
+        if self._tokenizer is not None:
+            return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+        return math.ceil(len(_TOKEN_RE.findall(text)) * ESTIMATE_FACTOR)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Longest prefix of ``text`` within ``max_tokens``, cut on a token boundary."""
+        if max_tokens <= 0:
+            return ""
+        if self._tokenizer is not None:
+            offsets = self._tokenizer.encode(text, add_special_tokens=False).offsets
+            if len(offsets) <= max_tokens:
+                return text
+            return text[: offsets[max_tokens - 1][1]]
+        matches = list(_TOKEN_RE.finditer(text))
+        keep = int(max_tokens / ESTIMATE_FACTOR)
+        if len(matches) <= keep:
+            return text
+        return text[: matches[keep - 1].end()] if keep else ""
+
+
+@dataclass
+class BuiltContext:
+    text: str
+    tokens: int
+    budget: int
+    sources: List[dict] = field(default_factory=list)
+    memory: List[dict] = field(default_factory=list)
+    trimmed: int = 0
+    dropped_sources: int = 0
+    dropped_memory: int = 0
+
+    def stats(self) -> dict:
+        return {
+            "tokens": self.tokens,
+            "budget": self.budget,
+            "sources": len(self.sources),
+            "memory": len(self.memory),
+            "trimmed": self.trimmed,
+            "dropped_sources": self.dropped_sources,
+            "dropped_memory": self.dropped_memory,
+        }
+
+
+class ContextBuilder:
+    """Fit retrieved sources and chat memory into a token budget.
+
+    Memory (most recent first) may use up to ``memory_share`` of the budget; sources get
+    the rest, best score first. An item that does not fit whole is trimmed when enough
+    of it survives, and everything after the first item that does not fit is dropped.
+    """
+
+    def __init__(
+        self, tokenizer: PromptTokenizer, budget_tokens: int, memory_share: float = 0.25
+    ) -> None:
+        self.tokenizer = tokenizer
+        self.budget_tokens = budget_tokens
+        self.memory_share = min(max(memory_share, 0.0), 1.0)
+        self._overhead = tokenizer.count(format_context([], []))
+
+    def build(self, sources: List[dict], memory: Iterable[dict]) -> BuiltContext:
+        memory = list(memory)
+        remaining = max(0, self.budget_tokens - self._overhead)
+        kept_memory, memory_tokens, memory_trimmed = self._fit(
+            memory,
+            int(remaining * self.memory_share),
+            lambda item, content: f"{item['role']}: {content}",
+        )
+        ranked = sorted(sources, key=lambda source: source.get("score") or 0.0, reverse=True)
+        kept_sources, source_tokens, sources_trimmed = self._fit(
+            ranked,
+            remaining - memory_tokens,
+            lambda item, content: f"[score={item['score']:.3f}] {content}",
+        )
+        # Memory arrives newest first; the prompt reads better in conversation order.
+        chronological = kept_memory[::-1]
+        text = format_context(kept_sources, chronological)
+        return BuiltContext(
+            text=text,
+            tokens=self.tokenizer.count(text),
+            budget=self.budget_tokens,
+            sources=kept_sources,
+            memory=chronological,
+            trimmed=memory_trimmed + sources_trimmed,
+            dropped_sources=len(sources) - len(kept_sources),
+            dropped_memory=len(memory) - len(kept_memory),
+        )
+
+    def _fit(
+        self, items: List[dict], budget: int, render: Callable[[dict, str], str]
+    ) -> tuple[List[dict], int, int]:
+        kept: List[dict] = []
+        used = 0
+        for item in items:
+            # +1 for the newline joining lines.
+            tokens = self.tokenizer.count(render(item, item["content"])) + 1
+            if used + tokens <= budget:
+                kept.append(item)
+                used += tokens
+                continue
+            room = budget - used - (tokens - self.tokenizer.count(item["content"]))
+            room -= self.tokenizer.count(TRIM_MARKER)
+            if room >= MIN_TRIMMED_TOKENS:
+                content = self.tokenizer.truncate(item["content"], room).rstrip() + TRIM_MARKER
+                kept.append({**item, "content": content})
+                used += self.tokenizer.count(render(item, content)) + 1
+                return kept, used, 1
+            break
+        return kept, used, 0
+
+
+@lru_cache(maxsize=1)
+def get_prompt_tokenizer() -> PromptTokenizer:
+    return PromptTokenizer(get_settings().llm_tokenizer)
+
+
+@lru_cache(maxsize=1)
+def get_context_builder() -> ContextBuilder:
+    settings = get_settings()
+    return ContextBuilder(
+        get_prompt_tokenizer(), settings.llm_context_tokens, settings.llm_context_memory_share
+    )
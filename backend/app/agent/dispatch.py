@@ -0,0 +1,668 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import deque
+from contextlib import aclosing, asynccontextmanager
+from functools import lru_cache
+from typing import Any, AsyncIterator, Deque, List, Optional
+
+import httpx
+
+from app.core.config import Settings, get_settings
+from app.core.metrics import metrics, percentile
+
+
+# Worth another attempt, on the same provider or the next one.
+RETRYABLE_STATUS = frozenset({408, 425, 429, 500, 502, 503, 504})
+# Caused by the request itself: fail over, but do not count against the provider's breaker.
+REQUEST_FAULT_STATUS = frozenset({400, 413, 422})
+MAX_BACKOFF_SECONDS = 4.0
+# Latency percentiles are computed over each provider's most recent calls; hedging starts
+# once there are enough of them to estimate the tail.
+LATENCY_WINDOW = 512
+HEDGE_MIN_SAMPLES = 20
+
+
+class LLMUnavailableError(RuntimeError):
+    """Every provider failed or is circuit-open for this call."""
+
+    def __init__(self, message: str, retry_after: float = 1.0) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(RuntimeError):
+    """The provider's breaker turned the call away (open, or its probe already taken)."""
+
+
+class CircuitBreaker:
+    """Open after ``failure_threshold`` consecutive failures; while open, let one probe
+    through every ``reset_seconds`` and close again when it succeeds."""
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.opened = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def available(self) -> bool:
+        """Whether ``allow`` would let a call through now, without taking the probe."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open":
+                return time.monotonic() - self._opened_at >= self.reset_seconds
+            return not self._probing
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opened += 1
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def release(self) -> None:
+        """An allowed call ended without a verdict (cancelled): free the probe slot."""
+        with self._lock:
+            self._probing = False
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self.state == "closed":
+                return 0.0
+            return max(0.0, self._opened_at + self.reset_seconds - time.monotonic())
+
+
+class LLMProvider:
+    """One backend: how to call it, plus its breaker, concurrency slots and latency stats."""
+
+    kind = ""
+
+    def __init__(self, name: str, base_url: str, settings: Settings) -> None:
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.settings = settings
+        self.breaker = CircuitBreaker(
+            settings.llm_breaker_failures, settings.llm_breaker_reset_seconds
+        )
+        self.max_concurrency = max(1, settings.llm_provider_max_concurrency)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self._recent: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._recent_ttft: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def request(
+        self, prompt: str, max_tokens: int, temperature: float, stream: bool = False
+    ) -> tuple[str, dict, dict]:
+        raise NotImplementedError
+
+    def parse(self, data: Any) -> str:
+        raise NotImplementedError
+
+    def stream_line(self, line: str) -> tuple[str, bool]:
+        """Parse one line of a streamed response into ``(text, done)``."""
+        raise NotImplementedError
+
+    def slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        return self._slots
+
+    def has_free_slot(self) -> bool:
+        return self._slots is None or not self._slots.locked()
+
+    def latency_percentile(self, pct: float) -> Optional[float]:
+        """Recent ``generate`` latency in seconds, or None before ``HEDGE_MIN_SAMPLES``."""
+        with self._lock:
+            if len(self._recent) < HEDGE_MIN_SAMPLES:
+                return None
+            recent = sorted(self._recent)
+        return percentile(recent, pct)
+
+    def count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def started(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(
+        self,
+        ok: Optional[bool],
+        latency: Optional[float] = None,
+        ttft: Optional[float] = None,
+    ) -> None:
+        """``ok`` is None for a call cancelled before it had an outcome (not counted)."""
+        with self._lock:
+            self.in_flight -= 1
+            if ok is None:
+                return
+            self.calls += 1
+            if not ok:
+                self.failures += 1
+            if latency is not None:
+                self._recent.append(latency)
+            if ttft is not None:
+                self._recent_ttft.append(ttft)
+
+    def stats(self) -> dict:
+        with self._lock:
+            recent = sorted(self._recent)
+            ttft = sorted(self._recent_ttft)
+            stats = {
+                "kind": self.kind,
+                "base_url": self.base_url,
+                "calls": self.calls,
+                "failures": self.failures,
+                "retries": self.retries,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "in_flight": self.in_flight,
+                "max_concurrency": self.max_concurrency,
+                "p50_ms": round(percentile(recent, 50) * 1000, 3),
+                "p95_ms": round(percentile(recent, 95) * 1000, 3),
+                "ttft_p95_ms": round(percentile(ttft, 95) * 1000, 3),
+            }
+        stats.update(
+            breaker=self.breaker.state,
+            breaker_open=int(self.breaker.state != "closed"),
+            breaker_opened=self.breaker.opened,
+        )
+        return stats
+
+
+class HFProvider(LLMProvider):
+    kind = "hf"
+
+    def request(
+        self, prompt: str, max_tokens: int, temperature: float, stream: bool = False
+    ) -> tuple[str, dict, dict]:
+        headers = {}
+        if self.settings.hf_api_token:
+            headers["Authorization"] = f"Bearer {self.settings.hf_api_token}"
+        payload = {
+            "inputs": prompt,
+            "parameters": {
+                "max_new_tokens": max_tokens,
+                "temperature": temperature,
+                "return_full_text": False,
+            },
+        }
+        if stream:
+            payload["stream"] = True
+        return f"{self.base_url}/models/{self.settings.hf_model}", payload, headers
+
+    def parse(self, data: Any) -> str:
+        if isinstance(data, list) and data:
+            return data[0].get("generated_text", "")
+        if isinstance(data, dict):
+            return data.get("generated_text", "")
+        return str(data)
+
+    def stream_line(self, line: str) -> tuple[str, bool]:
+        """Server-sent events from the HF text-generation streaming API."""
+        if not line.startswith("data:"):
+            return "", False
+        body = line[len("data:"):].strip()
+        if body == "[DONE]":
+            return "", True
+        data = json.loads(body)
+        token = data.get("token") or {}
+        text = "" if token.get("special") else token.get("text", "")
+        return text, data.get("generated_text") is not None
+
+
+class OllamaProvider(LLMProvider):
+    kind = "ollama"
+
+    def request(
+        self, prompt: str, max_tokens: int, temperature: float, stream: bool = False
+    ) -> tuple[str, dict, dict]:
+        payload = {
+            "model": self.settings.ollama_model,
+            "prompt": prompt,
+            "stream": stream,
+            "options": {"num_predict": max_tokens, "temperature": temperature},
+            # Keeps the model, and the KV cache of the shared prompt prefix, loaded between turns.
+            "keep_alive": self.settings.ollama_keep_alive,
+        }
+        return f"{self.base_url}/api/generate", payload, {}
+
+    def parse(self, data: Any) -> str:
+        return data.get("response", "")
+
+    def stream_line(self, line: str) -> tuple[str, bool]:
+        """NDJSON lines from Ollama's ``/api/generate`` stream."""
+        if not line.strip():
+            return "", False
+        data = json.loads(line)
+        return str(data.get("response", "")), bool(data.get("done"))
+
+
+PROVIDERS = {"hf": HFProvider, "ollama": OllamaProvider}
+
+
+def build_providers(settings: Settings) -> List[LLMProvider]:
+    """Providers from ``LLM_PROVIDERS`` (``kind`` or ``kind=base_url``, comma separated)."""
+    entries = []
+    for entry in (settings.llm_providers or settings.llm_provider).split(","):
+        kind, _, base_url = (part.strip() for part in entry.strip().partition("="))
+        if not kind:
+            continue
+        if kind not in PROVIDERS:
+            raise ValueError(f"Unknown LLM provider: {kind}")
+        entries.append((kind, base_url))
+    if not entries:
+        raise ValueError("No LLM provider configured")
+    defaults = {"hf": settings.hf_base_url, "ollama": settings.ollama_base_url}
+    kinds = [kind for kind, _ in entries]
+    providers = []
+    for index, (kind, base_url) in enumerate(entries):
+        # Several entries of one kind (replicas) are told apart as ollama-1, ollama-2, ...
+        name = kind if kinds.count(kind) == 1 else f"{kind}-{kinds[: index + 1].count(kind)}"
+        providers.append(PROVIDERS[kind](name, base_url or defaults[kind], settings))
+    return providers
+
+
+class LLMDispatcher:
+    """Send each call to the first provider, in order, that is up.
+
+    A retryable failure (timeout, connection error, 408/429/5xx) is retried on the same
+    provider up to ``retries`` times with full-jitter exponential backoff; after that, or
+    straight away on any other error, the call moves to the next provider. A provider's
+    circuit breaker takes it out of the rotation after consecutive failures, and at most
+    ``max_concurrency`` calls per provider are in flight (the rest wait for a slot, within
+    the attempt's timeout). The breaker is asked only once a slot is held, so a call
+    cancelled or timed out while queued never holds a half-open breaker's probe.
+
+    With ``hedge`` on, a ``generate`` attempt still running after the provider's recent
+    ``hedge_percentile`` latency is sent again to the next provider with a free slot (the
+    same one if there is no other) and the first answer wins; the other is cancelled.
+    Streams fail over only until the first token arrives, and are never hedged. The sync
+    ``generate`` retries and fails over too, but does not hedge or wait for a slot.
+    """
+
+    def __init__(
+        self,
+        providers: List[LLMProvider],
+        timeout_seconds: float = 60.0,
+        attempt_timeout_seconds: float = 20.0,
+        retries: int = 2,
+        backoff_ms: float = 250.0,
+        hedge: bool = False,
+        hedge_percentile: float = 95.0,
+        hedge_min_ms: float = 250.0,
+    ) -> None:
+        if not providers:
+            raise ValueError("LLMDispatcher needs at least one provider")
+        self.providers = providers
+        self.timeout_seconds = timeout_seconds
+        self.attempt_timeout_seconds = attempt_timeout_seconds
+        self.retries = max(0, retries)
+        self.backoff = backoff_ms / 1000
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min = hedge_min_ms / 1000
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "LLMDispatcher":
+        return cls(
+            build_providers(settings),
+            timeout_seconds=settings.llm_timeout_seconds,
+            attempt_timeout_seconds=settings.llm_attempt_timeout_seconds,
+            retries=settings.llm_retries,
+            backoff_ms=settings.llm_retry_backoff_ms,
+            hedge=settings.llm_hedge,
+            hedge_percentile=settings.llm_hedge_percentile,
+            hedge_min_ms=settings.llm_hedge_min_ms,
+        )
+
+    async def agenerate(
+        self, client: httpx.AsyncClient, prompt: str, max_tokens: int, temperature: float
+    ) -> str:
+        deadline = time.monotonic() + self.timeout_seconds
+        errors: List[str] = []
+        for provider in self.providers:
+            for attempt in range(self.retries + 1):
+                timeout = self._attempt_timeout(deadline)
+                if timeout is None or not await self._admit(provider, attempt, errors):
+                    break
+                try:
+                    return await self._hedged(
+                        client, provider, (prompt, max_tokens, temperature), timeout
+                    )
+                except Exception as exc:
+                    errors.append(f"{provider.name}: {_describe(exc)}")
+                    if not _retryable(exc):
+                        break
+        raise self._unavailable(errors)
+
+    async def astream(
+        self, client: httpx.AsyncClient, prompt: str, max_tokens: int, temperature: float
+    ) -> AsyncIterator[str]:
+        deadline = time.monotonic() + self.timeout_seconds
+        errors: List[str] = []
+        for provider in self.providers:
+            for attempt in range(self.retries + 1):
+                timeout = self._attempt_timeout(deadline)
+                if timeout is None or not await self._admit(provider, attempt, errors):
+                    break
+                streamed = False
+                tokens = self._stream(client, provider, prompt, max_tokens, temperature, timeout)
+                try:
+                    async with aclosing(tokens):
+                        async for token in tokens:
+                            streamed = True
+                            yield token
+                    return
+                except Exception as exc:
+                    if streamed:
+                        raise
+                    errors.append(f"{provider.name}: {_describe(exc)}")
+                    if not _retryable(exc):
+                        break
+        raise self._unavailable(errors)
+
+    def generate(self, prompt: str, max_tokens: int, temperature: float) -> str:
+        deadline = time.monotonic() + self.timeout_seconds
+        errors: List[str] = []
+        for provider in self.providers:
+            for attempt in range(self.retries + 1):
+                timeout = self._attempt_timeout(deadline)
+                if timeout is None:
+                    break
+                if attempt:
+                    provider.count("retries")
+                    time.sleep(self._backoff(attempt))
+                if not provider.breaker.allow():
+                    errors.append(f"{provider.name}: circuit open")
+                    break
+                try:
+                    return self._call_sync(provider, prompt, max_tokens, temperature, timeout)
+                except Exception as exc:
+                    errors.append(f"{provider.name}: {_describe(exc)}")
+                    if not _retryable(exc):
+                        break
+        raise self._unavailable(errors)
+
+    def stats(self) -> dict:
+        return {
+            "retries": self.retries,
+            "hedge": self.hedge,
+            "attempt_timeout_seconds": self.attempt_timeout_seconds,
+            "providers": {provider.name: provider.stats() for provider in self.providers},
+        }
+
+    async def _admit(self, provider: LLMProvider, attempt: int, errors: List[str]) -> bool:
+        if attempt:
+            provider.count("retries")
+            await asyncio.sleep(self._backoff(attempt))
+        if provider.breaker.available():
+            return True
+        errors.append(f"{provider.name}: circuit open")
+        return False
+
+    def _attempt_timeout(self, deadline: float) -> Optional[float]:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        return min(self.attempt_timeout_seconds, remaining)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(MAX_BACKOFF_SECONDS, self.backoff * 2 ** (attempt - 1)))
+
+    def _unavailable(self, errors: List[str]) -> LLMUnavailableError:
+        waits = [provider.breaker.retry_after() for provider in self.providers]
+        retry_after = min((wait for wait in waits if wait > 0), default=1.0)
+        detail = "; ".join(errors) or "deadline exceeded"
+        return LLMUnavailableError(f"No LLM provider available ({detail})", retry_after)
+
+    async def _hedged(
+        self,
+        client: httpx.AsyncClient,
+        provider: LLMProvider,
+        request: tuple[str, int, float],
+        timeout: float,
+    ) -> str:
+        delay = self._hedge_delay(provider)
+        if delay is None or delay >= timeout:
+            return await self._call(client, provider, *request, timeout)
+        primary = asyncio.ensure_future(self._call(client, provider, *request, timeout))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        backup_provider = None if done else self._hedge_target(provider)
+        if backup_provider is None:
+            return await primary
+        provider.count("hedges")
+        backup = asyncio.ensure_future(
+            self._call(client, backup_provider, *request, timeout - delay)
+        )
+        pending = {primary, backup}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            provider.count("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _hedge_delay(self, provider: LLMProvider) -> Optional[float]:
+        if not self.hedge:
+            return None
+        latency = provider.latency_percentile(self.hedge_percentile)
+        return None if latency is None else max(self.hedge_min, latency)
+
+    def _hedge_target(self, provider: LLMProvider) -> Optional[LLMProvider]:
+        others = [candidate for candidate in self.providers if candidate is not provider]
+        for candidate in [*others, provider]:
+            if candidate.has_free_slot() and candidate.breaker.available():
+                return candidate
+        return None
+
+    async def _call(
+        self,
+        client: httpx.AsyncClient,
+        provider: LLMProvider,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        timeout: float,
+    ) -> str:
+        url, payload, headers = provider.request(prompt, max_tokens, temperature)
+        async with self._slot(provider, timeout) as remaining:
+            provider.started()
+            started = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(
+                    client.post(url, json=payload, headers=headers, timeout=remaining), remaining
+                )
+                response.raise_for_status()
+                text = provider.parse(response.json())
+            except Exception as exc:
+                self._failed(provider, "generate", started, exc)
+                raise
+            except BaseException:
+                provider.breaker.release()
+                provider.finished(ok=None)
+                raise
+            self._succeeded(provider, "generate", started)
+            return text
+
+    async def _stream(
+        self,
+        client: httpx.AsyncClient,
+        provider: LLMProvider,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        timeout: float,
+    ) -> AsyncIterator[str]:
+        url, payload, headers = provider.request(prompt, max_tokens, temperature, stream=True)
+        async with self._slot(provider, timeout) as remaining:
+            provider.started()
+            started = time.perf_counter()
+            first_token: Optional[float] = None
+            try:
+                async with client.stream(
+                    "POST", url, json=payload, headers=headers, timeout=remaining
+                ) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        token, done = provider.stream_line(line)
+                        if token:
+                            if first_token is None:
+                                first_token = time.perf_counter() - started
+                                metrics.observe(
+                                    "llm_time_to_first_token_seconds",
+                                    first_token,
+                                    provider=provider.name,
+                                )
+                            yield token
+                        if done:
+                            break
+            except Exception as exc:
+                self._failed(provider, "stream", started, exc)
+                raise
+            except BaseException:
+                # Closed by the consumer: the provider was fine if it got as far as a token.
+                if first_token is None:
+                    provider.breaker.release()
+                    provider.finished(ok=None)
+                else:
+                    provider.breaker.record_success()
+                    provider.finished(ok=True, ttft=first_token)
+                raise
+            self._succeeded(provider, "stream", started, first_token)
+
+    @asynccontextmanager
+    async def _slot(self, provider: LLMProvider, timeout: float) -> AsyncIterator[float]:
+        """Hold a slot on ``provider``, then its breaker's go-ahead; yields the time left.
+
+        Raises ``TimeoutError`` if no slot frees up within ``timeout`` and
+        ``CircuitOpenError`` if the breaker refuses. Nothing awaits between ``allow`` and
+        the caller's ``try``, which records an outcome or releases the probe.
+        """
+        queued = time.monotonic()
+        slots = provider.slots()
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise asyncio.TimeoutError(f"no free slot within {timeout:.1f}s") from None
+        try:
+            if not provider.breaker.allow():
+                raise CircuitOpenError("circuit open")
+            yield max(0.0, timeout - (time.monotonic() - queued))
+        finally:
+            slots.release()
+
+    def _call_sync(
+        self,
+        provider: LLMProvider,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        timeout: float,
+    ) -> str:
+        url, payload, headers = provider.request(prompt, max_tokens, temperature)
+        provider.started()
+        started = time.perf_counter()
+        try:
+            response = httpx.post(url, json=payload, headers=headers, timeout=timeout)
+            response.raise_for_status()
+            text = provider.parse(response.json())
+        except Exception as exc:
+            self._failed(provider, "generate", started, exc)
+            raise
+        except BaseException:
+            provider.breaker.release()
+            provider.finished(ok=None)
+            raise
+        self._succeeded(provider, "generate", started)
+        return text
+
+    def _succeeded(
+        self, provider: LLMProvider, op: str, started: float, ttft: Optional[float] = None
+    ) -> None:
+        elapsed = time.perf_counter() - started
+        provider.breaker.record_success()
+        if op == "stream":
+            provider.finished(ok=True, ttft=ttft)
+        else:
+            provider.finished(ok=True, latency=elapsed)
+        metrics.observe("llm_request_seconds", elapsed, provider=provider.name, op=op)
+
+    def _failed(self, provider: LLMProvider, op: str, started: float, exc: Exception) -> None:
+        elapsed = time.perf_counter() - started
+        if _provider_fault(exc):
+            provider.breaker.record_failure()
+        else:
+            provider.breaker.release()
+        provider.finished(ok=False)
+        metrics.observe("llm_request_seconds", elapsed, provider=provider.name, op=op)
+        metrics.inc("llm_request_errors_total", provider=provider.name, op=op)
+
+
+def _retryable(exc: Exception) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_STATUS
+    # Transport errors include httpx's own timeouts; TimeoutError is the attempt's deadline.
+    return isinstance(exc, (httpx.TransportError, asyncio.TimeoutError))
+
+
+def _provider_fault(exc: Exception) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code not in REQUEST_FAULT_STATUS
+    return True
+
+
+def _describe(exc: Exception) -> str:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return f"HTTP {exc.response.status_code}"
+    if isinstance(exc, CircuitOpenError):
+        return str(exc)
+    return f"{type(exc).__name__}: {exc}" if str(exc) else type(exc).__name__
+
+
+@lru_cache(maxsize=1)
+def get_dispatcher() -> LLMDispatcher:
+    return LLMDispatcher.from_settings(get_settings())
@@ -1,48 +1,67 @@
+from contextlib import aclosing
+from typing import AsyncIterator, ContextManager, Optional
+
 import httpx
 
+from app.agent.dispatch import LLMDispatcher, get_dispatcher
 from app.core.config import get_settings
+from app.core.metrics import timed
+
+
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Shared keep-alive client so LLM calls reuse pooled connections."""
+    global _async_client
+    if _async_client is None:
+        settings = get_settings()
+        _async_client = httpx.AsyncClient(
+            timeout=settings.llm_timeout_seconds,
+            limits=httpx.Limits(
+                max_connections=settings.llm_max_connections,
+                max_keepalive_connections=settings.llm_max_connections,
+            ),
+        )
+    return _async_client
+
+
+async def close_async_client() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
 
 
 class LLMClient:
-    def __init__(self) -> None:
+    """Prompt in, text out; providers, failover and hedging live in ``LLMDispatcher``."""
+
+    def __init__(self, dispatcher: Optional[LLMDispatcher] = None) -> None:
         self.settings = get_settings()
+        self.dispatcher = dispatcher or get_dispatcher()
 
     def generate(self, prompt: str, max_tokens: int = 512, temperature: float = 0.2) -> str:
-        if self.settings.llm_provider == "ollama":
-            return self._ollama_generate(prompt, max_tokens=max_tokens, temperature=temperature)
-        return self._hf_generate(prompt, max_tokens=max_tokens, temperature=temperature)
-
-    def _hf_generate(self, prompt: str, max_tokens: int, temperature: float) -> str:
-        headers = {}
-        if self.settings.hf_api_token:
-            headers["Authorization"] = f"Bearer {self.settings.hf_api_token}"
-        payload = {
-            "inputs": prompt,
-            "parameters": {
-                "max_new_tokens": max_tokens,
-                "temperature": temperature,
-                "return_full_text": False,
-            },
-        }
-        url = f"https://router.huggingface.co/models/{self.settings.hf_model}"
-        response = httpx.post(url, json=payload, headers=headers, timeout=60)
-        response.raise_for_status()
-        data = response.json()
-        if isinstance(data, list) and data:
-            return data[0].get("generated_text", "").strip()
-        if isinstance(data, dict) and "generated_text" in data:
-            return str(data["generated_text"]).strip()
-        return str(data)
-
-    def _ollama_generate(self, prompt: str, max_tokens: int, temperature: float) -> str:
-        payload = {
-            "model": self.settings.ollama_model,
-            "prompt": prompt,
-            "stream": False,
-            "options": {"num_predict": max_tokens, "temperature": temperature},
-        }
-        url = f"{self.settings.ollama_base_url}/api/generate"
-        response = httpx.post(url, json=payload, timeout=60)
-        response.raise_for_status()
-        data = response.json()
-        return str(data.get("response", "")).strip()
+        with self._timed("generate"):
+            return self.dispatcher.generate(prompt, max_tokens, temperature)
+
+    async def agenerate(
+        self, prompt: str, max_tokens: int = 512, temperature: float = 0.2
+    ) -> str:
+        with self._timed("generate"):
+            return await self.dispatcher.agenerate(
+                get_async_client(), prompt, max_tokens, temperature
+            )
+
+    async def astream(
+        self, prompt: str, max_tokens: int = 512, temperature: float = 0.2
+    ) -> AsyncIterator[str]:
+        """Yield text fragments as the provider produces them."""
+        tokens = self.dispatcher.astream(get_async_client(), prompt, max_tokens, temperature)
+        with self._timed("stream"):
+            async with aclosing(tokens):
+                async for token in tokens:
+                    yield token
+
+    def _timed(self, op: str) -> ContextManager[None]:
+        """The whole call, retries and failover included; attempts are ``llm_request_seconds``."""
+        return timed("llm_call_seconds", breakdown="llm", op=op)
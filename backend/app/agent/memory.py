@@ -1,27 +1,196 @@
-from typing import Optional
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from functools import lru_cache
+from typing import Deque, Iterable, List, Optional
 
-from app.core.db import db_execute, db_fetchall, db_fetchone
+from app.core.config import get_settings
+from app.core.db import adb_fetchall, adb_fetchone
+from app.core.writer import get_writer
 
 
-def ensure_session(session_id: Optional[str], user_id: Optional[str]) -> str:
+class UnknownSessionError(LookupError):
+    """The request names a session id that is malformed or does not exist."""
+
+
+class SessionMemoryCache:
+    """The newest ``max_messages`` messages of up to ``max_sessions`` sessions (LRU).
+
+    A cached session is authoritative for any read of up to ``max_messages`` messages:
+    it is filled from the database on a miss and appended to by every ``add_message`` in
+    this process. Other processes announce the sessions they write (``discard``, via the
+    broadcaster), so a turn that lands on another worker is not answered from stale
+    history. A fill is dropped if the session was written or discarded while it was being
+    read, since the rows may predate that change. ``ttl_seconds`` bounds staleness if an
+    announcement is missed.
+    """
+
+    def __init__(self, max_sessions: int, max_messages: int, ttl_seconds: float) -> None:
+        self.max_sessions = max(0, max_sessions)
+        self.max_messages = max(1, max_messages)
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, tuple[Deque[dict], float]]" = OrderedDict()
+        # Sequence number of the last write to each uncached session, for ``fill``.
+        self._writes: "OrderedDict[str, int]" = OrderedDict()
+        self._sequence = 0
+        self._cleared = 0  # sequence of the last discard of every session
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_sessions > 0
+
+    def get(self, session_id: str, limit: int) -> Optional[List[dict]]:
+        """Newest first, like the database query; None on a miss."""
+        if not self.enabled or limit > self.max_messages:
+            return None
+        key = str(session_id)
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None and time.monotonic() - entry[1] > self.ttl_seconds:
+                del self._sessions[key]  # writes until the refill are tracked as uncached
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._sessions.move_to_end(key)
+            self._hits += 1
+            return [dict(message) for message in list(entry[0])[: -limit - 1: -1]]
+
+    def contains(self, session_id: str) -> bool:
+        with self._lock:
+            return str(session_id) in self._sessions
+
+    def sequence(self) -> int:
+        """Take before reading a session from the database; pass to ``fill``."""
+        with self._lock:
+            return self._sequence
+
+    def fill(
+        self, session_id: str, newest_first: Iterable[dict], since: Optional[int] = None
+    ) -> None:
+        """Cache a session from rows read newest first (fewer rows means full history)."""
+        if not self.enabled:
+            return
+        key = str(session_id)
+        rows = list(newest_first)[: self.max_messages]
+        messages = deque(
+            ({"role": row["role"], "content": row["content"]} for row in reversed(rows)),
+            maxlen=self.max_messages,
+        )
+        with self._lock:
+            if since is not None and max(self._writes.get(key, 0), self._cleared) > since:
+                return
+            self._writes.pop(key, None)
+            self._store(key, messages)
+
+    def append(self, session_id: str, role: str, content: str) -> None:
+        """Record a written message; uncached sessions stay uncached (history unknown)."""
+        if not self.enabled:
+            return
+        key = str(session_id)
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None:
+                entry[0].append({"role": role, "content": content})
+                return
+            self._mark_written(key)
+
+    def discard(self, session_ids: Optional[Iterable[str]]) -> None:
+        """Forget sessions changed elsewhere (every session for None)."""
+        with self._lock:
+            if session_ids is None:
+                self._sequence += 1
+                self._cleared = self._sequence
+                self._sessions.clear()
+                return
+            for session_id in session_ids:
+                key = str(session_id)
+                self._sessions.pop(key, None)
+                self._mark_written(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "max_messages": self.max_messages,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+            }
+
+    def _mark_written(self, key: str) -> None:
+        self._sequence += 1
+        self._writes[key] = self._sequence
+        self._writes.move_to_end(key)
+        while len(self._writes) > self.max_sessions:
+            self._writes.popitem(last=False)
+
+    def _store(self, key: str, messages: Deque[dict]) -> None:
+        self._sessions[key] = (messages, time.monotonic())
+        self._sessions.move_to_end(key)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self._evictions += 1
+
+
+@lru_cache(maxsize=1)
+def get_session_memory() -> SessionMemoryCache:
+    settings = get_settings()
+    return SessionMemoryCache(
+        settings.memory_cache_sessions,
+        settings.memory_cache_messages,
+        settings.memory_cache_ttl_seconds,
+    )
+
+
+async def ensure_session(session_id: Optional[str], user_id: Optional[str]) -> str:
     if session_id:
-        return session_id
-    result = db_fetchone(
+        return await _existing_session(session_id)
+    result = await adb_fetchone(
         "insert into agent_sessions (user_id) values (%s) returning id", (user_id,)
     )
+    # A new session has no history: cache it empty so its first turns skip the database.
+    get_session_memory().fill(result["id"], [])
     return result["id"]
 
 
-def add_message(session_id: str, role: str, content: str) -> None:
-    db_execute(
-        "insert into agent_messages (session_id, role, content) values (%s, %s, %s)",
-        (session_id, role, content),
-    )
+async def _existing_session(session_id: str) -> str:
+    # Messages are written behind in shared batches, so an id the database would reject is
+    # turned away here rather than by the COPY it would share with other requests' rows.
+    try:
+        key = str(uuid.UUID(str(session_id)))
+    except ValueError:
+        raise UnknownSessionError(f"Invalid session id: {session_id}") from None
+    if get_session_memory().contains(key):
+        return key
+    if await adb_fetchone("select 1 as found from agent_sessions where id = %s", (key,)) is None:
+        raise UnknownSessionError(f"Unknown session: {session_id}")
+    return key
+
+
+async def add_message(session_id: str, role: str, content: str) -> None:
+    await get_writer().awrite("agent_messages", (session_id, role, content))
+    get_session_memory().append(session_id, role, content)
 
 
-def get_recent_messages(session_id: str, limit: int = 6) -> list[dict]:
-    return db_fetchall(
+async def get_recent_messages(session_id: str, limit: int = 6) -> list[dict]:
+    memory = get_session_memory()
+    cached = memory.get(session_id, limit)
+    if cached is not None:
+        return cached
+    since = memory.sequence()
+    rows = await adb_fetchall(
         "select role, content from agent_messages where session_id = %s "
         "order by created_at desc limit %s",
-        (session_id, limit),
+        (session_id, max(limit, memory.max_messages) if memory.enabled else limit),
     )
+    memory.fill(session_id, rows, since)
+    return rows[:limit]
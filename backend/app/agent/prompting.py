@@ -1,4 +1,5 @@
 import json
+from functools import lru_cache
 from typing import Any
 
 
@@ -9,27 +10,40 @@ Follow these rules:
 - Keep answers concise and accurate
 """
 
+# Static text goes first and is byte-identical on every turn, so providers that reuse a
+# cached prompt prefix (Ollama keeps the KV cache of a loaded model) only process the
+# per-turn context and message.
+FINAL_PREAMBLE = f"{SYSTEM_PROMPT}\n\n"
 
-def tool_selection_prompt(user_message: str, context: str, tools: list[dict]) -> str:
-    tools_json = json.dumps(tools, ensure_ascii=True, indent=2)
+
+def tools_json(tools: list[dict]) -> str:
+    """Compact, key-sorted serialization: the same tools always give the same bytes."""
+    return json.dumps(tools, ensure_ascii=True, sort_keys=True, separators=(",", ":"))
+
+
+@lru_cache(maxsize=8)
+def tool_preamble(tools_text: str) -> str:
     return (
         f"{SYSTEM_PROMPT}\n\n"
         "You must output JSON only.\n"
         "Choose one of:\n"
         "{\"action\": \"tool\", \"tool_name\": \"...\", \"tool_args\": {...}}\n"
         "{\"action\": \"final\", \"final\": \"...\"}\n\n"
-        f"Context:\n{context}\n\n"
-        f"User message: {user_message}\n\n"
-        f"Tools:\n{tools_json}\n"
+        f"Tools:\n{tools_text}\n\n"
     )
 
 
+def tool_selection_prompt(user_message: str, context: str, tools_text: str) -> str:
+    """``tools_text`` is ``ToolRegistry.prompt_json()``, serialized once per registry."""
+    return f"{tool_preamble(tools_text)}Context:\n{context}\n\nUser message: {user_message}\n"
+
+
 def final_response_prompt(
     user_message: str, context: str, tool_result: Any | None
 ) -> str:
     tool_text = json.dumps(tool_result, ensure_ascii=True) if tool_result else "null"
     return (
-        f"{SYSTEM_PROMPT}\n\n"
+        f"{FINAL_PREAMBLE}"
         f"Context:\n{context}\n\n"
         f"User message: {user_message}\n\n"
         f"Tool result: {tool_text}\n\n"
@@ -0,0 +1,183 @@
+"""Delete (optionally archive) chat sessions that have been idle for a while.
+
+    cd backend
+    python -m app.agent.retention --days 90 --archive
+
+A session expires when it was created before the cutoff and has no message since. Its
+messages go with it (``on delete cascade``); with ``--archive`` they are first copied to
+``agent_messages_archive``. Sessions are removed in batches, each its own short
+transaction, and a transaction-level advisory lock keeps concurrent runs (one per worker)
+from doing the same work twice.
+"""
+import argparse
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.broadcast import get_broadcaster
+from app.core.config import get_settings
+from app.core.db import close_pool, db_conn_fetchall, db_transaction, init_pool
+
+
+# Arbitrary, fixed key for pg_try_advisory_xact_lock.
+RETENTION_LOCK_ID = 0x6D656D6F7279
+
+EXPIRED_CTE = """
+with expired as (
+    select s.id, s.user_id from agent_sessions s
+    where s.created_at < %s
+      and not exists (
+          select 1 from agent_messages m
+          where m.session_id = s.id and m.created_at >= %s
+      )
+    order by s.created_at
+    limit %s
+    for update of s skip locked
+)
+"""
+
+ARCHIVE_CTE = """,
+archived as (
+    insert into agent_messages_archive (id, session_id, user_id, role, content, created_at)
+    select m.id, m.session_id, e.user_id, m.role, m.content, m.created_at
+    from agent_messages m join expired e on e.id = m.session_id
+    on conflict (id) do nothing
+    returning 1
+)
+"""
+
+DELETE_SQL = """
+delete from agent_sessions s using expired e where s.id = e.id
+returning s.id, {archived} as archived
+"""
+
+
+def purge_statement(archive: bool) -> str:
+    if archive:
+        # Every row of ``archived`` is the same count; select it once per deleted session.
+        delete = DELETE_SQL.format(archived="(select count(*) from archived)")
+        return EXPIRED_CTE + ARCHIVE_CTE + delete
+    return EXPIRED_CTE + DELETE_SQL.format(archived="0")
+
+
+def purge_sessions(
+    older_than_days: float,
+    archive: bool = False,
+    batch_size: int = 500,
+    on_deleted: Optional[Callable[[List[str]], None]] = None,
+) -> Dict[str, Any]:
+    """Remove expired sessions batch by batch; ``on_deleted`` gets each batch's ids."""
+    started = time.perf_counter()
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    statement = purge_statement(archive)
+    sessions = 0
+    archived = 0
+    while True:
+        with db_transaction() as conn:
+            locked = db_conn_fetchall(
+                conn, "select pg_try_advisory_xact_lock(%s) as locked", (RETENTION_LOCK_ID,)
+            )
+            if not locked[0]["locked"]:
+                return {"skipped": "another retention run holds the lock"}
+            rows = db_conn_fetchall(conn, statement, (cutoff, cutoff, max(1, batch_size)))
+            # Other processes drop the sessions from their chat memory once this commits.
+            get_broadcaster().publish_in(conn, "sessions", [str(row["id"]) for row in rows])
+        if rows:
+            sessions += len(rows)
+            archived += int(rows[0]["archived"])
+            if on_deleted is not None:
+                on_deleted([str(row["id"]) for row in rows])
+        if len(rows) < batch_size:
+            break
+    return {
+        "cutoff": cutoff.isoformat(),
+        "sessions": sessions,
+        "archived_messages": archived,
+        "ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+class RetentionJob:
+    """Run ``purge_sessions`` every ``interval`` seconds on a background thread."""
+
+    def __init__(
+        self,
+        older_than_days: float,
+        archive: bool = False,
+        batch_size: int = 500,
+        on_deleted: Optional[Callable[[List[str]], None]] = None,
+    ) -> None:
+        self.older_than_days = older_than_days
+        self.archive = archive
+        self.batch_size = batch_size
+        self.on_deleted = on_deleted
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.runs = 0
+        self.failures = 0
+        self.sessions_deleted = 0
+        self.last_run: Dict[str, Any] = {}
+
+    def start(self, interval: float) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop, args=(interval,), name="memory-retention", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_once(self) -> Dict[str, Any]:
+        result = purge_sessions(
+            self.older_than_days, self.archive, self.batch_size, self.on_deleted
+        )
+        self.runs += 1
+        self.sessions_deleted += result.get("sessions", 0)
+        self.last_run = {**result, "at": time.time()}
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "older_than_days": self.older_than_days,
+            "runs": self.runs,
+            "failures": self.failures,
+            "sessions_deleted": self.sessions_deleted,
+            "last_run": self.last_run,
+        }
+
+    def _loop(self, interval: float) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as exc:  # retried on the next tick
+                self.failures += 1
+                self.last_run = {"error": str(exc), "at": time.time()}
+            self._stop.wait(interval)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=float, default=settings.memory_retention_days or 90)
+    parser.add_argument(
+        "--archive", action="store_true", default=settings.memory_retention_archive
+    )
+    parser.add_argument("--batch-size", type=int, default=settings.memory_retention_batch_size)
+    args = parser.parse_args(argv)
+
+    init_pool(settings.database_url, max_size=1)
+    try:
+        print(purge_sessions(args.days, args.archive, args.batch_size))
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,121 @@
-from fastapi import APIRouter, HTTPException, Query
+import json
+import math
+from typing import Optional
+from uuid import UUID
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
-from app.agent.agent import AgentService
 from app.api.schemas import (
+    SEARCH_MAX_TOP_K,
     AgentRequest,
     AgentResponse,
+    BatchSearchRequest,
+    BatchSearchResponse,
+    IndexRebuildRequest,
     IndexRequest,
+    SearchMode,
+    SearchProfile,
     SearchResponse,
+    ToolBatchRequest,
+    ToolBatchResponse,
     ToolExecuteRequest,
     ToolExecuteResponse,
+    UploadFormat,
     WebhookRequest,
 )
+from app.agent.dispatch import LLMUnavailableError
+from app.agent.memory import UnknownSessionError
+from app.container import get_container
 from app.core.config import get_settings
-from app.core.db import db_execute
-from app.embeddings.encoder import get_encoder
-from app.rag.retriever import Retriever
-from app.tools.registry import get_tool_registry
+from app.core.metrics import metrics
+from app.core.writer import BufferFullError, RowRejectedError, get_writer
+from app.rag.cache import cache_stats
+from app.rag.index import index_status, rebuild_index
+from app.rag.jobs import QueueFullError
+from app.rag.upload import UploadChunker, format_for, ingest_upload
+from app.tools.registry import ToolTimeoutError
 
 
 router = APIRouter(prefix="/api")
 settings = get_settings()
 
+# Raised while a chat turn checks its session and buffers the user message.
+CHAT_WRITE_ERRORS = (UnknownSessionError, RowRejectedError, BufferFullError)
+
 
 @router.get("/health")
-def health() -> dict:
-    return {"status": "ok"}
+def health() -> JSONResponse:
+    container = get_container()
+    if not container.ready:
+        return JSONResponse(
+            status_code=503, content={"status": "starting", "warmup": container.warmup}
+        )
+    return JSONResponse(content={"status": "ok", "warmup": container.warmup})
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics() -> PlainTextResponse:
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 @router.post("/embeddings/index")
 def index_documents(request: IndexRequest) -> dict:
-    encoder = get_encoder()
-    retriever = Retriever(encoder)
-    count = retriever.index_documents(request.documents)
-    return {"indexed": count}
+    retriever = get_container().retriever
+    report = retriever.index_documents(request.documents, batch_size=request.batch_size)
+    return report.as_dict()
+
+
+@router.post("/ingest/jobs", status_code=202)
+async def submit_ingest_job(request: IndexRequest) -> dict:
+    """Queue documents for background indexing; poll ``GET /ingest/jobs/{id}`` for progress."""
+    try:
+        return await get_container().jobs.submit(request.documents, request.batch_size)
+    except QueueFullError as exc:
+        raise HTTPException(status_code=429, detail=str(exc), headers={"Retry-After": "5"})
+
+
+@router.get("/ingest/jobs")
+async def list_ingest_jobs(limit: int = Query(20, ge=1, le=200)) -> list[dict]:
+    return await get_container().jobs.recent(limit)
+
+
+@router.get("/ingest/jobs/{job_id}")
+async def get_ingest_job(job_id: UUID) -> dict:
+    job = await get_container().jobs.get(str(job_id))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/embeddings/upload")
+async def upload_documents(
+    request: Request,
+    upload_format: Optional[UploadFormat] = Query(
+        None, alias="format", description="Defaults from Content-Type, else text"
+    ),
+    key: Optional[str] = Query(None, description="Parent key (required for text/markdown)"),
+    metadata: Optional[str] = Query(None, description="JSON object added to every chunk"),
+    chunk_tokens: Optional[int] = Query(None, ge=1),
+    overlap_tokens: Optional[int] = Query(None, ge=0),
+    batch_size: Optional[int] = Query(None, ge=1),
+) -> dict:
+    """Stream a raw text/markdown/NDJSON body, chunking and indexing it as it arrives."""
+    retriever = get_container().retriever
+    try:
+        parsed = json.loads(metadata) if metadata else None
+        if parsed is not None and not isinstance(parsed, dict):
+            raise ValueError("metadata must be a JSON object")
+        chunker = UploadChunker(
+            upload_format or format_for(request.headers.get("content-type")),
+            key=key,
+            metadata=parsed,
+            chunk_tokens=chunk_tokens,
+            overlap_tokens=overlap_tokens,
+        )
+        return await ingest_upload(retriever, request.stream(), chunker, batch_size)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
 @router.get("/demo/seed-data")
@@ -64,33 +148,148 @@ def get_demo_data() -> dict:
 
 
 @router.get("/embeddings/search", response_model=list[SearchResponse])
-def search_documents(query: str = Query(...), top_k: int = Query(4)) -> list[SearchResponse]:
-    encoder = get_encoder()
-    retriever = Retriever(encoder)
-    return retriever.search(query, top_k=top_k)
+async def search_documents(
+    query: str = Query(...),
+    top_k: int = Query(4, ge=1, le=SEARCH_MAX_TOP_K),
+    mode: Optional[SearchMode] = Query(None),
+    profile: Optional[SearchProfile] = Query(None),
+    filters: Optional[str] = Query(
+        None, description='Metadata filter as JSON, e.g. {"category": {"in": ["billing"]}}'
+    ),
+) -> list[SearchResponse]:
+    retriever = get_container().retriever
+    try:
+        parsed = json.loads(filters) if filters else None
+        return await retriever.asearch(
+            query, top_k=top_k, mode=mode, filters=parsed, profile=profile
+        )
+    except ValueError as exc:  # includes json.JSONDecodeError
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@router.post("/embeddings/search/batch", response_model=BatchSearchResponse)
+async def search_documents_batch(request: BatchSearchRequest) -> BatchSearchResponse:
+    retriever = get_container().retriever
+    keys = [query.id or query.query for query in request.queries]
+    if len(set(keys)) != len(keys):
+        raise HTTPException(status_code=400, detail="Query ids must be unique")
+    try:
+        results = await retriever.asearch_batch(
+            [query.model_dump(exclude={"id"}) for query in request.queries]
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return BatchSearchResponse(results=dict(zip(keys, results)))
+
+
+@router.get("/admin/index")
+def vector_index_status() -> dict:
+    return index_status()
+
+
+@router.post("/admin/index/rebuild")
+def vector_index_rebuild(request: IndexRebuildRequest) -> dict:
+    return rebuild_index(
+        engine=request.engine, lists=request.lists, quantization=request.quantization
+    )
+
+
+@router.get("/embeddings/scheduler")
+def embedding_scheduler_stats() -> dict:
+    return get_container().encoder.stats()
+
+
+@router.get("/embeddings/cache")
+def embedding_cache_stats() -> dict:
+    return cache_stats()
 
 
 @router.post("/agent/chat", response_model=AgentResponse)
-def agent_chat(request: AgentRequest) -> AgentResponse:
-    agent = AgentService()
-    result = agent.chat(request)
+async def agent_chat(request: AgentRequest) -> AgentResponse:
+    agent = get_container().agent
+    try:
+        result = await agent.chat(request)
+    except LLMUnavailableError as exc:
+        retry_after = str(max(1, math.ceil(exc.retry_after)))
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": retry_after})
+    except CHAT_WRITE_ERRORS as exc:
+        raise _chat_write_error(exc) from exc
     return AgentResponse(**result)
 
 
+@router.post("/agent/chat/stream")
+async def agent_chat_stream(request: AgentRequest) -> StreamingResponse:
+    """Server-Sent Events: ``sources`` first, then ``token`` events, then ``done``."""
+    stream = get_container().agent.chat_stream(request)
+    # The session check and the user message write happen before the first event, so their
+    # errors can still be answered with a status code.
+    try:
+        first = await anext(stream)
+    except CHAT_WRITE_ERRORS as exc:
+        raise _chat_write_error(exc) from exc
+
+    async def events():
+        yield _sse(*first)
+        async for event, data in stream:
+            yield _sse(event, data)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _chat_write_error(exc: Exception) -> HTTPException:
+    if isinstance(exc, UnknownSessionError):
+        return HTTPException(status_code=404, detail=str(exc))
+    if isinstance(exc, RowRejectedError):
+        return HTTPException(status_code=400, detail=str(exc))
+    return HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"})
+
+
 @router.post("/tools/execute", response_model=ToolExecuteResponse)
-def execute_tool(request: ToolExecuteRequest) -> ToolExecuteResponse:
-    registry = get_tool_registry()
+async def execute_tool(request: ToolExecuteRequest) -> ToolExecuteResponse:
+    registry = get_container().registry
     try:
-        result = registry.execute(request.tool_name, request.tool_args)
+        result = await registry.aexecute(request.tool_name, request.tool_args)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except ToolTimeoutError as exc:
+        raise HTTPException(status_code=504, detail=str(exc)) from exc
     return ToolExecuteResponse(result=result)
 
 
-@router.post("/automation/n8n/webhook")
-def n8n_webhook(request: WebhookRequest) -> dict:
-    db_execute(
-        "insert into events (event_type, payload) values (%s, %s)",
-        (request.event_type, request.payload),
+@router.post("/tools/execute/batch", response_model=ToolBatchResponse)
+async def execute_tools(request: ToolBatchRequest) -> ToolBatchResponse:
+    """Run the calls concurrently; each result (or error) is returned in request order."""
+    registry = get_container().registry
+    results = await registry.aexecute_many(
+        [call.model_dump() for call in request.calls], timeout=request.timeout_seconds
     )
+    return ToolBatchResponse(results=results)
+
+
+@router.get("/tools/stats")
+def tool_stats() -> dict:
+    return get_container().registry.stats()
+
+
+@router.get("/llm/stats")
+def llm_stats() -> dict:
+    return get_container().llm.dispatcher.stats()
+
+
+@router.post("/automation/n8n/webhook")
+async def n8n_webhook(request: WebhookRequest) -> dict:
+    try:
+        await get_writer().awrite("events", (request.event_type, request.payload))
+    except BufferFullError as exc:
+        raise HTTPException(status_code=429, detail=str(exc), headers={"Retry-After": "1"})
+    except RowRejectedError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
     return {"status": "received"}
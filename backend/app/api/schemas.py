@@ -1,15 +1,29 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
 
+SearchMode = Literal["vector", "hybrid"]
+SearchProfile = Literal["fast", "balanced", "accurate"]
+IndexEngine = Literal["hnsw", "ivfflat"]
+Quantization = Literal["none", "halfvec", "binary"]
+UploadFormat = Literal["text", "markdown", "ndjson"]
+
+# Upper bound on top_k for single and batch searches alike.
+SEARCH_MAX_TOP_K = 100
+
+
 class DocumentInput(BaseModel):
+    key: Optional[str] = Field(
+        default=None, description="Stable id for upserts; defaults to a content digest"
+    )
     content: str
     metadata: Dict[str, Any] = Field(default_factory=dict)
 
 
 class IndexRequest(BaseModel):
     documents: List[DocumentInput]
+    batch_size: Optional[int] = Field(default=None, ge=1)
 
 
 class SearchResponse(BaseModel):
@@ -17,21 +31,59 @@ class SearchResponse(BaseModel):
     content: str
     metadata: Dict[str, Any]
     score: float
-    
+    vector_score: Optional[float] = None
+    vector_rank: Optional[int] = None
+    lexical_score: Optional[float] = None
+    lexical_rank: Optional[int] = None
+
     class Config:
         from_attributes = True
 
 
+class BatchSearchQuery(BaseModel):
+    id: Optional[str] = Field(
+        default=None, description="Key for this query's results; defaults to the query text"
+    )
+    query: str
+    top_k: int = Field(default=4, ge=1, le=SEARCH_MAX_TOP_K)
+    mode: Optional[SearchMode] = None
+    profile: Optional[SearchProfile] = None
+    filters: Optional[Dict[str, Any]] = None
+
+
+class BatchSearchRequest(BaseModel):
+    queries: List[BatchSearchQuery]
+
+
+class BatchSearchResponse(BaseModel):
+    results: Dict[str, List[SearchResponse]]
+
+
 class AgentRequest(BaseModel):
     session_id: Optional[str] = None
     user_id: Optional[str] = None
     message: str
+    search_mode: Optional[SearchMode] = None
+    filters: Optional[Dict[str, Any]] = None
+    search_profile: Optional[SearchProfile] = None
+    include_timings: bool = False
+    bypass_cache: bool = Field(
+        default=False, description="Always generate a fresh answer (it is still cached)"
+    )
 
 
 class AgentResponse(BaseModel):
     session_id: str
     answer: str
     sources: List[SearchResponse]
+    timings: Optional[Dict[str, float]] = None
+    cached: bool = False
+
+
+class IndexRebuildRequest(BaseModel):
+    engine: Optional[IndexEngine] = None
+    quantization: Optional[Quantization] = None
+    lists: Optional[int] = Field(default=None, ge=1)
 
 
 class ToolExecuteRequest(BaseModel):
@@ -43,6 +95,23 @@ class ToolExecuteResponse(BaseModel):
     result: Dict[str, Any]
 
 
+class ToolBatchRequest(BaseModel):
+    calls: List[ToolExecuteRequest]
+    timeout_seconds: Optional[float] = Field(
+        default=None, gt=0, description="Per-call timeout; defaults to each tool's own"
+    )
+
+
+class ToolCallResult(BaseModel):
+    tool_name: str
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+class ToolBatchResponse(BaseModel):
+    results: List[ToolCallResult]
+
+
 class WebhookRequest(BaseModel):
     event_type: str
     payload: Dict[str, Any] = Field(default_factory=dict)
@@ -0,0 +1,159 @@
+import asyncio
+import time
+from typing import Optional
+
+from app.agent.agent import AgentService
+from app.agent.llm import LLMClient
+from app.agent.memory import get_session_memory
+from app.agent.retention import RetentionJob
+from app.core.broadcast import Broadcaster, get_broadcaster
+from app.core.config import Settings, get_settings
+from app.core.db import adb_fetchone
+from app.core.metrics import metrics
+from app.core.writer import WriteBehindWriter, get_writer
+from app.embeddings.scheduler import EmbeddingScheduler, get_scheduler
+from app.rag.cache import cache_stats, clear_results
+from app.rag.jobs import IngestJobQueue
+from app.rag.retriever import Retriever
+from app.tools.registry import ToolRegistry, get_tool_registry
+
+
+# A failed warm up (database or embedding process not up yet) is retried with capped
+# exponential backoff until it succeeds; /api/health reports 503 until then.
+WARMUP_RETRY_SECONDS = 1.0
+WARMUP_MAX_RETRY_SECONDS = 30.0
+
+
+class ServiceContainer:
+    """Process-wide services, built once in the startup hook and shared by every request."""
+
+    def __init__(self, settings: Settings, llm: Optional[LLMClient] = None) -> None:
+        self.settings = settings
+        self.encoder: EmbeddingScheduler = get_scheduler()
+        self.retriever = Retriever(self.encoder)
+        self.llm = llm or LLMClient()
+        self.registry: ToolRegistry = get_tool_registry()
+        self.writer: WriteBehindWriter = get_writer()
+        self.agent = AgentService(llm=self.llm, retriever=self.retriever, registry=self.registry)
+        self.jobs = IngestJobQueue(
+            self.encoder,
+            workers=settings.ingest_job_workers,
+            max_pending=settings.ingest_job_max_pending,
+            lease_seconds=settings.ingest_job_lease_seconds,
+        )
+        self.broadcaster: Broadcaster = get_broadcaster()
+        if self.retriever.local_index is not None:
+            # Before clearing: searches from then on must map the rows the sync added.
+            self.broadcaster.subscribe("results", self.retriever.local_index.recheck)
+        self.broadcaster.subscribe("results", clear_results)
+        self.memory = get_session_memory()
+        self.broadcaster.subscribe("sessions", self.memory.discard)
+        self.retention: Optional[RetentionJob] = None
+        if settings.memory_retention_days > 0:
+            self.retention = RetentionJob(
+                settings.memory_retention_days,
+                archive=settings.memory_retention_archive,
+                batch_size=settings.memory_retention_batch_size,
+                on_deleted=self.memory.discard,
+            )
+        self.ready = False
+        self.warmup: dict = {}
+        self.warmup_attempts = 0
+        self._warmup_retry: Optional[asyncio.Task] = None
+        metrics.register_collector("embedding_scheduler", self.encoder.stats)
+        metrics.register_collector("cache", cache_stats)
+        metrics.register_collector("ingest_jobs", self.jobs.stats)
+        metrics.register_collector("tools", self.registry.stats)
+        metrics.register_collector("write_behind", self.writer.stats)
+        metrics.register_collector("llm", self.llm.dispatcher.stats)
+        metrics.register_collector("session_memory", self.memory.stats)
+        metrics.register_collector("broadcast", self.broadcaster.stats)
+        if self.retention is not None:
+            metrics.register_collector("memory_retention", self.retention.stats)
+        if self.retriever.local_index is not None:
+            metrics.register_collector("local_index", self.retriever.local_index.stats)
+
+    async def warm_up(self) -> None:
+        """Run one encode and one DB round trip so the first real request pays for neither.
+
+        If that fails, keep retrying in the background until it succeeds.
+        """
+        if not await self._warm_up_once() and self._warmup_retry is None:
+            self._warmup_retry = asyncio.create_task(self._retry_warm_up())
+
+    def stop_warm_up(self) -> None:
+        if self._warmup_retry is not None:
+            self._warmup_retry.cancel()
+            self._warmup_retry = None
+
+    async def _retry_warm_up(self) -> None:
+        delay = WARMUP_RETRY_SECONDS
+        while True:
+            self.warmup["retry_in_seconds"] = delay
+            await asyncio.sleep(delay)
+            if await self._warm_up_once():
+                self._warmup_retry = None
+                return
+            delay = min(delay * 2, WARMUP_MAX_RETRY_SECONDS)
+
+    async def _warm_up_once(self) -> bool:
+        self.warmup_attempts += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self.encoder.embed_batch, ["warm up"])
+            encode_ms = (time.perf_counter() - started) * 1000
+            await adb_fetchone("select 1 as ok")
+        except Exception as exc:
+            self.warmup = {"error": str(exc), "attempts": self.warmup_attempts}
+            self.ready = False
+            return False
+        self.warmup = {
+            "encode_ms": round(encode_ms, 2),
+            "total_ms": round((time.perf_counter() - started) * 1000, 2),
+            "attempts": self.warmup_attempts,
+        }
+        self.ready = True
+        return True
+
+
+_container: Optional[ServiceContainer] = None
+
+
+async def init_container(llm: Optional[LLMClient] = None) -> ServiceContainer:
+    """Build the shared services once; ``llm`` swaps in a stand-in client (benchmarks)."""
+    global _container
+    if _container is None:
+        # Building the container loads the embedding model; keep it off the event loop.
+        _container = await asyncio.to_thread(ServiceContainer, get_settings(), llm)
+        await _container.warm_up()
+        _container.broadcaster.start()
+        await asyncio.to_thread(_container.jobs.start)
+        local_index = _container.retriever.local_index
+        if local_index is not None:
+            # Searches use Postgres until the first sync has built the index.
+            local_index.start(_container.settings.local_index_sync_seconds)
+        if _container.retention is not None:
+            _container.retention.start(_container.settings.memory_retention_interval_seconds)
+    return _container
+
+
+async def close_container() -> None:
+    global _container
+    if _container is not None:
+        _container.stop_warm_up()
+        await asyncio.to_thread(_container.jobs.stop)
+        if _container.retriever.local_index is not None:
+            await asyncio.to_thread(_container.retriever.local_index.stop)
+        if _container.retention is not None:
+            await asyncio.to_thread(_container.retention.stop)
+        _container.registry.close()
+        await asyncio.to_thread(_container.broadcaster.stop)
+        # Last, so rows queued by the services above are written before the pools close.
+        await asyncio.to_thread(_container.writer.close)
+        _container = None
+
+
+def get_container() -> ServiceContainer:
+    if _container is None:
+        raise RuntimeError("Service container not initialized")
+    return _container
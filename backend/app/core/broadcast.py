@@ -0,0 +1,206 @@
+"""Tell the other API processes that shared state changed (Postgres LISTEN/NOTIFY).
+
+Each process caches search results, answers and chat history in memory. A change made in
+one process is published on ``INVALIDATION_CHANNEL``; every other process listening on
+the channel runs the handlers subscribed to that topic. Notifications sent while a
+listener is disconnected are lost, so after every (re)connect each handler is called
+with ``None``, meaning "drop everything".
+
+LISTEN needs a session-level connection: behind a transaction-mode pooler (pgbouncer,
+the Supabase pooler on port 6543) notifications are not delivered.
+"""
+import json
+import os
+import select
+import threading
+import uuid
+from collections import deque
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+import psycopg
+from psycopg import sql
+
+from app.core.config import get_settings
+from app.core.db import db_execute
+
+
+RECONNECT_SECONDS = 2.0
+POLL_SECONDS = 1.0
+# NOTIFY payloads are limited to 8000 bytes; lists of ids are split to stay well below.
+IDS_PER_MESSAGE = 100
+
+Handler = Callable[[Optional[Any]], None]
+
+
+class Broadcaster:
+    """One listening connection per process, on a background thread.
+
+    ``publish`` never blocks on the database once ``start`` has run: payloads are handed
+    to the listener thread, which sends them on its own connection. Before that (command
+    line tools) it sends through the pool.
+    """
+
+    def __init__(self, dsn: str, channel: str) -> None:
+        self.dsn = dsn
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._outbox: deque[str] = deque()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_write, False)
+        self.connected = False
+        self.published = 0
+        self.received = 0
+        self.connects = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.channel)
+
+    def subscribe(self, topic: str, handler: Handler) -> None:
+        with self._lock:
+            self._handlers.setdefault(topic, []).append(handler)
+
+    def publish(self, topic: str, data: Any = None) -> None:
+        if not self.enabled:
+            return
+        payload = self._payload(topic, data)
+        if self._thread is None:
+            try:
+                db_execute("select pg_notify(%s, %s)", (self.channel, payload))
+                self.published += 1
+            except Exception as exc:  # best effort: the other processes' TTLs still apply
+                self.errors += 1
+                self.last_error = str(exc)
+            return
+        with self._lock:
+            if payload in self._outbox:  # a burst of identical invalidations: send one
+                return
+            self._outbox.append(payload)
+        self._wake()
+
+    def publish_in(self, conn: psycopg.Connection, topic: str, ids: List[str]) -> None:
+        """Publish from inside ``conn``'s transaction: delivered when, and if, it commits."""
+        if not self.enabled:
+            return
+        for start in range(0, len(ids), IDS_PER_MESSAGE):
+            payload = self._payload(topic, ids[start:start + IDS_PER_MESSAGE])
+            conn.execute("select pg_notify(%s, %s)", (self.channel, payload))
+            self.published += 1
+
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="broadcast", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            outbox = len(self._outbox)
+        return {
+            "channel": self.channel,
+            "connected": self.connected,
+            "published": self.published,
+            "received": self.received,
+            "outbox": outbox,
+            "connects": self.connects,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+    def _payload(self, topic: str, data: Any) -> str:
+        return json.dumps({"origin": self.origin, "topic": topic, "data": data})
+
+    def _wake(self) -> None:
+        try:
+            os.write(self._wake_write, b"x")
+        except BlockingIOError:
+            pass  # the pipe is full, so the listener is already due to wake up
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(self.dsn, autocommit=True) as conn:
+                    conn.add_notify_handler(self._receive)
+                    conn.execute(sql.SQL("listen {}").format(sql.Identifier(self.channel)))
+                    self.connected = True
+                    self.connects += 1
+                    # Anything published while this process was not listening is unknown.
+                    self._dispatch_all(None)
+                    self._serve(conn)
+            except Exception as exc:  # reconnect after a pause
+                self.errors += 1
+                self.last_error = str(exc)
+            finally:
+                self.connected = False
+            self._stop.wait(RECONNECT_SECONDS)
+
+    def _serve(self, conn: psycopg.Connection) -> None:
+        while not self._stop.is_set():
+            self._send(conn)
+            readable, _, _ = select.select(
+                [conn.fileno(), self._wake_read], [], [], POLL_SECONDS
+            )
+            if self._wake_read in readable:
+                os.read(self._wake_read, 4096)
+            if conn.fileno() in readable:
+                conn.execute("select 1")  # reads the pending notifications
+        self._send(conn)
+
+    def _send(self, conn: psycopg.Connection) -> None:
+        while True:
+            with self._lock:
+                if not self._outbox:
+                    return
+                payload = self._outbox[0]
+            conn.execute("select pg_notify(%s, %s)", (self.channel, payload))
+            with self._lock:
+                self._outbox.popleft()
+            self.published += 1
+
+    def _receive(self, notify: psycopg.Notify) -> None:
+        try:
+            message = json.loads(notify.payload)
+        except ValueError:
+            return
+        if message.get("origin") == self.origin:
+            return  # our own change; already applied locally
+        self.received += 1
+        self._call(self._subscribers(message.get("topic")), message.get("data"))
+
+    def _dispatch_all(self, data: Any) -> None:
+        with self._lock:
+            handlers = [handler for topic in self._handlers.values() for handler in topic]
+        self._call(handlers, data)
+
+    def _call(self, handlers: List[Handler], data: Any) -> None:
+        for handler in handlers:
+            try:
+                handler(data)
+            except Exception as exc:  # one bad handler must not drop the connection
+                self.errors += 1
+                self.last_error = str(exc)
+
+    def _subscribers(self, topic: Optional[str]) -> List[Handler]:
+        with self._lock:
+            return list(self._handlers.get(topic or "", []))
+
+
+@lru_cache(maxsize=1)
+def get_broadcaster() -> Broadcaster:
+    settings = get_settings()
+    return Broadcaster(settings.database_url, settings.invalidation_channel)
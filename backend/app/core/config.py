@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from dotenv import load_dotenv
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -10,20 +12,101 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
     database_url: str = Field(..., alias="DATABASE_URL")
+    db_pool_max_size: int = Field(5, alias="DB_POOL_MAX_SIZE")
+    db_async_pool_max_size: int = Field(20, alias="DB_ASYNC_POOL_MAX_SIZE")
 
     llm_provider: str = Field("hf", alias="LLM_PROVIDER")
     hf_api_token: str = Field("", alias="HF_API_TOKEN")
     hf_model: str = Field("meta-llama/Llama-3.2-3B-Instruct", alias="HF_MODEL")
     ollama_base_url: str = Field("http://localhost:11434", alias="OLLAMA_BASE_URL")
     ollama_model: str = Field("llama3.2", alias="OLLAMA_MODEL")
+    llm_timeout_seconds: float = Field(60, alias="LLM_TIMEOUT_SECONDS")
+    llm_max_connections: int = Field(20, alias="LLM_MAX_CONNECTIONS")
+    llm_context_tokens: int = Field(1500, alias="LLM_CONTEXT_TOKENS")
+    llm_context_memory_share: float = Field(0.25, alias="LLM_CONTEXT_MEMORY_SHARE")
+    llm_tokenizer: str = Field("", alias="LLM_TOKENIZER")
+    ollama_keep_alive: str = Field("30m", alias="OLLAMA_KEEP_ALIVE")
+    hf_base_url: str = Field("https://router.huggingface.co", alias="HF_BASE_URL")
+    llm_providers: str = Field("", alias="LLM_PROVIDERS")
+    llm_attempt_timeout_seconds: float = Field(20, alias="LLM_ATTEMPT_TIMEOUT_SECONDS")
+    llm_retries: int = Field(2, alias="LLM_RETRIES")
+    llm_retry_backoff_ms: float = Field(250, alias="LLM_RETRY_BACKOFF_MS")
+    llm_breaker_failures: int = Field(5, alias="LLM_BREAKER_FAILURES")
+    llm_breaker_reset_seconds: float = Field(30, alias="LLM_BREAKER_RESET_SECONDS")
+    llm_provider_max_concurrency: int = Field(8, alias="LLM_PROVIDER_MAX_CONCURRENCY")
+    llm_hedge: bool = Field(False, alias="LLM_HEDGE")
+    llm_hedge_percentile: float = Field(95, alias="LLM_HEDGE_PERCENTILE")
+    llm_hedge_min_ms: float = Field(250, alias="LLM_HEDGE_MIN_MS")
+
+    tool_timeout_seconds: float = Field(30, alias="TOOL_TIMEOUT_SECONDS")
+    tool_max_workers: int = Field(8, alias="TOOL_MAX_WORKERS")
+
+    write_behind_ack: str = Field("flush", alias="WRITE_BEHIND_ACK")
+    write_behind_batch_size: int = Field(500, alias="WRITE_BEHIND_BATCH_SIZE")
+    write_behind_flush_ms: float = Field(0, alias="WRITE_BEHIND_FLUSH_MS")
+    write_behind_max_pending: int = Field(10_000, alias="WRITE_BEHIND_MAX_PENDING")
+
+    memory_cache_sessions: int = Field(10_000, alias="MEMORY_CACHE_SESSIONS")
+    memory_cache_messages: int = Field(12, alias="MEMORY_CACHE_MESSAGES")
+    memory_cache_ttl_seconds: float = Field(300, alias="MEMORY_CACHE_TTL_SECONDS")
+    memory_retention_days: float = Field(0, alias="MEMORY_RETENTION_DAYS")
+    memory_retention_archive: bool = Field(False, alias="MEMORY_RETENTION_ARCHIVE")
+    memory_retention_interval_seconds: float = Field(
+        3600, alias="MEMORY_RETENTION_INTERVAL_SECONDS"
+    )
+    memory_retention_batch_size: int = Field(500, alias="MEMORY_RETENTION_BATCH_SIZE")
 
     embeddings_model: str = Field(
         "sentence-transformers/all-MiniLM-L6-v2", alias="EMBEDDINGS_MODEL"
     )
+    embeddings_backend: str = Field("sentence-transformers", alias="EMBEDDINGS_BACKEND")
+    embeddings_onnx_dir: str = Field("data/onnx", alias="EMBEDDINGS_ONNX_DIR")
+    embeddings_threads: int = Field(0, alias="EMBEDDINGS_THREADS")
+    embeddings_max_batch_size: int = Field(32, alias="EMBEDDINGS_MAX_BATCH_SIZE")
+    embeddings_max_wait_ms: float = Field(5.0, alias="EMBEDDINGS_MAX_WAIT_MS")
+    embeddings_socket: str = Field("", alias="EMBEDDINGS_SOCKET")
+    embeddings_timeout_seconds: float = Field(30, alias="EMBEDDINGS_TIMEOUT_SECONDS")
     rag_top_k: int = Field(4, alias="RAG_TOP_K")
+    rag_search_mode: str = Field("vector", alias="RAG_SEARCH_MODE")
+    rag_hybrid_candidates: int = Field(50, alias="RAG_HYBRID_CANDIDATES")
+    rag_rrf_k: int = Field(60, alias="RAG_RRF_K")
+    rag_iterative_scan: bool = Field(True, alias="RAG_ITERATIVE_SCAN")
+    rag_search_profile: str = Field("", alias="RAG_SEARCH_PROFILE")
+    retrieval_backend: str = Field("postgres", alias="RETRIEVAL_BACKEND")
+    local_index_path: str = Field("data/vector_index", alias="LOCAL_INDEX_PATH")
+    local_index_dtype: str = Field("float16", alias="LOCAL_INDEX_DTYPE")
+    local_index_ivf_lists: int = Field(0, alias="LOCAL_INDEX_IVF_LISTS")
+    local_index_nprobe: int = Field(8, alias="LOCAL_INDEX_NPROBE")
+    local_index_sync_seconds: float = Field(5.0, alias="LOCAL_INDEX_SYNC_SECONDS")
+    rag_quantization: str = Field("none", alias="RAG_QUANTIZATION")
+    rag_rescore_factor: int = Field(8, alias="RAG_RESCORE_FACTOR", ge=1, le=32)
+    search_batch_max_queries: int = Field(256, alias="SEARCH_BATCH_MAX_QUERIES")
+
+    vector_index_engine: str = Field("hnsw", alias="VECTOR_INDEX_ENGINE")
+    hnsw_m: int = Field(16, alias="HNSW_M")
+    hnsw_ef_construction: int = Field(64, alias="HNSW_EF_CONSTRUCTION")
+    vector_index_maintenance_work_mem: str = Field(
+        "512MB", alias="VECTOR_INDEX_MAINTENANCE_WORK_MEM"
+    )
+    query_cache_max_mb: int = Field(16, alias="QUERY_CACHE_MAX_MB")
+    query_cache_ttl_seconds: float = Field(3600, alias="QUERY_CACHE_TTL_SECONDS")
+    result_cache_max_mb: int = Field(32, alias="RESULT_CACHE_MAX_MB")
+    result_cache_ttl_seconds: float = Field(300, alias="RESULT_CACHE_TTL_SECONDS")
+    answer_cache_max_entries: int = Field(1000, alias="ANSWER_CACHE_MAX_ENTRIES")
+    answer_cache_ttl_seconds: float = Field(600, alias="ANSWER_CACHE_TTL_SECONDS")
+    invalidation_channel: str = Field("ai_rag_agent", alias="INVALIDATION_CHANNEL")
+    answer_cache_threshold: float = Field(0.92, alias="ANSWER_CACHE_THRESHOLD")
+    ingest_batch_size: int = Field(256, alias="INGEST_BATCH_SIZE")
+    ingest_job_workers: int = Field(2, alias="INGEST_JOB_WORKERS")
+    ingest_job_max_pending: int = Field(16, alias="INGEST_JOB_MAX_PENDING")
+    ingest_job_lease_seconds: float = Field(60.0, alias="INGEST_JOB_LEASE_SECONDS")
+    chunk_tokens: int = Field(200, alias="CHUNK_TOKENS")
+    chunk_overlap_tokens: int = Field(40, alias="CHUNK_OVERLAP_TOKENS")
+    upload_max_line_chars: int = Field(1_000_000, alias="UPLOAD_MAX_LINE_CHARS")
 
     app_env: str = Field("dev", alias="APP_ENV")
 
 
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
     return Settings()
@@ -1,19 +1,24 @@
-from typing import Any, Optional, Sequence
+from contextlib import contextmanager
+from typing import Any, ContextManager, Iterable, Iterator, Mapping, Optional, Sequence
 
-from pgvector.psycopg import register_vector
-from psycopg_pool import ConnectionPool
+from pgvector.psycopg import register_vector, register_vector_async
+from psycopg import Connection
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
 from psycopg.rows import dict_row
 from psycopg.types.json import Json
 
+from app.core.metrics import statement_tag, timed
+
 
 _pool: Optional[ConnectionPool] = None
+_async_pool: Optional[AsyncConnectionPool] = None
 
 
-def init_pool(dsn: str) -> None:
+def init_pool(dsn: str, max_size: int = 5) -> None:
     global _pool
     if _pool is not None:
         return
-    _pool = ConnectionPool(conninfo=dsn, min_size=1, max_size=5)
+    _pool = ConnectionPool(conninfo=dsn, min_size=1, max_size=max_size)
     with _pool.connection() as conn:
         register_vector(conn)
 
@@ -25,38 +30,168 @@ def close_pool() -> None:
         _pool = None
 
 
+async def init_async_pool(dsn: str, max_size: int = 20) -> None:
+    global _async_pool
+    if _async_pool is not None:
+        return
+    _async_pool = AsyncConnectionPool(
+        conninfo=dsn, min_size=1, max_size=max_size, open=False, configure=register_vector_async
+    )
+    await _async_pool.open()
+
+
+async def close_async_pool() -> None:
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
+
+
 def _get_pool() -> ConnectionPool:
     if _pool is None:
         raise RuntimeError("DB pool not initialized")
     return _pool
 
 
+def _get_async_pool() -> AsyncConnectionPool:
+    if _async_pool is None:
+        raise RuntimeError("Async DB pool not initialized")
+    return _async_pool
+
+
 def db_execute(query: str, params: Optional[Sequence[Any]] = None) -> None:
     pool = _get_pool()
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(query, _adapt_params(params))
-            conn.commit()
+    with _timed_query("execute", query):
+        with pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, _adapt_params(params))
+                conn.commit()
+
+
+def db_fetchall(
+    query: str,
+    params: Optional[Sequence[Any]] = None,
+    local_settings: Optional[Mapping[str, Any]] = None,
+) -> list[dict]:
+    pool = _get_pool()
+    with _timed_query("fetchall", query):
+        with pool.connection() as conn:
+            conn.row_factory = dict_row
+            with conn.cursor() as cur:
+                if local_settings:
+                    cur.execute(*_set_local_statement(local_settings))
+                cur.execute(query, _adapt_params(params))
+                results = list(cur.fetchall())
+                return [_convert_types(r) for r in results]
 
 
-def db_fetchall(query: str, params: Optional[Sequence[Any]] = None) -> list[dict]:
+def db_fetchone(query: str, params: Optional[Sequence[Any]] = None) -> Optional[dict]:
+    pool = _get_pool()
+    with _timed_query("fetchone", query):
+        with pool.connection() as conn:
+            conn.row_factory = dict_row
+            with conn.cursor() as cur:
+                cur.execute(query, _adapt_params(params))
+                row = cur.fetchone()
+                return _convert_types(dict(row)) if row else None
+
+
+async def adb_execute(query: str, params: Optional[Sequence[Any]] = None) -> None:
+    pool = _get_async_pool()
+    with _timed_query("execute", query):
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(query, _adapt_params(params))
+                await conn.commit()
+
+
+async def adb_fetchall(
+    query: str,
+    params: Optional[Sequence[Any]] = None,
+    local_settings: Optional[Mapping[str, Any]] = None,
+) -> list[dict]:
+    pool = _get_async_pool()
+    with _timed_query("fetchall", query):
+        async with pool.connection() as conn:
+            conn.row_factory = dict_row
+            async with conn.cursor() as cur:
+                if local_settings:
+                    await cur.execute(*_set_local_statement(local_settings))
+                await cur.execute(query, _adapt_params(params))
+                results = list(await cur.fetchall())
+                return [_convert_types(r) for r in results]
+
+
+async def adb_fetchone(query: str, params: Optional[Sequence[Any]] = None) -> Optional[dict]:
+    pool = _get_async_pool()
+    with _timed_query("fetchone", query):
+        async with pool.connection() as conn:
+            conn.row_factory = dict_row
+            async with conn.cursor() as cur:
+                await cur.execute(query, _adapt_params(params))
+                row = await cur.fetchone()
+                return _convert_types(dict(row)) if row else None
+
+
+@contextmanager
+def db_transaction() -> Iterator[Connection]:
+    """Check out one pooled connection and run everything inside a single transaction."""
     pool = _get_pool()
     with pool.connection() as conn:
-        conn.row_factory = dict_row
-        with conn.cursor() as cur:
-            cur.execute(query, _adapt_params(params))
-            results = list(cur.fetchall())
-            return [_convert_types(r) for r in results]
+        with conn.transaction():
+            yield conn
 
 
-def db_fetchone(query: str, params: Optional[Sequence[Any]] = None) -> Optional[dict]:
+@contextmanager
+def db_autocommit() -> Iterator[Connection]:
+    """Pooled connection in autocommit mode, for statements such as CREATE INDEX CONCURRENTLY."""
     pool = _get_pool()
     with pool.connection() as conn:
-        conn.row_factory = dict_row
-        with conn.cursor() as cur:
-            cur.execute(query, _adapt_params(params))
-            row = cur.fetchone()
-            return _convert_types(dict(row)) if row else None
+        conn.autocommit = True
+        try:
+            yield conn
+        finally:
+            conn.autocommit = False
+
+
+def db_conn_fetchall(
+    conn: Connection, query: str, params: Optional[Sequence[Any]] = None
+) -> list[dict]:
+    """Run a statement on a connection from ``db_transaction`` and return its rows."""
+    with _timed_query("fetchall", query), conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(query, _adapt_params(params))
+        return [_convert_types(row) for row in cur.fetchall()]
+
+
+def db_copy_rows(
+    conn: Connection, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]]
+) -> int:
+    count = 0
+    statement = f"copy {table} ({', '.join(columns)}) from stdin"
+    with _timed_query("copy", statement), conn.cursor() as cur:
+        with cur.copy(statement) as copy:
+            for row in rows:
+                copy.write_row(_adapt_params(row))
+                count += 1
+    return count
+
+
+def _timed_query(op: str, query: str) -> ContextManager[None]:
+    tag = statement_tag(query)
+    return timed("db_query_seconds", breakdown=f"db.{tag}", op=op, statement=tag)
+
+
+def _set_local_statement(settings: Mapping[str, Any]) -> tuple[str, Sequence[Any]]:
+    """One round trip of ``set_config(name, value, is_local => true)`` calls.
+
+    The values only last until the surrounding transaction ends, which for the
+    fetch helpers is the end of the pooled-connection block.
+    """
+    calls = ", ".join(["set_config(%s, %s, true)"] * len(settings))
+    params: list[Any] = []
+    for name, value in settings.items():
+        params.extend([name, str(value)])
+    return f"select {calls}", tuple(params)
 
 
 def _adapt_params(params: Optional[Sequence[Any]]) -> Optional[Sequence[Any]]:
@@ -0,0 +1,216 @@
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series: Dict[LabelKey, list] = {}
+
+    def observe(self, value: float, labels: LabelKey) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        counts, _, _ = series
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(labels, le=_format_value(bound))} "
+                    f"{bucket_count}"
+                )
+            lines.append(f"{self.name}_bucket{_format_labels(labels, le='+Inf')} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help_text = help_text
+        self._series: Dict[LabelKey, float] = {}
+
+    def inc(self, labels: LabelKey, amount: float = 1.0) -> None:
+        self._series[labels] = self._series.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._series.items()):
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text exposition format."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, Counter] = {}
+        self._collectors: Dict[str, Callable[[], dict]] = {}
+
+    def observe(self, name: str, seconds: float, help_text: str = "", **labels: str) -> None:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(name, help_text or name)
+            histogram.observe(seconds, _label_key(labels))
+
+    def inc(self, name: str, amount: float = 1.0, help_text: str = "", **labels: str) -> None:
+        with self._lock:
+            counter = self._counters.get(name)
+            if counter is None:
+                counter = self._counters[name] = Counter(name, help_text or name)
+            counter.inc(_label_key(labels), amount)
+
+    def register_collector(self, prefix: str, collect: Callable[[], dict]) -> None:
+        """Expose a ``stats()``-style dict as gauges named ``<prefix>_<key>``."""
+        self._collectors[prefix] = collect
+
+    def render(self) -> str:
+        with self._lock:
+            lines: list[str] = []
+            for histogram in self._histograms.values():
+                lines.extend(histogram.render())
+            for counter in self._counters.values():
+                lines.extend(counter.render())
+            collectors = list(self._collectors.items())
+        for prefix, collect in collectors:
+            lines.extend(_render_gauges(prefix, collect()))
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+@contextmanager
+def timed(name: str, breakdown: Optional[str] = None, **labels: str) -> Iterator[None]:
+    """Observe the block's duration in histogram ``name``.
+
+    When a request breakdown is active (see ``collect_timings``) the duration is also
+    added, in milliseconds, under ``breakdown``.
+    """
+    started = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.observe(name, elapsed, **labels)
+        if failed:
+            metrics.inc(f"{_strip_unit(name)}_errors_total", **labels)
+        timings = _request_timings.get()
+        if breakdown and timings is not None:
+            timings[breakdown] = round(timings.get(breakdown, 0.0) + elapsed * 1000, 3)
+
+
+@contextmanager
+def collect_timings(enabled: bool = True) -> Iterator[Optional[Dict[str, float]]]:
+    """Collect a per-request ``{stage: ms}`` breakdown from every ``timed`` block inside."""
+    if not enabled:
+        yield None
+        return
+    timings: Dict[str, float] = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+_WORD_RE = re.compile(r"[a-z_][a-z0-9_.]*")
+_TARGET_KEYWORD = {"select": "from", "delete": "from", "insert": "into"}
+
+
+def statement_tag(query: str) -> str:
+    """Low-cardinality label for a SQL statement, e.g. ``insert agent_messages``."""
+    words = _WORD_RE.findall(query.lower())
+    if not words:
+        return "unknown"
+    verb = words[0]
+    keyword = _TARGET_KEYWORD.get(verb)
+    if keyword is None:
+        return " ".join(words[:2])
+    for position, word in enumerate(words[:-1]):
+        # Skip "from (select ..." so subqueries are tagged by their innermost table.
+        if word == keyword and words[position + 1] != "select":
+            return f"{verb} {words[position + 1]}"
+    return verb
+
+
+def percentile(ordered: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted sample (0.0 when it is empty)."""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def _strip_unit(name: str) -> str:
+    return name[: -len("_seconds")] if name.endswith("_seconds") else name
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: LabelKey, **extra: str) -> str:
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    body = ",".join(f'{key}="{_escape(value)}"' for key, value in pairs)
+    return "{" + body + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _render_gauges(prefix: str, stats: dict) -> list[str]:
+    lines: list[str] = []
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, bool) or value is None:
+            continue
+        if isinstance(value, (int, float)):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_format_value(value)}")
+        elif isinstance(value, dict):
+            samples = [(k, v) for k, v in value.items() if isinstance(v, (int, float))]
+            if samples and len(samples) == len(value):
+                lines.append(f"# TYPE {name} gauge")
+                for label, sample in samples:
+                    lines.append(f'{name}{{key="{_escape(str(label))}"}} {_format_value(sample)}')
+            else:
+                lines.extend(_render_gauges(name, value))
+    return lines
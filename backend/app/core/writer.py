@@ -0,0 +1,262 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+import psycopg
+from psycopg import Connection
+
+from app.core.broadcast import get_broadcaster
+from app.core.config import get_settings
+from app.core.db import db_copy_rows, db_transaction
+from app.core.metrics import timed
+
+
+# Append-only tables the writer may buffer, with the columns callers supply. created_at is
+# stamped at enqueue time so rows keep their real order even when flushed together.
+TABLES: Dict[str, tuple[str, ...]] = {
+    "events": ("event_type", "payload"),
+    "agent_messages": ("session_id", "role", "content"),
+}
+# Writes other processes must hear about: the topic published, with the distinct values of
+# one column, in the same transaction, so it arrives once the rows are visible.
+NOTIFY_ON_COMMIT: Dict[str, tuple[str, int]] = {"agent_messages": ("sessions", 0)}
+ACK_MODES = ("flush", "enqueue")
+FLUSH_ATTEMPTS = 3
+
+
+class BufferFullError(RuntimeError):
+    """Raised by ``write`` when ``max_pending`` rows are already waiting to be flushed."""
+
+
+class RowRejectedError(ValueError):
+    """The database rejected this row (bad reference, invalid value); its batch was not."""
+
+
+class WriteBehindWriter:
+    """Buffer append-only inserts and flush them with one COPY per table per batch.
+
+    A background thread flushes whatever is queued, up to ``batch_size`` rows, using one
+    pooled connection for the whole batch. An idle writer flushes a row as soon as it
+    arrives; rows that arrive while a flush is in flight are batched into the next one
+    (group commit). ``flush_ms`` > 0 additionally holds a batch until that long after its
+    oldest row arrived, trading latency for larger batches.
+
+    With ``ack="flush"`` callers wait until their row is committed (fewer connections,
+    same durability); with ``ack="enqueue"`` they return immediately and rows still queued
+    are lost if the process dies before the next flush.
+
+    Connection failures retry the whole batch. A row the database rejects fails only its
+    own caller: the batch is split in halves, each COPYed under a savepoint, until the
+    rejected rows are isolated.
+    """
+
+    def __init__(
+        self,
+        ack: str = "flush",
+        batch_size: int = 500,
+        flush_ms: float = 0.0,
+        max_pending: int = 10_000,
+    ) -> None:
+        if ack not in ACK_MODES:
+            raise ValueError(f"Unknown write-behind ack mode: {ack}")
+        self.ack = ack
+        self.batch_size = max(1, batch_size)
+        self.flush_ms = max(0.0, flush_ms)
+        self.max_pending = max(1, max_pending)
+        self._queue: deque[tuple[str, tuple, Future, float]] = deque()
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._closing = False
+        self._flushes = 0
+        self._rows = 0
+        self._failed_rows = 0
+        self._rejected_rows = 0
+        self._last_error: Optional[str] = None
+        self._max_queue_depth = 0
+        self._queue_wait_ms_total = 0.0
+
+    def submit(self, table: str, values: Sequence[Any]) -> Future:
+        columns = TABLES.get(table)
+        if columns is None:
+            raise ValueError(f"Table {table} is not buffered")
+        if len(values) != len(columns):
+            raise ValueError(f"{table} rows need {len(columns)} values")
+        row = (*values, datetime.now(timezone.utc))
+        future: Future = Future()
+        with self._cond:
+            if len(self._queue) >= self.max_pending:
+                self._rejected_rows += 1
+                raise BufferFullError(f"{len(self._queue)} rows already waiting to be written")
+            self._ensure_worker()
+            self._queue.append((table, row, future, time.perf_counter()))
+            self._max_queue_depth = max(self._max_queue_depth, len(self._queue))
+            self._cond.notify()
+        return future
+
+    def write(self, table: str, values: Sequence[Any]) -> None:
+        future = self.submit(table, values)
+        if self.ack == "flush":
+            with timed("write_behind_wait_seconds", breakdown="db.write_behind", table=table):
+                future.result()
+
+    async def awrite(self, table: str, values: Sequence[Any]) -> None:
+        future = self.submit(table, values)
+        if self.ack == "flush":
+            with timed("write_behind_wait_seconds", breakdown="db.write_behind", table=table):
+                await asyncio.wrap_future(future)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Flush everything still queued and stop the worker."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+            worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+        with self._cond:
+            self._worker = None
+            self._closing = False
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self._max_queue_depth,
+                "flushes": self._flushes,
+                "rows": self._rows,
+                "avg_batch_size": round(self._rows / self._flushes, 2) if self._flushes else 0.0,
+                "avg_queue_wait_ms": (
+                    round(self._queue_wait_ms_total / self._rows, 3) if self._rows else 0.0
+                ),
+                "failed_rows": self._failed_rows,
+                "rejected_rows": self._rejected_rows,
+                "last_error": self._last_error,
+                "ack": self.ack,
+                "batch_size": self.batch_size,
+                "flush_ms": self.flush_ms,
+                "max_pending": self.max_pending,
+            }
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._worker.start()
+
+    def _next_batch(self) -> List[tuple[str, tuple, Future, float]]:
+        with self._cond:
+            while not self._queue and not self._closing:
+                self._cond.wait()
+            if self._queue and self.flush_ms and not self._closing:
+                deadline = self._queue[0][3] + self.flush_ms / 1000
+                while len(self._queue) < self.batch_size and not self._closing:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            size = min(len(self._queue), self.batch_size)
+            return [self._queue.popleft() for _ in range(size)]
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return  # closing and drained
+            started = time.perf_counter()
+            errors = self._flush(batch)
+            for (_, _, future, _), error in zip(batch, errors):
+                if error is None:
+                    future.set_result(None)
+                else:
+                    future.set_exception(error)
+            self._record(batch, errors, started)
+
+    def _flush(
+        self, batch: List[tuple[str, tuple, Future, float]]
+    ) -> List[Optional[Exception]]:
+        """One error slot per row, None for the rows that were written."""
+        items = [(index, table, row) for index, (table, row, _, _) in enumerate(batch)]
+        for attempt in range(FLUSH_ATTEMPTS):
+            errors: List[Optional[Exception]] = [None] * len(batch)
+            try:
+                with db_transaction() as conn:
+                    self._copy_isolating(conn, items, errors)
+                    self._notify(conn, items, errors)
+                return errors
+            except Exception as exc:  # retried, then reported to every waiting caller
+                error = exc
+                if attempt + 1 < FLUSH_ATTEMPTS:
+                    time.sleep(0.1 * 2**attempt)
+        return [error] * len(batch)
+
+    def _copy_isolating(
+        self,
+        conn: Connection,
+        items: List[tuple[int, str, tuple]],
+        errors: List[Optional[Exception]],
+    ) -> None:
+        try:
+            with conn.transaction():  # a savepoint: a rejected COPY leaves the rest intact
+                by_table: Dict[str, List[tuple]] = {}
+                for _, table, row in items:
+                    by_table.setdefault(table, []).append(row)
+                for table, rows in by_table.items():
+                    db_copy_rows(conn, table, (*TABLES[table], "created_at"), rows)
+        except psycopg.OperationalError:
+            raise  # the connection, not the rows: retry the whole batch
+        except psycopg.Error as exc:
+            if len(items) == 1:
+                errors[items[0][0]] = RowRejectedError(str(exc).strip())
+                return
+            middle = len(items) // 2
+            self._copy_isolating(conn, items[:middle], errors)
+            self._copy_isolating(conn, items[middle:], errors)
+
+    def _notify(
+        self,
+        conn: Connection,
+        items: List[tuple[int, str, tuple]],
+        errors: List[Optional[Exception]],
+    ) -> None:
+        changed: Dict[str, set] = {}
+        for index, table, row in items:
+            if errors[index] is None and table in NOTIFY_ON_COMMIT:
+                topic, column = NOTIFY_ON_COMMIT[table]
+                changed.setdefault(topic, set()).add(str(row[column]))
+        for topic, values in changed.items():
+            get_broadcaster().publish_in(conn, topic, sorted(values))
+
+    def _record(
+        self,
+        batch: List[tuple[str, tuple, Future, float]],
+        errors: List[Optional[Exception]],
+        started: float,
+    ) -> None:
+        written = [item for item, error in zip(batch, errors) if error is None]
+        with self._cond:
+            failed = len(batch) - len(written)
+            if failed:
+                self._failed_rows += failed
+                self._last_error = str(next(error for error in errors if error is not None))
+            if not written:
+                return
+            self._flushes += 1
+            self._rows += len(written)
+            self._queue_wait_ms_total += sum(
+                (started - queued) * 1000 for *_, queued in written
+            )
+
+
+@lru_cache(maxsize=1)
+def get_writer() -> WriteBehindWriter:
+    settings = get_settings()
+    return WriteBehindWriter(
+        ack=settings.write_behind_ack,
+        batch_size=settings.write_behind_batch_size,
+        flush_ms=settings.write_behind_flush_ms,
+        max_pending=settings.write_behind_max_pending,
+    )
@@ -1,25 +1,189 @@
+import asyncio
+import hashlib
+import json
+import re
 from functools import lru_cache
+from pathlib import Path
 from typing import List
 
-from sentence_transformers import SentenceTransformer
+import numpy as np
 
-from app.core.config import get_settings
+from app.core.config import Settings, get_settings
+from app.core.metrics import timed
 
 
 class EmbeddingEncoder:
     def __init__(self, model_name: str) -> None:
+        # Imported here so that importing the app (CLI, tests) does not pull in torch.
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
         self.model = SentenceTransformer(model_name)
 
     def embed(self, text: str) -> List[float]:
-        vector = self.model.encode([text], normalize_embeddings=True)[0]
+        with timed("encoder_seconds", breakdown="encoder.embed", op="embed"):
+            vector = self.model.encode([text], normalize_embeddings=True)[0]
+        return vector.tolist()
+
+    async def aembed(self, text: str) -> List[float]:
+        return await asyncio.to_thread(self.embed, text)
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        with timed("encoder_seconds", breakdown="encoder.embed_batch", op="embed_batch"):
+            vectors = self.model.encode(texts, normalize_embeddings=True)
+        return [vector.tolist() for vector in vectors]
+
+
+class HashingEncoder:
+    """Deterministic bag-of-words encoder: no model download, same vector for the same text.
+
+    Meant for benchmarks and local development; texts sharing words get similar vectors,
+    which is enough to exercise the ANN index and hybrid ranking realistically.
+    """
+
+    _TOKEN_RE = re.compile(r"\w+")
+
+    def __init__(self, dim: int = 384) -> None:
+        self.dim = dim
+        self.model_name = f"hashing-{dim}"
+
+    def embed(self, text: str) -> List[float]:
+        with timed("encoder_seconds", breakdown="encoder.embed", op="embed"):
+            vector = self._encode(text)
         return vector.tolist()
 
+    async def aembed(self, text: str) -> List[float]:
+        return self.embed(text)
+
     def embed_batch(self, texts: list[str]) -> list[list[float]]:
-        vectors = self.model.encode(texts, normalize_embeddings=True)
+        with timed("encoder_seconds", breakdown="encoder.embed_batch", op="embed_batch"):
+            vectors = [self._encode(text) for text in texts]
         return [vector.tolist() for vector in vectors]
 
+    def _encode(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in self._TOKEN_RE.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dim
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            vector[0] = 1.0
+            return vector
+        return vector / norm
+
+
+ONNX_FP32_FILE = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
+ONNX_CONFIG_FILE = "encoder.json"
+
+
+class OnnxEncoder:
+    """ONNX Runtime encoder for a model exported with ``python -m app.embeddings.onnx_export``.
+
+    Reproduces the sentence-transformers pipeline (tokenize, transformer, mean or CLS
+    pooling, L2 normalization) without importing torch. ``quantized`` loads the dynamically
+    int8-quantized graph instead of the float32 one.
+    """
+
+    # Texts are sorted by length and run in chunks of this size to keep padding small.
+    CHUNK_SIZE = 32
+
+    def __init__(self, model_dir: str, quantized: bool = False, threads: int = 0) -> None:
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        directory = Path(model_dir)
+        model_file = directory / (ONNX_INT8_FILE if quantized else ONNX_FP32_FILE)
+        if not model_file.exists():
+            flag = " --quantize" if quantized else ""
+            raise RuntimeError(
+                f"{model_file} not found; run: python -m app.embeddings.onnx_export export{flag}"
+            )
+        config = json.loads((directory / ONNX_CONFIG_FILE).read_text())
+        self.model_name = config["model_name"] + (":int8" if quantized else "")
+        self.pooling = config["pooling"]
+        self.dimension = config["dimension"]
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            str(model_file), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [node.name for node in self.session.get_inputs()]
+        self.tokenizer = Tokenizer.from_file(str(directory / "tokenizer.json"))
+        self.tokenizer.enable_truncation(config["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=config["pad_token_id"], pad_token=config["pad_token"])
+
+    def embed(self, text: str) -> List[float]:
+        with timed("encoder_seconds", breakdown="encoder.embed", op="embed"):
+            vector = self._encode([text])[0]
+        return vector.tolist()
+
+    async def aembed(self, text: str) -> List[float]:
+        return await asyncio.to_thread(self.embed, text)
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        with timed("encoder_seconds", breakdown="encoder.embed_batch", op="embed_batch"):
+            order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+            vectors: List[np.ndarray] = [np.empty(0)] * len(texts)
+            for start in range(0, len(order), self.CHUNK_SIZE):
+                chunk = order[start:start + self.CHUNK_SIZE]
+                for i, vector in zip(chunk, self._encode([texts[i] for i in chunk])):
+                    vectors[i] = vector
+        return [vector.tolist() for vector in vectors]
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        inputs = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": mask,
+            "token_type_ids": np.array(
+                [encoding.type_ids for encoding in encodings], dtype=np.int64
+            ),
+        }
+        hidden = self.session.run(None, {name: inputs[name] for name in self.input_names})[0]
+        if self.pooling == "cls":
+            pooled = hidden[:, 0]
+        else:
+            weights = mask[..., None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
 
 @lru_cache(maxsize=1)
 def get_encoder() -> EmbeddingEncoder:
     settings = get_settings()
+    if settings.embeddings_socket:
+        # The model lives in a shared embedding process (python -m app.serve --workers N).
+        from app.embeddings.remote import RemoteEncoder
+
+        return RemoteEncoder(
+            settings.embeddings_socket, timeout=settings.embeddings_timeout_seconds
+        )
+    return load_encoder(settings)
+
+
+def load_encoder(settings: Settings) -> EmbeddingEncoder:
+    """The in-process encoder for ``EMBEDDINGS_BACKEND``."""
+    if settings.embeddings_backend == "hashing":
+        return HashingEncoder()
+    if settings.embeddings_backend in ("onnx", "onnx-int8"):
+        encoder = OnnxEncoder(
+            settings.embeddings_onnx_dir,
+            quantized=settings.embeddings_backend == "onnx-int8",
+            threads=settings.embeddings_threads,
+        )
+        base_model = encoder.model_name.split(":")[0]
+        if base_model != settings.embeddings_model:
+            raise RuntimeError(
+                f"{settings.embeddings_onnx_dir} holds {base_model}, "
+                f"not EMBEDDINGS_MODEL={settings.embeddings_model}"
+            )
+        return encoder
+    if settings.embeddings_backend != "sentence-transformers":
+        raise RuntimeError(f"Unknown EMBEDDINGS_BACKEND: {settings.embeddings_backend}")
     return EmbeddingEncoder(settings.embeddings_model)
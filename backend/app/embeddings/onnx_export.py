@@ -0,0 +1,216 @@
+"""Export the embedding model to ONNX (optionally int8) and check parity with torch.
+
+    cd backend
+    python -m app.embeddings.onnx_export export --quantize
+    python -m app.embeddings.onnx_export parity --backends onnx,onnx-int8 --from-db 500
+
+``export`` needs torch and sentence-transformers (a build or dev machine); the exported
+directory is all the ``onnx``/``onnx-int8`` backends need at runtime.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.embeddings.encoder import (
+    ONNX_CONFIG_FILE,
+    ONNX_FP32_FILE,
+    ONNX_INT8_FILE,
+    EmbeddingEncoder,
+    OnnxEncoder,
+)
+
+
+SAMPLE_TEXTS = [
+    "What is the refund policy?",
+    "Refunds are processed within 14 days of the request.",
+    "Support hours are Monday to Friday, 9am to 6pm CET.",
+    "Necesito ayuda con facturacion. Cual es la politica?",
+    "SLA guarantees 99.9% uptime for Enterprise customers.",
+    "Payment methods accepted: Credit card, PayPal, Wire transfer.",
+    "How do I reset my password if I no longer have access to my email?",
+    "ticket",
+    "Invoices are generated monthly and sent to the registered email address. "
+    "Customers on annual plans receive a single invoice at the start of the term, "
+    "and any seats added mid-term are prorated on the following invoice.",
+]
+
+
+def export(model_name: str, output: Path, quantize: bool, opset: int = 14) -> dict:
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    output.mkdir(parents=True, exist_ok=True)
+    tokenizer.save_pretrained(str(output))  # writes tokenizer.json (fast tokenizer)
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [
+        name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample
+    ]
+
+    class LastHiddenState(torch.nn.Module):
+        def __init__(self, inner: torch.nn.Module) -> None:
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, *inputs: torch.Tensor) -> torch.Tensor:
+            return self.inner(**dict(zip(input_names, inputs)))[0]
+
+    axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    fp32_path = output / ONNX_FP32_FILE
+    with torch.no_grad():
+        torch.onnx.export(
+            LastHiddenState(transformer),
+            tuple(sample[name] for name in input_names),
+            str(fp32_path),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=axes,
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+
+    pooling = model[1].get_pooling_mode_str() if len(model) > 1 else "mean"
+    config = {
+        "model_name": model_name,
+        "dimension": model.get_sentence_embedding_dimension(),
+        "max_seq_length": model.max_seq_length,
+        "pooling": "cls" if pooling == "cls" else "mean",
+        "pad_token": tokenizer.pad_token,
+        "pad_token_id": tokenizer.pad_token_id,
+    }
+    (output / ONNX_CONFIG_FILE).write_text(json.dumps(config, indent=2))
+    files = {"fp32": fp32_path}
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = output / ONNX_INT8_FILE
+        quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+        files["int8"] = int8_path
+    return {
+        **config,
+        "files": {
+            name: {"path": str(path), "bytes": path.stat().st_size}
+            for name, path in files.items()
+        },
+    }
+
+
+def _timed_embed(encoder: object, texts: List[str]) -> tuple[np.ndarray, float]:
+    encoder.embed_batch(texts[:2])  # warm up (lazy allocations, thread pools)
+    started = time.perf_counter()
+    vectors = np.asarray(encoder.embed_batch(texts), dtype=np.float32)
+    return vectors, (time.perf_counter() - started) * 1000 / len(texts)
+
+
+def parity(backends: List[str], texts: List[str], model_dir: str, threads: int) -> dict:
+    """Cosine drift of each ONNX backend against the torch sentence-transformers baseline."""
+    settings = get_settings()
+    baseline, baseline_ms = _timed_embed(EmbeddingEncoder(settings.embeddings_model), texts)
+    report = {
+        "texts": len(texts),
+        "baseline": {
+            "backend": "sentence-transformers",
+            "dimension": int(baseline.shape[1]),
+            "ms_per_text": round(baseline_ms, 3),
+        },
+        "backends": [],
+    }
+    for backend in backends:
+        encoder = OnnxEncoder(model_dir, quantized=backend == "onnx-int8", threads=threads)
+        vectors, ms_per_text = _timed_embed(encoder, texts)
+        if vectors.shape != baseline.shape:
+            raise RuntimeError(f"{backend} returned {vectors.shape}, expected {baseline.shape}")
+        cosine = (vectors * baseline).sum(axis=1)
+        norm_error = np.abs(np.linalg.norm(vectors, axis=1) - 1).max()
+        # Do neighbourhoods survive? Nearest other text per text, same as the baseline's.
+        own = vectors @ vectors.T
+        base = baseline @ baseline.T
+        np.fill_diagonal(own, -np.inf)
+        np.fill_diagonal(base, -np.inf)
+        report["backends"].append(
+            {
+                "backend": backend,
+                "model_name": encoder.model_name,
+                "dimension": int(vectors.shape[1]),
+                "max_norm_error": round(float(norm_error), 6),
+                "cosine_mean": round(float(cosine.mean()), 6),
+                "cosine_p01": round(float(np.percentile(cosine, 1)), 6),
+                "cosine_min": round(float(cosine.min()), 6),
+                "nearest_neighbour_agreement": round(
+                    float((own.argmax(axis=1) == base.argmax(axis=1)).mean()), 4
+                ),
+                "ms_per_text": round(ms_per_text, 3),
+                "speedup": round(baseline_ms / ms_per_text, 2) if ms_per_text else None,
+            }
+        )
+    return report
+
+
+def _sample_documents(count: int) -> List[str]:
+    from app.core.db import close_pool, db_fetchall, init_pool
+
+    settings = get_settings()
+    init_pool(settings.database_url, max_size=1)
+    try:
+        rows = db_fetchall("select content from documents order by random() limit %s", (count,))
+    finally:
+        close_pool()
+    return [row["content"] for row in rows]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = commands.add_parser("export", help="export to ONNX (and int8 with --quantize)")
+    export_cmd.add_argument("--model", default=settings.embeddings_model)
+    export_cmd.add_argument("--output", type=Path, default=Path(settings.embeddings_onnx_dir))
+    export_cmd.add_argument("--quantize", action="store_true")
+    export_cmd.add_argument("--opset", type=int, default=14)
+
+    parity_cmd = commands.add_parser("parity", help="cosine drift against the torch baseline")
+    parity_cmd.add_argument(
+        "--backends", type=lambda value: value.split(","), default=["onnx", "onnx-int8"]
+    )
+    parity_cmd.add_argument("--model-dir", default=settings.embeddings_onnx_dir)
+    parity_cmd.add_argument("--texts", type=Path, help="file with one text per line")
+    parity_cmd.add_argument("--from-db", type=int, default=0, help="sample N stored documents")
+    parity_cmd.add_argument("--min-cosine", type=float, default=0.99)
+    parity_cmd.add_argument("--threads", type=int, default=settings.embeddings_threads)
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        print(json.dumps(export(args.model, args.output, args.quantize, args.opset), indent=2))
+        return
+
+    texts = list(SAMPLE_TEXTS)
+    if args.texts:
+        texts += [line for line in args.texts.read_text().splitlines() if line.strip()]
+    if args.from_db:
+        texts += _sample_documents(args.from_db)
+    report = parity(args.backends, texts, args.model_dir, args.threads)
+    print(json.dumps(report, indent=2))
+    drifted = [
+        result["backend"]
+        for result in report["backends"]
+        if result["cosine_min"] < args.min_cosine
+    ]
+    if drifted:
+        print(f"cosine below {args.min_cosine} for: {', '.join(drifted)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Shared embedding process: one model per node, reached by API workers over a Unix socket.
+
+    cd backend
+    python -m app.embeddings.remote serve --socket /tmp/ai-rag-embeddings.sock
+    python -m app.embeddings.remote stats --socket /tmp/ai-rag-embeddings.sock
+
+``python -m app.serve --workers N`` starts the server and points every worker at it
+(``EMBEDDINGS_SOCKET``), so the model is loaded once instead of once per worker. Texts
+from all workers are coalesced by one ``EmbeddingScheduler``, so concurrent requests in
+different workers still share an encode call.
+
+Each message is a frame: two big-endian uint32 lengths, a JSON header and a binary
+payload. Requests are ``{"op": "embed", "texts": [...]}``, ``{"op": "info"}`` or
+``{"op": "stats"}``; embed replies carry ``{"count", "dim"}`` and ``count * dim``
+little-endian float32 values.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.core.metrics import timed
+from app.embeddings.encoder import load_encoder
+from app.embeddings.scheduler import EmbeddingScheduler
+
+
+FRAME = struct.Struct("!II")
+VECTOR_DTYPE = np.dtype("<f4")
+CONNECT_TIMEOUT_SECONDS = 30.0
+REQUEST_TIMEOUT_SECONDS = 30.0
+# How long a request keeps retrying the connect while the embedding process restarts.
+RECONNECT_SECONDS = 5.0
+IDLE_CONNECTIONS = 8
+
+
+class RemoteEncoderError(RuntimeError):
+    """The embedding process answered with an error or could not be reached."""
+
+
+def _pack(header: Dict[str, Any], payload: bytes = b"") -> bytes:
+    body = json.dumps(header).encode()
+    return FRAME.pack(len(body), len(payload)) + body + payload
+
+
+def _exchange(sock: socket.socket, frame: bytes) -> tuple[Dict[str, Any], bytes]:
+    sock.sendall(frame)
+    header_size, payload_size = FRAME.unpack(_recv_exactly(sock, FRAME.size))
+    reply = json.loads(_recv_exactly(sock, header_size))
+    return reply, _recv_exactly(sock, payload_size)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    chunks = bytearray()
+    while len(chunks) < size:
+        chunk = sock.recv(size - len(chunks))
+        if not chunk:
+            raise ConnectionError("embedding process closed the connection")
+        chunks += chunk
+    return bytes(chunks)
+
+
+class RemoteEncoder:
+    """Encoder interface (``embed``/``aembed``/``embed_batch``) backed by the shared process.
+
+    Blocking sockets with a ``timeout``, one request at a time per connection; up to
+    ``IDLE_CONNECTIONS`` are kept open for reuse. A request that fails on a reused
+    connection is retried once on a fresh one, since the embedding process may have been
+    restarted; connecting is retried with backoff for up to ``RECONNECT_SECONDS``. Any
+    failure to get a reply is raised as ``RemoteEncoderError``.
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        connect_timeout: float = CONNECT_TIMEOUT_SECONDS,
+        timeout: float = REQUEST_TIMEOUT_SECONDS,
+    ):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._idle: List[socket.socket] = []
+        self._lock = threading.Lock()
+        info = self._wait_for_server(connect_timeout)
+        self.model_name = info["model_name"]
+        self.dimension = info.get("dimension")
+
+    def embed(self, text: str) -> List[float]:
+        with timed("encoder_seconds", breakdown="encoder.embed", op="embed"):
+            return self._embed([text])[0]
+
+    async def aembed(self, text: str) -> List[float]:
+        return await asyncio.to_thread(self.embed, text)
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        with timed("encoder_seconds", breakdown="encoder.embed_batch", op="embed_batch"):
+            return self._embed(texts)
+
+    def server_stats(self) -> Dict[str, Any]:
+        return self._request({"op": "stats"})[0]
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        header, payload = self._request({"op": "embed", "texts": texts})
+        vectors = np.frombuffer(payload, dtype=VECTOR_DTYPE)
+        return vectors.reshape(header["count"], header["dim"]).tolist()
+
+    def _request(
+        self, header: Dict[str, Any], deadline: Optional[float] = None
+    ) -> tuple[Dict[str, Any], bytes]:
+        frame = _pack(header)
+        with self._lock:
+            sock = self._idle.pop() if self._idle else None
+        if sock is not None:
+            try:
+                reply, payload = _exchange(sock, frame)
+            except TimeoutError as exc:
+                sock.close()  # a slow process would be as slow on a fresh connection
+                raise self._unreachable(exc) from exc
+            except OSError:
+                sock.close()
+                sock = None
+        if sock is None:
+            sock = self._connect(deadline)
+            try:
+                reply, payload = _exchange(sock, frame)
+            except OSError as exc:
+                sock.close()
+                raise self._unreachable(exc) from exc
+        self._checkin(sock)
+        if "error" in reply:
+            raise RemoteEncoderError(reply["error"])
+        return reply, payload
+
+    def _connect(self, deadline: Optional[float] = None) -> socket.socket:
+        """Connect, retrying with backoff until ``deadline`` (default ``RECONNECT_SECONDS``)."""
+        if deadline is None:
+            deadline = time.monotonic() + RECONNECT_SECONDS
+        delay = 0.05
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+                return sock
+            except OSError as exc:
+                sock.close()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise self._unreachable(exc) from exc
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 1.0)
+
+    def _unreachable(self, exc: OSError) -> RemoteEncoderError:
+        return RemoteEncoderError(
+            f"No reply from the embedding process on {self.socket_path}: {exc}"
+        )
+
+    def _checkin(self, sock: socket.socket) -> None:
+        with self._lock:
+            if len(self._idle) < IDLE_CONNECTIONS:
+                self._idle.append(sock)
+                return
+        sock.close()
+
+    def _wait_for_server(self, timeout: float) -> Dict[str, Any]:
+        """The embedding process may still be loading the model when a worker starts."""
+        return self._request({"op": "info"}, deadline=time.monotonic() + timeout)[0]
+
+
+class EmbeddingServer:
+    """Serve one encoder to every API worker on the node."""
+
+    def __init__(self, scheduler: EmbeddingScheduler, socket_path: str) -> None:
+        self.scheduler = scheduler
+        self.socket_path = socket_path
+        # Also loads whatever the model initializes lazily before the first worker connects.
+        self.dimension = len(scheduler.embed_batch(["warm up"])[0])
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+
+    async def serve(self) -> None:
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # left behind by a previous run
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        async with server:
+            await server.serve_forever()
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "model_name": self.scheduler.model_name,
+            "dimension": self.dimension,
+            "pid": os.getpid(),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.info(),
+            "connections": self.connections,
+            "requests": self.requests,
+            "errors": self.errors,
+            "scheduler": self.scheduler.stats(),
+        }
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    header_size, payload_size = FRAME.unpack(
+                        await reader.readexactly(FRAME.size)
+                    )
+                    request = json.loads(await reader.readexactly(header_size))
+                    await reader.readexactly(payload_size)
+                except asyncio.IncompleteReadError:
+                    return  # the worker closed the connection
+                writer.write(await self._reply(request))
+                await writer.drain()
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _reply(self, request: Dict[str, Any]) -> bytes:
+        self.requests += 1
+        op = request.get("op")
+        try:
+            if op == "info":
+                return _pack(self.info())
+            if op == "stats":
+                return _pack(self.stats())
+            if op != "embed":
+                raise ValueError(f"Unknown op: {op}")
+            texts = request["texts"]
+            if len(texts) <= self.scheduler.max_batch_size:
+                # Coalesced with texts from other workers into shared encode calls.
+                vectors = await asyncio.gather(
+                    *(asyncio.wrap_future(self.scheduler.submit(text)) for text in texts)
+                )
+            else:
+                vectors = await asyncio.to_thread(self.scheduler.embed_batch, texts)
+            matrix = np.asarray(vectors, dtype=VECTOR_DTYPE)
+            return _pack({"count": len(texts), "dim": matrix.shape[1]}, matrix.tobytes())
+        except Exception as exc:
+            self.errors += 1
+            return _pack({"error": f"{type(exc).__name__}: {exc}"})
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("serve", "stats"))
+    parser.add_argument("--socket", default=settings.embeddings_socket)
+    args = parser.parse_args(argv)
+    if not args.socket:
+        parser.error("--socket (or EMBEDDINGS_SOCKET) is required")
+
+    if args.command == "stats":
+        print(json.dumps(RemoteEncoder(args.socket, connect_timeout=0).server_stats(), indent=2))
+        return
+    scheduler = EmbeddingScheduler(
+        load_encoder(settings),
+        max_batch_size=settings.embeddings_max_batch_size,
+        max_wait_ms=settings.embeddings_max_wait_ms,
+    )
+    asyncio.run(EmbeddingServer(scheduler, args.socket).serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import List, Optional
+
+from app.core.config import get_settings
+from app.core.metrics import timed
+from app.embeddings.encoder import EmbeddingEncoder, get_encoder
+
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class EmbeddingScheduler:
+    """Coalesce concurrent single-text ``embed`` calls into one ``encode`` call.
+
+    Callers block on their own future while a background thread drains the queue
+    in batches of up to ``max_batch_size``, waiting at most ``max_wait_ms`` after
+    the first queued text for more work to arrive.
+    """
+
+    def __init__(
+        self, encoder: EmbeddingEncoder, max_batch_size: int = 32, max_wait_ms: float = 5.0
+    ) -> None:
+        self.encoder = encoder
+        self.model_name = encoder.model_name
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self._queue: deque[tuple[str, Future, float]] = deque()
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._batches = 0
+        self._texts = 0
+        self._max_queue_depth = 0
+        self._queue_wait_ms_total = 0.0
+        self._histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self._histogram_overflow = 0
+
+    def submit(self, text: str) -> Future:
+        future: Future = Future()
+        with self._cond:
+            self._ensure_worker()
+            self._queue.append((text, future, time.perf_counter()))
+            self._max_queue_depth = max(self._max_queue_depth, len(self._queue))
+            self._cond.notify()
+        return future
+
+    def embed(self, text: str) -> List[float]:
+        with timed("embedding_scheduler_wait_seconds", breakdown="encoder.scheduled_embed"):
+            return self.submit(text).result()
+
+    async def aembed(self, text: str) -> List[float]:
+        with timed("embedding_scheduler_wait_seconds", breakdown="encoder.scheduled_embed"):
+            return await asyncio.wrap_future(self.submit(text))
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        return self.encoder.embed_batch(texts)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self._max_queue_depth,
+                "batches": self._batches,
+                "texts": self._texts,
+                "avg_batch_size": round(self._texts / self._batches, 2) if self._batches else 0.0,
+                "avg_queue_wait_ms": (
+                    round(self._queue_wait_ms_total / self._texts, 3) if self._texts else 0.0
+                ),
+                "batch_size_histogram": {
+                    **{f"le_{bucket}": count for bucket, count in self._histogram.items()},
+                    "overflow": self._histogram_overflow,
+                },
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+            }
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(
+                target=self._run, name="embedding-scheduler", daemon=True
+            )
+            self._worker.start()
+
+    def _next_batch(self) -> list[tuple[str, Future, float]]:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            deadline = time.perf_counter() + self.max_wait_ms / 1000
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            size = min(len(self._queue), self.max_batch_size)
+            return [self._queue.popleft() for _ in range(size)]
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            started = time.perf_counter()
+            try:
+                vectors = self.encoder.embed_batch([text for text, _, _ in batch])
+            except Exception as exc:  # propagate to every waiting caller
+                for _, future, _ in batch:
+                    future.set_exception(exc)
+            else:
+                for (_, future, _), vector in zip(batch, vectors):
+                    future.set_result(vector)
+            self._record(batch, started)
+
+    def _record(self, batch: list[tuple[str, Future, float]], started: float) -> None:
+        with self._cond:
+            self._batches += 1
+            self._texts += len(batch)
+            self._queue_wait_ms_total += sum((started - queued) * 1000 for _, _, queued in batch)
+            for bucket in BATCH_SIZE_BUCKETS:
+                if len(batch) <= bucket:
+                    self._histogram[bucket] += 1
+                    break
+            else:
+                self._histogram_overflow += 1
+
+
+@lru_cache(maxsize=1)
+def get_scheduler() -> EmbeddingScheduler:
+    settings = get_settings()
+    return EmbeddingScheduler(
+        get_encoder(),
+        max_batch_size=settings.embeddings_max_batch_size,
+        max_wait_ms=settings.embeddings_max_wait_ms,
+    )
@@ -1,13 +1,16 @@
 from pathlib import Path
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.routes import router as api_router
+from app.container import close_container, init_container
 from app.core.config import get_settings
-from app.core.db import close_pool, init_pool
+from app.agent.llm import close_async_client
+from app.core.db import close_async_pool, close_pool, init_async_pool, init_pool
+from app.embeddings.remote import RemoteEncoderError
 
 
 settings = get_settings()
@@ -15,12 +18,17 @@ app = FastAPI(title="AI Agent RAG API", version="1.0.0")
 
 
 @app.on_event("startup")
-def on_startup() -> None:
-    init_pool(settings.database_url)
+async def on_startup() -> None:
+    init_pool(settings.database_url, max_size=settings.db_pool_max_size)
+    await init_async_pool(settings.database_url, max_size=settings.db_async_pool_max_size)
+    await init_container()
 
 
 @app.on_event("shutdown")
-def on_shutdown() -> None:
+async def on_shutdown() -> None:
+    await close_container()
+    await close_async_client()
+    await close_async_pool()
     close_pool()
 
 
@@ -35,6 +43,14 @@ app.add_middleware(
 
 app.include_router(api_router)
 
+
+@app.exception_handler(RemoteEncoderError)
+async def embedding_process_error(request: Request, exc: RemoteEncoderError) -> JSONResponse:
+    """Any route that embeds text fails with 503 while the shared embedding process is down."""
+    return JSONResponse(
+        status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"}
+    )
+
 # Serve static files
 static_dir = Path(__file__).parent / "static"
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
@@ -0,0 +1,318 @@
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Hashable, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.broadcast import get_broadcaster
+from app.core.config import get_settings
+
+
+class TTLCache:
+    """Thread-safe LRU cache bounded by an estimated byte size, with per-entry TTL.
+
+    ``clear`` bumps ``generation``. A caller that computes a value from the database reads
+    the generation first and passes it to ``set``, which drops the value if the cache was
+    cleared in the meantime (it may predate the change that cleared it).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_bytes: int,
+        ttl_seconds: float,
+        sizeof: Callable[[Any], int] = sys.getsizeof,
+    ) -> None:
+        self.name = name
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._sizeof = sizeof
+        self._entries: OrderedDict[Hashable, tuple[Any, float, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_sets = 0
+        self.generation = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        size = self._sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                self.stale_sets += 1
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.invalidations += 1
+            self.generation += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "stale_sets": self.stale_sets,
+            }
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    source_ids: tuple
+    generation_seconds: float
+    expires_at: float
+    last_used: float
+
+
+class SemanticAnswerCache:
+    """Answers to recent questions, found again by embedding similarity.
+
+    A hit needs cosine similarity >= ``threshold`` to a cached question *and* the same
+    retrieved source ids, so a paraphrase only reuses an answer grounded in the same
+    documents. Holds at most ``max_entries`` (least recently used evicted first), each for
+    ``ttl_seconds``; the embeddings live in one matrix so a lookup is a single product.
+    ``generation`` works as in ``TTLCache``: an answer generated across a ``clear`` is
+    not stored.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, threshold: float) -> None:
+        self.max_entries = max(0, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._vectors: Optional[np.ndarray] = None  # allocated on the first ``set``
+        self._entries: List[Optional[CachedAnswer]] = [None] * self.max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_sets = 0
+        self.saved_seconds = 0.0
+        self.generation = 0
+
+    def get(self, vector: Sequence[float], source_ids: Sequence[Any]) -> Optional[CachedAnswer]:
+        source_ids = tuple(str(source_id) for source_id in source_ids)
+        with self._lock:
+            if self._vectors is None:
+                self.misses += 1
+                return None
+            now = time.monotonic()
+            similarities = self._vectors @ np.asarray(vector, dtype=np.float32)
+            candidates = np.flatnonzero(similarities >= self.threshold)
+            for slot in candidates[np.argsort(-similarities[candidates])]:
+                entry = self._entries[slot]
+                if entry is None:
+                    continue
+                if entry.expires_at <= now:
+                    self._drop(slot)
+                    self.expirations += 1
+                    continue
+                if entry.source_ids == source_ids:
+                    entry.last_used = now
+                    self.hits += 1
+                    self.saved_seconds += entry.generation_seconds
+                    return entry
+            self.misses += 1
+            return None
+
+    def set(
+        self,
+        question: str,
+        vector: Sequence[float],
+        source_ids: Sequence[Any],
+        answer: str,
+        generation_seconds: float,
+        generation: Optional[int] = None,
+    ) -> None:
+        if not self.max_entries:
+            return
+        now = time.monotonic()
+        entry = CachedAnswer(
+            question=question,
+            answer=answer,
+            source_ids=tuple(str(source_id) for source_id in source_ids),
+            generation_seconds=generation_seconds,
+            expires_at=now + self.ttl_seconds,
+            last_used=now,
+        )
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                self.stale_sets += 1
+                return
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            slot = self._free_slot()
+            self._vectors[slot] = vector
+            self._entries[slot] = entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries = [None] * self.max_entries
+            if self._vectors is not None:
+                self._vectors[:] = 0
+            self.invalidations += 1
+            self.generation += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": sum(entry is not None for entry in self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "stale_sets": self.stale_sets,
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
+
+    def _free_slot(self) -> int:
+        now = time.monotonic()
+        oldest, oldest_used = 0, float("inf")
+        for slot, entry in enumerate(self._entries):
+            if entry is None:
+                return slot
+            if entry.expires_at <= now:
+                self._drop(slot)
+                self.expirations += 1
+                return slot
+            if entry.last_used < oldest_used:
+                oldest, oldest_used = slot, entry.last_used
+        self.evictions += 1
+        return oldest
+
+    def _drop(self, slot: int) -> None:
+        self._entries[slot] = None
+        self._vectors[slot] = 0
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def vector_size(vector: List[float]) -> int:
+    return 64 + 8 * len(vector)
+
+
+def rows_size(rows: List[dict]) -> int:
+    size = 64
+    for row in rows:
+        size += 256 + len(str(row.get("content", ""))) + len(json.dumps(row.get("metadata") or {}))
+    return size
+
+
+def result_key(vector: List[float], top_k: int, **options: Any) -> tuple:
+    return (tuple(vector), top_k, json.dumps(options, sort_keys=True, default=str))
+
+
+@lru_cache(maxsize=1)
+def get_query_cache() -> TTLCache:
+    settings = get_settings()
+    return TTLCache(
+        "query_embeddings",
+        max_bytes=settings.query_cache_max_mb * 1024 * 1024,
+        ttl_seconds=settings.query_cache_ttl_seconds,
+        sizeof=vector_size,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_result_cache() -> TTLCache:
+    settings = get_settings()
+    return TTLCache(
+        "search_results",
+        max_bytes=settings.result_cache_max_mb * 1024 * 1024,
+        ttl_seconds=settings.result_cache_ttl_seconds,
+        sizeof=rows_size,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_answer_cache() -> SemanticAnswerCache:
+    settings = get_settings()
+    return SemanticAnswerCache(
+        max_entries=settings.answer_cache_max_entries,
+        ttl_seconds=settings.answer_cache_ttl_seconds,
+        threshold=settings.answer_cache_threshold,
+    )
+
+
+def invalidate_results(broadcast: bool = True) -> None:
+    """Called whenever documents change; cached answers may quote the old content.
+
+    With ``broadcast`` the other API processes clear theirs too (``clear_results``).
+    """
+    clear_results()
+    if broadcast:
+        get_broadcaster().publish("results")
+
+
+def clear_results(_: Any = None) -> None:
+    """Drop this process's cached search results and answers."""
+    get_result_cache().clear()
+    get_answer_cache().clear()
+
+
+def cache_stats() -> dict:
+    return {
+        "query_embeddings": get_query_cache().stats(),
+        "search_results": get_result_cache().stats(),
+        "answers": get_answer_cache().stats(),
+    }
@@ -0,0 +1,83 @@
+import re
+from typing import Iterator, List, Optional, Tuple
+
+
+# Words and punctuation counted separately, the same pre-tokenization BERT-style models
+# use before WordPiece; keep chunk_tokens a little under the model limit (256 for MiniLM)
+# since WordPiece can split rare words further.
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_PIECE_RE = re.compile(r"\S+\s*|\s+")
+_TOKEN_PIECE_RE = re.compile(r"(?:\w+|[^\w\s])\s*")
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+
+
+def count_tokens(text: str) -> int:
+    return len(_TOKEN_RE.findall(text))
+
+
+class TokenChunker:
+    """Incremental fixed-size chunker with token overlap.
+
+    ``feed`` accepts text in any number of pieces (split on whitespace boundaries, e.g.
+    whole lines) and yields each chunk as soon as it is full, so only one chunk is held
+    in memory at a time. Chunks break at whitespace, or between tokens inside a run too
+    long to fit one.
+    """
+
+    def __init__(self, chunk_tokens: int, overlap_tokens: int = 0) -> None:
+        if chunk_tokens < 1:
+            raise ValueError("chunk_tokens must be positive")
+        if not 0 <= overlap_tokens < chunk_tokens:
+            raise ValueError("overlap_tokens must be between 0 and chunk_tokens - 1")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self._pieces: List[Tuple[str, int]] = []
+        self._tokens = 0
+        self._fresh = 0  # tokens added since the last emitted chunk
+
+    def feed(self, text: str) -> Iterator[str]:
+        for piece in _PIECE_RE.findall(text):
+            tokens = count_tokens(piece)
+            if tokens > self.chunk_tokens - self.overlap_tokens:
+                # Too long to fit a chunk with no whitespace to break at (a CSV line,
+                # minified JSON): split it between tokens instead.
+                for part in _TOKEN_PIECE_RE.findall(piece):
+                    yield from self._add(part, 1)
+            else:
+                yield from self._add(piece, tokens)
+
+    def flush(self) -> Iterator[str]:
+        """Emit whatever is left, unless it is only the overlap of the previous chunk."""
+        if self._fresh and self._tokens:
+            chunk = "".join(piece for piece, _ in self._pieces).strip()
+            if chunk:
+                yield chunk
+        self._pieces = []
+        self._tokens = 0
+        self._fresh = 0
+
+    def _add(self, piece: str, tokens: int) -> Iterator[str]:
+        self._pieces.append((piece, tokens))
+        self._tokens += tokens
+        self._fresh += tokens
+        if self._tokens >= self.chunk_tokens:
+            yield self._emit()
+
+    def _emit(self) -> str:
+        chunk = "".join(piece for piece, _ in self._pieces).strip()
+        kept: List[Tuple[str, int]] = []
+        kept_tokens = 0
+        for piece, tokens in reversed(self._pieces):
+            if kept_tokens + tokens > self.overlap_tokens:
+                break
+            kept.append((piece, tokens))
+            kept_tokens += tokens
+        self._pieces = kept[::-1]
+        self._tokens = kept_tokens
+        self._fresh = 0
+        return chunk
+
+
+def markdown_heading(line: str) -> Optional[str]:
+    match = _HEADING_RE.match(line)
+    return match.group(2) if match else None
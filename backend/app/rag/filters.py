@@ -0,0 +1,91 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+from psycopg.types.json import Jsonb
+
+
+def build_filter_clause(filters: Optional[Dict[str, Any]]) -> tuple[str, Sequence[Any]]:
+    """Translate a metadata filter into a SQL predicate over ``documents.metadata``.
+
+    Supported forms, combined with AND::
+
+        {"category": "billing"}                 equality
+        {"source": {"in": ["kb", "demo"]}}      any of the values
+        {"sku": {"exists": true}}               key present (false: key absent)
+
+    Every predicate is written with ``@>`` or ``?`` so the GIN index on ``metadata``
+    can serve it. Returns ``("true", ())`` when there is nothing to filter on.
+    """
+    if not filters:
+        return "true", ()
+    if not isinstance(filters, dict):
+        raise ValueError("filters must be an object")
+
+    clauses: List[str] = []
+    params: List[Any] = []
+    equals: Dict[str, Any] = {}
+    for key, condition in filters.items():
+        if not isinstance(condition, dict):
+            equals[key] = condition
+            continue
+        if set(condition) - {"in", "exists", "eq"} or len(condition) != 1:
+            raise ValueError(f"Unsupported filter for '{key}': {condition}")
+        if "eq" in condition:
+            equals[key] = condition["eq"]
+        elif "in" in condition:
+            values = condition["in"]
+            if not isinstance(values, list) or not values:
+                raise ValueError(f"Filter 'in' for '{key}' must be a non-empty list")
+            clauses.append("(" + " or ".join(["metadata @> %s"] * len(values)) + ")")
+            params.extend(Jsonb({key: value}) for value in values)
+        else:
+            clauses.append("metadata ? %s" if condition["exists"] else "not (metadata ? %s)")
+            params.append(key)
+    if equals:
+        clauses.insert(0, "metadata @> %s")
+        params.insert(0, Jsonb(equals))
+    return " and ".join(clauses), tuple(params)
+
+
+def matches_filter(metadata: Optional[Dict[str, Any]], filters: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a ``build_filter_clause`` filter in Python (same semantics, no database)."""
+    if not filters:
+        return True
+    if not isinstance(filters, dict):
+        raise ValueError("filters must be an object")
+    metadata = metadata or {}
+    for key, condition in filters.items():
+        if not isinstance(condition, dict):
+            condition = {"eq": condition}
+        if set(condition) - {"in", "exists", "eq"} or len(condition) != 1:
+            raise ValueError(f"Unsupported filter for '{key}': {condition}")
+        if "eq" in condition:
+            if key not in metadata or not _contains(metadata[key], condition["eq"]):
+                return False
+        elif "in" in condition:
+            values = condition["in"]
+            if not isinstance(values, list) or not values:
+                raise ValueError(f"Filter 'in' for '{key}' must be a non-empty list")
+            if key not in metadata or not any(_contains(metadata[key], v) for v in values):
+                return False
+        elif (key in metadata) != bool(condition["exists"]):
+            return False
+    return True
+
+
+def _contains(stored: Any, wanted: Any) -> bool:
+    """jsonb ``@>`` containment for one value."""
+    if isinstance(wanted, dict):
+        return isinstance(stored, dict) and all(
+            key in stored and _contains(stored[key], value) for key, value in wanted.items()
+        )
+    if isinstance(wanted, list):
+        if not isinstance(stored, list):
+            return False
+        return all(any(_contains(item, value) for item in stored) for value in wanted)
+    if _numbers(stored, wanted):
+        return stored == wanted
+    return type(stored) is type(wanted) and stored == wanted
+
+
+def _numbers(*values: Any) -> bool:
+    return all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values)
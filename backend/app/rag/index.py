@@ -0,0 +1,197 @@
+import argparse
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from app.core.config import get_settings
+from app.core.db import close_pool, db_autocommit, db_fetchone, init_pool
+from app.rag.cache import invalidate_results
+
+
+INDEX_NAME = "documents_embedding_idx"
+ENGINES = ("hnsw", "ivfflat")
+EMBEDDING_DIMENSIONS = 384
+
+
+@dataclass(frozen=True)
+class Representation:
+    """How ``documents.embedding`` is indexed and compared in the first search stage."""
+
+    index_name: str
+    column: str
+    opclass: str
+    query: str
+    operator: str
+
+
+# Quantized representations are expression indexes over the float vector, so nothing extra
+# is stored in the table; the index itself is 2x (halfvec) or 32x (bit) smaller.
+REPRESENTATIONS: Dict[str, Representation] = {
+    "none": Representation(INDEX_NAME, "embedding", "vector_cosine_ops", "%s", "<=>"),
+    "halfvec": Representation(
+        "documents_embedding_half_idx",
+        f"(embedding::halfvec({EMBEDDING_DIMENSIONS}))",
+        "halfvec_cosine_ops",
+        f"%s::halfvec({EMBEDDING_DIMENSIONS})",
+        "<=>",
+    ),
+    "binary": Representation(
+        "documents_embedding_bit_idx",
+        f"(binary_quantize(embedding)::bit({EMBEDDING_DIMENSIONS}))",
+        "bit_hamming_ops",
+        f"binary_quantize(%s::vector)::bit({EMBEDDING_DIMENSIONS})",
+        "<~>",
+    ),
+}
+
+# Recall/latency profiles, applied with SET LOCAL for a single search transaction.
+# ivfflat.probes = lists scanned per query; hnsw.ef_search = candidate list size.
+# Both are set, so a profile works whichever engine the live index was built with (a
+# rebuild may have switched it away from VECTOR_INDEX_ENGINE).
+SEARCH_PROFILES: Dict[str, Dict[str, int]] = {
+    "fast": {"ivfflat.probes": 1, "hnsw.ef_search": 16},
+    "balanced": {"ivfflat.probes": 10, "hnsw.ef_search": 40},
+    "accurate": {"ivfflat.probes": 40, "hnsw.ef_search": 200},
+}
+# pgvector's default and maximum; an HNSW scan returns at most ef_search rows.
+HNSW_DEFAULT_EF_SEARCH = 40
+HNSW_MAX_EF_SEARCH = 1000
+
+
+def recommended_lists(row_count: int) -> int:
+    """pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond."""
+    if row_count <= 1_000_000:
+        return max(10, row_count // 1000)
+    return int(math.sqrt(row_count))
+
+
+def profile_settings(profile: Optional[str]) -> Dict[str, str]:
+    if not profile:
+        return {}
+    if profile not in SEARCH_PROFILES:
+        raise ValueError(f"Unknown search profile: {profile}")
+    return {name: str(value) for name, value in SEARCH_PROFILES[profile].items()}
+
+
+def representation(quantization: Optional[str]) -> Representation:
+    try:
+        return REPRESENTATIONS[quantization or "none"]
+    except KeyError:
+        raise ValueError(f"Unknown quantization: {quantization}") from None
+
+
+def index_status() -> dict:
+    rows = db_fetchone("select count(*) as count from documents")
+    row_count = rows["count"] if rows else 0
+    settings = get_settings()
+    status = {
+        "index": INDEX_NAME,
+        "definition": None,
+        "rows": row_count,
+        "configured_engine": settings.vector_index_engine,
+        "configured_quantization": settings.rag_quantization,
+        "recommended_lists": recommended_lists(row_count),
+        "indexes": {},
+    }
+    for name, rep in REPRESENTATIONS.items():
+        index = db_fetchone(
+            "select indexdef, pg_relation_size("
+            "(quote_ident(schemaname) || '.' || quote_ident(indexname))::regclass) as bytes "
+            "from pg_indexes "
+            "where tablename = 'documents' and indexname = %s",
+            (rep.index_name,),
+        )
+        status["indexes"][name] = (
+            {"name": rep.index_name, "definition": index["indexdef"], "bytes": index["bytes"]}
+            if index
+            else None
+        )
+    if status["indexes"]["none"]:
+        status["definition"] = status["indexes"]["none"]["definition"]
+    return status
+
+
+def rebuild_index(
+    engine: Optional[str] = None,
+    lists: Optional[int] = None,
+    quantization: Optional[str] = None,
+) -> dict:
+    """Build a fresh ANN index next to the old one, then swap it in.
+
+    Uses CREATE INDEX CONCURRENTLY so searches keep working while the new index builds.
+    IVFFlat centroids are trained on the rows present now, so run this after large ingests.
+    ``quantization`` selects which representation's index is built (see REPRESENTATIONS).
+    """
+    settings = get_settings()
+    engine = engine or settings.vector_index_engine
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown index engine: {engine}")
+    rep = representation(quantization)
+    row_count = db_fetchone("select count(*) as count from documents")["count"]
+    if engine == "ivfflat":
+        lists = lists or recommended_lists(row_count)
+        options = f"lists = {int(lists)}"
+    else:
+        options = (
+            f"m = {int(settings.hnsw_m)}, "
+            f"ef_construction = {int(settings.hnsw_ef_construction)}"
+        )
+
+    started = time.perf_counter()
+    temp_name = f"{rep.index_name}_new"
+    with db_autocommit() as conn:
+        conn.execute(
+            "select set_config('maintenance_work_mem', %s, false)",
+            (settings.vector_index_maintenance_work_mem,),
+        )
+        try:
+            conn.execute(f"drop index concurrently if exists {temp_name}")
+            conn.execute(
+                f"create index concurrently {temp_name} on documents "
+                f"using {engine} ({rep.column} {rep.opclass}) with ({options})"
+            )
+            conn.execute(f"drop index concurrently if exists {rep.index_name}")
+            conn.execute(f"alter index {temp_name} rename to {rep.index_name}")
+        finally:
+            conn.execute("reset maintenance_work_mem")
+    invalidate_results()
+    return {
+        "index": rep.index_name,
+        "engine": engine,
+        "options": options,
+        "rows": row_count,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage the documents ANN index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild = sub.add_parser("rebuild", help="rebuild the index (after large ingests)")
+    rebuild.add_argument("--engine", choices=ENGINES)
+    rebuild.add_argument("--lists", type=int, help="ivfflat lists (default: sized from rows)")
+    rebuild.add_argument(
+        "--quantization",
+        choices=tuple(REPRESENTATIONS),
+        help="index the halfvec or binary form used by RAG_QUANTIZATION (default: none)",
+    )
+    sub.add_parser("status", help="show the current index and recommended sizing")
+    args = parser.parse_args()
+
+    init_pool(get_settings().database_url)
+    try:
+        if args.command == "rebuild":
+            print(
+                rebuild_index(
+                    engine=args.engine, lists=args.lists, quantization=args.quantization
+                )
+            )
+        else:
+            print(index_status())
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
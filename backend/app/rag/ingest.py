@@ -0,0 +1,241 @@
+import hashlib
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from pgvector.psycopg import to_db
+from psycopg.types.json import Jsonb
+
+from app.core.config import get_settings
+from app.core.db import db_conn_fetchall, db_copy_rows, db_fetchall, db_transaction
+from app.embeddings.encoder import EmbeddingEncoder
+from app.rag.cache import invalidate_results
+
+
+STAGE_COLUMNS = ("doc_key", "content_hash", "content", "metadata", "embedding")
+
+# Staged rows with an embedding are new or changed; rows without one only carry new metadata.
+CREATE_STAGE_SQL = """
+create temp table documents_stage on commit drop as
+select doc_key, content_hash, content, metadata, embedding from documents with no data
+"""
+
+UPSERT_SQL = """
+insert into documents (doc_key, content_hash, content, metadata, embedding)
+select doc_key, content_hash, content, metadata, embedding
+from documents_stage
+where embedding is not null
+on conflict (doc_key) do update
+set content_hash = excluded.content_hash,
+    content = excluded.content,
+    metadata = excluded.metadata,
+    embedding = excluded.embedding,
+    updated_at = now()
+returning (xmax = 0) as inserted
+"""
+
+UPDATE_METADATA_SQL = """
+update documents d
+set metadata = s.metadata, updated_at = now()
+from documents_stage s
+where s.embedding is null and d.doc_key = s.doc_key
+returning d.doc_key
+"""
+
+
+@dataclass
+class BatchStats:
+    batch: int
+    documents: int
+    inserted: int
+    updated: int
+    skipped: int
+    embed_ms: float
+    write_ms: float
+    docs_per_sec: float
+
+
+@dataclass
+class IngestReport:
+    indexed: int = 0
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    elapsed_ms: float = 0.0
+    batches: List[BatchStats] = field(default_factory=list)
+
+    @property
+    def docs_per_sec(self) -> float:
+        if self.elapsed_ms <= 0:
+            return 0.0
+        return self.indexed / (self.elapsed_ms / 1000)
+
+    def as_dict(self) -> dict:
+        return {
+            "indexed": self.indexed,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "elapsed_ms": round(self.elapsed_ms, 2),
+            "docs_per_sec": round(self.docs_per_sec, 2),
+            "batches": [asdict(batch) for batch in self.batches],
+        }
+
+
+@dataclass
+class PendingDocument:
+    doc_key: str
+    content_hash: str
+    content: str
+    metadata: Dict[str, Any]
+    needs_embedding: bool
+
+
+def document_key(doc: object) -> str:
+    """Caller-supplied ``key``, or a digest of the content so keyless re-posts dedupe too."""
+    key = getattr(doc, "key", None)
+    if key:
+        return key
+    return "sha256:" + hashlib.sha256(doc.content.encode()).hexdigest()
+
+
+def content_hash(content: str, model_name: str) -> str:
+    # The model is part of the hash so switching encoders re-embeds everything once.
+    return hashlib.sha256(f"{model_name}\0{content}".encode()).hexdigest()
+
+
+class BulkIngestor:
+    """Upsert documents in fixed-size batches, one transaction per batch.
+
+    Each document is identified by its key and carries a content hash. Unchanged documents
+    skip both the encoder and the write, changed ones are re-embedded and replaced, and
+    metadata-only changes are written without re-embedding.
+
+    The write of batch N runs on a single background thread while the encoder
+    works on batch N+1, so the model and the database are busy at the same time.
+    """
+
+    def __init__(self, encoder: EmbeddingEncoder, batch_size: Optional[int] = None) -> None:
+        self.encoder = encoder
+        self.batch_size = max(1, batch_size or get_settings().ingest_batch_size)
+
+    def ingest(
+        self,
+        documents: Iterable[object],
+        on_batch: Optional[Callable[[BatchStats], None]] = None,
+    ) -> IngestReport:
+        """Index ``documents``; ``on_batch`` is called as each batch is committed."""
+        report = IngestReport()
+
+        def record(future: Future) -> None:
+            stats = future.result()
+            report.batches.append(stats)
+            if on_batch is not None:
+                on_batch(stats)
+
+        started = time.perf_counter()
+        pending: Optional[Future] = None
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-writer") as writer:
+            for number, batch in enumerate(_batched(documents, self.batch_size), start=1):
+                changed, skipped = self._diff(batch)
+                embed_started = time.perf_counter()
+                to_embed = [doc.content for doc in changed if doc.needs_embedding]
+                vectors = iter(self.encoder.embed_batch(to_embed) if to_embed else [])
+                embeddings = [next(vectors) if doc.needs_embedding else None for doc in changed]
+                embed_ms = (time.perf_counter() - embed_started) * 1000
+                if pending is not None:
+                    record(pending)
+                pending = writer.submit(
+                    self._write_batch, number, changed, embeddings, skipped, embed_ms
+                )
+            if pending is not None:
+                record(pending)
+        report.inserted = sum(batch.inserted for batch in report.batches)
+        report.updated = sum(batch.updated for batch in report.batches)
+        report.skipped = sum(batch.skipped for batch in report.batches)
+        report.indexed = report.inserted + report.updated
+        report.elapsed_ms = (time.perf_counter() - started) * 1000
+        return report
+
+    def _diff(self, batch: list[object]) -> tuple[list[PendingDocument], int]:
+        """Compare a batch with the stored hashes; returns the documents to write."""
+        latest: Dict[str, PendingDocument] = {}
+        for doc in batch:
+            key = document_key(doc)
+            # A key repeated within one batch: the last occurrence wins.
+            latest[key] = PendingDocument(
+                doc_key=key,
+                content_hash=content_hash(doc.content, self.encoder.model_name),
+                content=doc.content,
+                metadata=doc.metadata or {},
+                needs_embedding=True,
+            )
+        existing = {
+            row["doc_key"]: row
+            for row in db_fetchall(
+                # A bare list would be bound as json; send the keys as one jsonb array.
+                "select doc_key, content_hash, metadata from documents "
+                "where doc_key in (select jsonb_array_elements_text(%s))",
+                (Jsonb(list(latest)),),
+            )
+        }
+        changed: list[PendingDocument] = []
+        for key, doc in latest.items():
+            stored = existing.get(key)
+            if stored is not None and stored["content_hash"] == doc.content_hash:
+                if stored["metadata"] == doc.metadata:
+                    continue
+                doc.needs_embedding = False
+            changed.append(doc)
+        return changed, len(batch) - len(changed)
+
+    def _write_batch(
+        self,
+        number: int,
+        batch: list[PendingDocument],
+        embeddings: list[Optional[list[float]]],
+        skipped: int,
+        embed_ms: float,
+    ) -> BatchStats:
+        write_started = time.perf_counter()
+        inserted = updated = 0
+        if batch:
+            rows = (
+                (
+                    doc.doc_key,
+                    doc.content_hash,
+                    doc.content,
+                    doc.metadata,
+                    to_db(vector) if vector is not None else None,
+                )
+                for doc, vector in zip(batch, embeddings)
+            )
+            with db_transaction() as conn:
+                conn.execute(CREATE_STAGE_SQL)
+                db_copy_rows(conn, "documents_stage", STAGE_COLUMNS, rows)
+                upserted = db_conn_fetchall(conn, UPSERT_SQL)
+                retagged = db_conn_fetchall(conn, UPDATE_METADATA_SQL)
+            inserted = sum(1 for row in upserted if row["inserted"])
+            updated = len(upserted) - inserted + len(retagged)
+            invalidate_results()
+        write_ms = (time.perf_counter() - write_started) * 1000
+        written = inserted + updated
+        total_s = (embed_ms + write_ms) / 1000
+        return BatchStats(
+            batch=number,
+            documents=written,
+            inserted=inserted,
+            updated=updated,
+            skipped=skipped,
+            embed_ms=round(embed_ms, 2),
+            write_ms=round(write_ms, 2),
+            docs_per_sec=round(written / total_s, 2) if total_s > 0 else 0.0,
+        )
+
+
+def _batched(items: Iterable[object], size: int) -> Iterator[list[object]]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
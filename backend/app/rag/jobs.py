@@ -0,0 +1,281 @@
+import os
+import queue
+import socket
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from app.api.schemas import DocumentInput
+from app.core.db import adb_fetchall, adb_fetchone, db_execute, db_fetchall, db_fetchone
+from app.embeddings.encoder import EmbeddingEncoder
+from app.rag.ingest import BatchStats, BulkIngestor
+
+
+JOB_COLUMNS = """
+id, status, total, processed, inserted, updated, skipped, error,
+created_at, started_at, finished_at
+"""
+
+
+# A job can be claimed while queued, or while running under an owner whose lease expired
+# (the process died or hung). The null heartbeat covers rows from before leases existed.
+CLAIMABLE = """
+(status = 'queued'
+ or (status = 'running'
+     and (heartbeat_at is null or heartbeat_at < now() - make_interval(secs => %s))))
+"""
+
+
+class QueueFullError(RuntimeError):
+    """Raised by ``submit`` when ``max_pending`` jobs are already waiting."""
+
+
+class IngestJobQueue:
+    """Run ingestion jobs on a small pool of worker threads.
+
+    Jobs, including their documents, are stored in ``ingest_jobs`` so only job ids are
+    queued in memory; at most ``max_pending`` jobs may wait, beyond that ``submit``
+    refuses new work.
+
+    Every API worker runs its own queue against the same table, so a job only runs once it
+    is claimed: an atomic update that marks it running under this queue's ``owner``. While
+    it runs, a heartbeat renews the lease every third of ``lease_seconds``; a job whose
+    lease expires is claimed again by the next queue that looks for unfinished work (at
+    ``start`` and on every heartbeat). Re-running a job is safe because ingestion upserts
+    by document key.
+    """
+
+    def __init__(
+        self,
+        encoder: EmbeddingEncoder,
+        workers: int = 2,
+        max_pending: int = 16,
+        lease_seconds: float = 60.0,
+    ) -> None:
+        self.encoder = encoder
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.lease_seconds = max(1.0, lease_seconds)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._queued_ids: set = set()
+        self._active: set = set()
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._lost = 0
+        self._abandoned = 0
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    def start(self) -> int:
+        """Start the workers and queue claimable jobs; returns how many were queued."""
+        self._stop.clear()
+        try:
+            recovered = self._recover()
+        except Exception:  # the database is down at boot; the heartbeat recovers them later
+            recovered = 0
+        for number in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f"ingest-job-{number}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        self._heartbeat = threading.Thread(
+            target=self._beat, name="ingest-job-heartbeat", daemon=True
+        )
+        self._heartbeat.start()
+        return recovered
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Let running jobs finish their current batch; unfinished ones resume elsewhere."""
+        self._stop.set()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        if self._heartbeat is not None:
+            self._heartbeat.join(timeout)
+            self._heartbeat = None
+
+    async def submit(
+        self, documents: List[DocumentInput], batch_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFullError(f"{self._pending} ingestion jobs already queued")
+            self._pending += 1
+        try:
+            row = await adb_fetchone(
+                "insert into ingest_jobs (total, batch_size, documents) values (%s, %s, %s) "
+                f"returning {JOB_COLUMNS}",
+                (len(documents), batch_size, [doc.model_dump() for doc in documents]),
+            )
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        with self._lock:
+            self._queued_ids.add(row["id"])
+        self._queue.put(row["id"])
+        return job_view(row)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = await adb_fetchone(
+            f"select {JOB_COLUMNS} from ingest_jobs where id = %s", (job_id,)
+        )
+        return job_view(row) if row else None
+
+    async def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        rows = await adb_fetchall(
+            f"select {JOB_COLUMNS} from ingest_jobs order by created_at desc limit %s",
+            (limit,),
+        )
+        return [job_view(row) for row in rows]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": self._pending,
+                "running": self._running,
+                "completed": self._completed,
+                "failed": self._failed,
+                "claimed_elsewhere": self._lost,
+                "abandoned": self._abandoned,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "owner": self.owner,
+            }
+
+    def _recover(self) -> int:
+        """Queue jobs that are waiting or whose owner stopped renewing its lease."""
+        rows = db_fetchall(
+            f"select id from ingest_jobs where {CLAIMABLE} order by created_at",
+            (self.lease_seconds,),
+        )
+        queued = 0
+        for row in rows:
+            with self._lock:
+                if row["id"] in self._queued_ids or self._pending >= self.max_pending:
+                    continue
+                self._queued_ids.add(row["id"])
+                self._pending += 1
+            self._queue.put(row["id"])
+            queued += 1
+        return queued
+
+    def _beat(self) -> None:
+        while not self._stop.wait(self.lease_seconds / 3):
+            with self._lock:
+                active = list(self._active)
+            try:
+                # Only jobs a worker is still on: an abandoned one must let its lease lapse.
+                for job_id in active:
+                    db_execute(
+                        "update ingest_jobs set heartbeat_at = now() "
+                        "where id = %s and owner = %s and status = 'running'",
+                        (job_id, self.owner),
+                    )
+                self._recover()
+            except Exception:  # the database is unreachable; retried on the next beat
+                pass
+
+    def _work(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            with self._lock:
+                self._queued_ids.discard(job_id)
+                self._pending -= 1
+                self._running += 1
+                self._active.add(job_id)
+            try:
+                outcome = "completed" if self._run(job_id) else "lost"
+            except Exception as exc:  # the job records the error; the worker keeps going
+                outcome = "failed" if self._record_failure(job_id, exc) else "abandoned"
+            with self._lock:
+                self._active.discard(job_id)
+                self._running -= 1
+                if outcome == "completed":
+                    self._completed += 1
+                elif outcome == "failed":
+                    self._failed += 1
+                elif outcome == "abandoned":
+                    self._abandoned += 1
+                else:
+                    self._lost += 1
+
+    def _record_failure(self, job_id: str, exc: Exception) -> bool:
+        """Mark the job failed; False if that fails too (typically, the database dropped).
+
+        The row then stays running and is recovered, by any queue, once its lease lapses.
+        """
+        try:
+            db_execute(
+                "update ingest_jobs set status = 'failed', error = %s, finished_at = now() "
+                "where id = %s and owner = %s",
+                (str(exc), job_id, self.owner),
+            )
+        except Exception:
+            return False
+        return True
+
+    def _run(self, job_id: str) -> bool:
+        """Claim and run a job; False when another queue claimed it first."""
+        job = db_fetchone(
+            "update ingest_jobs set status = 'running', owner = %s, heartbeat_at = now(), "
+            "started_at = now(), finished_at = null, "
+            "processed = 0, inserted = 0, updated = 0, skipped = 0, error = null "
+            f"where id = %s and {CLAIMABLE} returning documents, batch_size",
+            (self.owner, job_id, self.lease_seconds),
+        )
+        if job is None:
+            return False
+        documents = (DocumentInput(**doc) for doc in job["documents"] or [])
+
+        def progress(batch: BatchStats) -> None:
+            db_execute(
+                "update ingest_jobs set processed = processed + %s, inserted = inserted + %s, "
+                "updated = updated + %s, skipped = skipped + %s, heartbeat_at = now() "
+                "where id = %s and owner = %s",
+                (
+                    batch.inserted + batch.updated + batch.skipped,
+                    batch.inserted,
+                    batch.updated,
+                    batch.skipped,
+                    job_id,
+                    self.owner,
+                ),
+            )
+
+        BulkIngestor(self.encoder, batch_size=job["batch_size"]).ingest(
+            documents, on_batch=progress
+        )
+        # The payload is only needed to (re)run the job.
+        db_execute(
+            "update ingest_jobs set status = 'succeeded', finished_at = now(), documents = null "
+            "where id = %s and owner = %s",
+            (job_id, self.owner),
+        )
+        return True
+
+
+def job_view(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Job row plus derived progress and throughput."""
+    started, finished = row.get("started_at"), row.get("finished_at")
+    elapsed_s = None
+    if started is not None:
+        elapsed_s = ((finished or datetime.now(timezone.utc)) - started).total_seconds()
+    total, processed = row["total"], row["processed"]
+    return {
+        **row,
+        "progress": round(processed / total, 4) if total else 1.0,
+        "elapsed_ms": round(elapsed_s * 1000, 2) if elapsed_s is not None else None,
+        "docs_per_sec": round(processed / elapsed_s, 2) if elapsed_s else 0.0,
+    }
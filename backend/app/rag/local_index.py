@@ -0,0 +1,670 @@
+import argparse
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.core.db import close_pool, db_execute, db_fetchall, db_fetchone, init_pool
+from app.rag.cache import invalidate_results
+from app.rag.filters import matches_filter
+from app.rag.index import EMBEDDING_DIMENSIONS
+
+
+DTYPES = {"float16": np.float16, "float32": np.float32}
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+ZERO_ID = "00000000-0000-0000-0000-000000000000"
+SYNC_PAGE = 2000
+# updated_at is the writing transaction's start time, so a row can commit after a later
+# watermark was read; every sync re-reads this window (unchanged rows are skipped).
+SYNC_OVERLAP = timedelta(seconds=30)
+DELETIONS_RETENTION = "7 days"
+BLOCK_ROWS = 65536
+FILTER_OVERFETCH = 10
+REFRESH_SECONDS = 0.5
+KMEANS_SAMPLE = 50_000
+KMEANS_ITERATIONS = 10
+
+PAGE_SQL = """
+select id, content, metadata, embedding, updated_at
+from documents
+where (updated_at, id) > (%s, %s)
+order by updated_at, id
+limit %s
+"""
+
+
+class _Segment:
+    """One generation directory of fixed-width memory-mapped arrays.
+
+    Row ``i`` of ``vectors``/``ids``/``alive``/``stamps``/``offsets``/``lengths`` (and
+    ``assign`` with IVF) describes one document; content and metadata are JSON lines in
+    the append-only ``payloads.jsonl``. Only ``meta.json`` says how many rows are valid,
+    and it is replaced after the rows it counts are written, so readers never see
+    half-written rows.
+    """
+
+    ARRAYS = {
+        "ids": (np.uint8, 16),
+        "alive": (np.uint8, None),
+        "stamps": (np.float64, None),
+        "offsets": (np.int64, None),
+        "lengths": (np.int32, None),
+        "assign": (np.int32, None),
+    }
+
+    def __init__(self, directory: Path, writable: bool = False) -> None:
+        self.directory = directory
+        self.writable = writable
+        self.meta_mtime = 0
+        self.meta: Dict[str, Any] = {}
+        self.arrays: Dict[str, np.memmap] = {}
+        self.centroids: Optional[np.ndarray] = None
+        self._payload_fd: Optional[int] = None
+        self._ids: Dict[bytes, int] = {}
+        self._id_rows = 0
+        self.load_meta()
+        self._map()
+
+    @classmethod
+    def create(cls, directory: Path, dim: int, dtype: str, capacity: int) -> "_Segment":
+        directory.mkdir(parents=True)
+        meta = {
+            "dim": dim,
+            "dtype": dtype,
+            "rows": 0,
+            "capacity": 0,
+            "lists": 0,
+            "updated_watermark": EPOCH.isoformat(),
+            "deleted_watermark": EPOCH.isoformat(),
+        }
+        _write_json(directory / "meta.json", meta)
+        (directory / "payloads.jsonl").touch()
+        segment = cls(directory, writable=True)
+        segment.grow(capacity)
+        return segment
+
+    @property
+    def rows(self) -> int:
+        return self.meta["rows"]
+
+    @property
+    def vectors(self) -> np.memmap:
+        return self.arrays["vectors"]
+
+    def load_meta(self) -> bool:
+        """Re-read ``meta.json`` if it changed; True when it did."""
+        mtime = (self.directory / "meta.json").stat().st_mtime_ns
+        if mtime == self.meta_mtime:
+            return False
+        self.meta = json.loads((self.directory / "meta.json").read_text())
+        self.meta_mtime = mtime
+        return True
+
+    def refresh(self) -> None:
+        if self.load_meta() and self.meta["capacity"] > len(self.arrays.get("alive", ())):
+            self._map()
+
+    def grow(self, needed: int) -> None:
+        capacity = self.meta["capacity"]
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        for name, (dtype, width) in self._layout().items():
+            row_bytes = np.dtype(dtype).itemsize * (width or 1)
+            with open(self.directory / f"{name}.bin", "ab") as handle:
+                handle.truncate(capacity * row_bytes)
+        self.meta["capacity"] = capacity
+        self._map()
+
+    def payload(self, row: int) -> Dict[str, Any]:
+        if self._payload_fd is None:
+            self._payload_fd = os.open(self.directory / "payloads.jsonl", os.O_RDONLY)
+        data = os.pread(
+            self._payload_fd, int(self.arrays["lengths"][row]), int(self.arrays["offsets"][row])
+        )
+        return json.loads(data)
+
+    def close(self) -> None:
+        if self._payload_fd is not None:
+            os.close(self._payload_fd)
+            self._payload_fd = None
+        self.arrays = {}
+
+    # -- writer side -------------------------------------------------------------------
+
+    def upsert(self, records: Sequence[dict]) -> int:
+        """Write changed rows in place, append new ones; returns how many were applied."""
+        ids = self._id_map()
+        changed = []
+        for record in records:
+            key = uuid.UUID(str(record["id"])).bytes
+            stamp = record["updated_at"].timestamp()
+            row = ids.get(key)
+            unchanged = row is not None and self.arrays["stamps"][row] == stamp
+            if unchanged and self.arrays["alive"][row]:
+                continue
+            if row is None:
+                row = ids[key] = self.meta["rows"]
+                self.meta["rows"] += 1
+                self._id_rows = self.meta["rows"]
+                self.grow(self.meta["rows"])
+                self.arrays["ids"][row] = np.frombuffer(key, dtype=np.uint8)
+            changed.append((row, record, stamp))
+        if not changed:
+            return 0
+        rows = np.array([row for row, _, _ in changed])
+        vectors = _normalize(np.array([r["embedding"] for _, r, _ in changed], dtype=np.float32))
+        self.vectors[rows] = vectors.astype(self.vectors.dtype)
+        self.arrays["alive"][rows] = 1
+        self.arrays["stamps"][rows] = [stamp for _, _, stamp in changed]
+        if self.centroids is not None:
+            self.arrays["assign"][rows] = np.argmax(vectors @ self.centroids.T, axis=1)
+        with open(self.directory / "payloads.jsonl", "ab") as handle:
+            offset = handle.tell()
+            for row, record, _ in changed:
+                line = json.dumps(
+                    {
+                        "id": str(record["id"]),
+                        "content": record["content"],
+                        "metadata": record["metadata"] or {},
+                    },
+                    default=str,
+                ).encode() + b"\n"
+                handle.write(line)
+                self.arrays["offsets"][row] = offset
+                self.arrays["lengths"][row] = len(line)
+                offset += len(line)
+        return len(changed)
+
+    def delete(self, document_ids: Sequence[Any]) -> int:
+        ids = self._id_map()
+        rows = [ids[key] for key in (uuid.UUID(str(i)).bytes for i in document_ids) if key in ids]
+        rows = [row for row in rows if self.arrays["alive"][row]]
+        if rows:
+            self.arrays["alive"][rows] = 0
+        return len(rows)
+
+    def train_ivf(self, lists: int) -> None:
+        """Spherical k-means over a sample, then assign every row to its nearest list."""
+        rows = self.meta["rows"]
+        alive = np.flatnonzero(self.arrays["alive"][:rows])
+        lists = min(lists, len(alive))
+        if lists < 2:
+            return
+        rng = np.random.default_rng(0)
+        sample = rng.choice(alive, size=min(len(alive), KMEANS_SAMPLE), replace=False)
+        data = self.vectors[np.sort(sample)].astype(np.float32)
+        centroids = data[rng.choice(len(data), size=lists, replace=False)]
+        for _ in range(KMEANS_ITERATIONS):
+            labels = np.argmax(data @ centroids.T, axis=1)
+            for index in range(lists):
+                members = data[labels == index]
+                if len(members):
+                    centroids[index] = members.sum(axis=0)
+            centroids = _normalize(centroids)
+        np.save(self.directory / "centroids.npy", centroids)
+        self.centroids = centroids
+        for start in range(0, rows, BLOCK_ROWS):
+            block = self.vectors[start:start + BLOCK_ROWS].astype(np.float32)
+            self.arrays["assign"][start:start + len(block)] = np.argmax(
+                block @ centroids.T, axis=1
+            )
+        self.meta["lists"] = lists
+
+    def commit(self, **meta: Any) -> None:
+        for array in self.arrays.values():
+            array.flush()
+        self.meta.update(meta)
+        _write_json(self.directory / "meta.json", self.meta)
+        self.meta_mtime = (self.directory / "meta.json").stat().st_mtime_ns
+
+    # -- internals ---------------------------------------------------------------------
+
+    def _layout(self) -> Dict[str, tuple]:
+        layout = {"vectors": (DTYPES[self.meta["dtype"]], self.meta["dim"])}
+        layout.update(self.ARRAYS)
+        return layout
+
+    def _map(self) -> None:
+        capacity = self.meta["capacity"]
+        mode = "r+" if self.writable else "r"
+        self.arrays = {}
+        if capacity:
+            for name, (dtype, width) in self._layout().items():
+                shape = (capacity, width) if width else (capacity,)
+                self.arrays[name] = np.memmap(
+                    self.directory / f"{name}.bin", dtype=dtype, mode=mode, shape=shape
+                )
+        centroids = self.directory / "centroids.npy"
+        self.centroids = np.load(centroids) if centroids.exists() else None
+
+    def _id_map(self) -> Dict[bytes, int]:
+        """Document id -> row, built once and then extended with rows appended since.
+
+        Rows never move, so rows another process appended while it held the writer lock
+        are the only ones this map can be missing.
+        """
+        ids = self.arrays["ids"] if self.meta["rows"] else None
+        for row in range(self._id_rows, self.meta["rows"]):
+            self._ids[ids[row].tobytes()] = row
+        self._id_rows = self.meta["rows"]
+        return self._ids
+
+
+class LocalVectorIndex:
+    """In-process exact (or IVF) cosine search over memory-mapped vectors.
+
+    The files under ``path`` are shared by every worker process: one process at a time
+    (whoever holds ``sync.lock``) applies changes from ``documents``, the others only map
+    the files read-only and pick up new rows from ``meta.json``. A rebuild writes a new
+    ``gen-*`` directory and switches ``CURRENT`` to it atomically.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        dtype: str = "float16",
+        ivf_lists: int = 0,
+        nprobe: int = 8,
+        dim: int = EMBEDDING_DIMENSIONS,
+    ) -> None:
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown local index dtype: {dtype}")
+        self.path = Path(path)
+        self.dtype = dtype
+        self.ivf_lists = max(0, ivf_lists)
+        self.nprobe = max(1, nprobe)
+        self.dim = dim
+        self._segment: Optional[_Segment] = None
+        self._writer: Optional[_Segment] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_sync: Dict[str, Any] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self._current() is not None
+
+    # -- search ------------------------------------------------------------------------
+
+    def search(
+        self, vector: Sequence[float], top_k: int, filters: Optional[Dict[str, Any]] = None
+    ) -> List[dict]:
+        return self.search_batch([vector], top_k, filters)[0]
+
+    def search_batch(
+        self,
+        vectors: Sequence[Sequence[float]],
+        top_k: int,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[dict]]:
+        """Top ``top_k`` documents per query vector, one matrix product per block of rows."""
+        segment = self._current()
+        if segment is None:
+            raise RuntimeError("Local vector index not built yet")
+        queries = _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1))
+        rows = segment.rows
+        candidates = self._probe(segment, queries, rows)
+        available = rows if candidates is None else len(candidates)
+        take = top_k * FILTER_OVERFETCH if filters else top_k
+        while True:
+            scores, ids = _top_rows(segment, queries, min(take, available), rows, candidates)
+            results = [
+                self._collect(segment, row_scores, row_ids, top_k, filters)
+                for row_scores, row_ids in zip(scores, ids)
+            ]
+            short = any(len(result) < top_k for result in results)
+            if not filters or not short or take >= available:
+                return results
+            take *= 4
+
+    def _probe(
+        self, segment: _Segment, queries: np.ndarray, rows: int
+    ) -> Optional[np.ndarray]:
+        """IVF: rows in the ``nprobe`` lists nearest to any query; None scans everything."""
+        if segment.centroids is None:
+            return None
+        nearest = np.argsort(-(queries @ segment.centroids.T), axis=1)[:, : self.nprobe]
+        return np.flatnonzero(np.isin(segment.arrays["assign"][:rows], np.unique(nearest)))
+
+    @staticmethod
+    def _collect(
+        segment: _Segment,
+        scores: np.ndarray,
+        rows: np.ndarray,
+        top_k: int,
+        filters: Optional[Dict[str, Any]],
+    ) -> List[dict]:
+        results = []
+        for score, row in zip(scores, rows):
+            if not np.isfinite(score):
+                break
+            payload = segment.payload(int(row))
+            if not matches_filter(payload["metadata"], filters):
+                continue
+            results.append({**payload, "score": float(score)})
+            if len(results) == top_k:
+                break
+        return results
+
+    # -- sync --------------------------------------------------------------------------
+
+    def start(self, interval: float) -> None:
+        """Sync now (building the index if there is none) and every ``interval`` seconds."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._sync_loop, args=(interval,), name="local-index-sync", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._sync_lock:
+            self._close_writer()
+
+    def recheck(self, _: Any = None) -> None:
+        """Re-read ``CURRENT`` and ``meta.json`` on the next search (another process synced)."""
+        self._checked = float("-inf")
+
+    def sync(self) -> Dict[str, Any]:
+        """Apply document changes since the last sync; rebuild when there is no index yet."""
+        with self._writer_lock() as locked:
+            if not locked:
+                return {"status": "busy"}
+            current = self._read_current()
+            if current is None:
+                return self._rebuild_locked()
+            try:
+                return self._apply_changes(self._writer_segment(current))
+            except BaseException:
+                # Rows may be half applied; the next sync starts from the files again.
+                self._close_writer()
+                raise
+
+    def rebuild(self) -> Dict[str, Any]:
+        with self._writer_lock(blocking=True):
+            return self._rebuild_locked()
+
+    def stats(self) -> dict:
+        segment = self._current()
+        if segment is None:
+            return {"ready": False}
+        rows = segment.rows
+        alive = int(np.count_nonzero(segment.arrays["alive"][:rows])) if rows else 0
+        return {
+            "ready": True,
+            "generation": segment.directory.name,
+            "rows": rows,
+            "live_rows": alive,
+            "lists": segment.meta["lists"],
+            "dtype": segment.meta["dtype"],
+            "bytes": sum(array.nbytes for array in segment.arrays.values()),
+            "last_sync": self.last_sync,
+        }
+
+    def _sync_loop(self, interval: float) -> None:
+        while not self._stop.is_set():
+            try:
+                self.last_sync = {**self.sync(), "at": time.time()}
+            except Exception as exc:  # keep serving the last good index
+                self.last_sync = {"status": "error", "error": str(exc), "at": time.time()}
+            self._stop.wait(interval)
+
+    def _apply_changes(self, segment: _Segment) -> Dict[str, Any]:
+        started = time.perf_counter()
+        deleted_watermark = datetime.fromisoformat(segment.meta["deleted_watermark"])
+        truncated = db_fetchone(
+            "select 1 as truncated from document_deletions "
+            "where id is null and deleted_at > %s limit 1",
+            (deleted_watermark,),
+        )
+        if truncated:
+            return self._rebuild_locked()
+
+        previous = datetime.fromisoformat(segment.meta["updated_watermark"])
+        upserted, updated_watermark = self._copy_changes(segment, previous - SYNC_OVERLAP)
+        deletions = db_fetchall(
+            "select id, deleted_at from document_deletions "
+            "where id is not null and deleted_at > %s order by deleted_at",
+            (deleted_watermark - SYNC_OVERLAP,),
+        )
+        deleted = segment.delete([row["id"] for row in deletions])
+        segment.commit(
+            updated_watermark=max(updated_watermark, previous).isoformat(),
+            deleted_watermark=max(
+                [deleted_watermark] + [row["deleted_at"] for row in deletions]
+            ).isoformat(),
+        )
+        db_execute(
+            "delete from document_deletions where deleted_at < now() - %s::interval",
+            (DELETIONS_RETENTION,),
+        )
+        if upserted or deleted:
+            # Only now can searches, in any process, see the change: map the new rows on
+            # the next search, then drop every process's results cached from the old ones.
+            self.recheck()
+            invalidate_results()
+        return {
+            "status": "synced",
+            "upserted": upserted,
+            "deleted": deleted,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    def _rebuild_locked(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        self._close_writer()
+        now = db_fetchone("select now() as now")["now"]
+        count = db_fetchone("select count(*) as count from documents")["count"]
+        name = f"gen-{time.time_ns()}"
+        segment = _Segment.create(self.path / name, self.dim, self.dtype, max(count, 1024))
+        try:
+            upserted, watermark = self._copy_changes(segment, EPOCH)
+            if self.ivf_lists:
+                segment.train_ivf(self.ivf_lists)
+            segment.commit(
+                updated_watermark=watermark.isoformat(),
+                deleted_watermark=now.isoformat(),
+            )
+        finally:
+            segment.close()
+        _write_text(self.path / "CURRENT", name)
+        for old in self.path.glob("gen-*"):
+            # Readers that still map an old generation keep their (unlinked) files.
+            if old.name != name:
+                shutil.rmtree(old, ignore_errors=True)
+        self.recheck()
+        invalidate_results()
+        return {
+            "status": "rebuilt",
+            "generation": name,
+            "rows": upserted,
+            "lists": segment.meta["lists"],
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    def _writer_segment(self, name: str) -> _Segment:
+        """Generation ``name`` opened for writing, kept open between syncs.
+
+        Its id map is then built once per generation instead of on every sync.
+        """
+        segment = self._writer
+        if segment is not None and segment.directory.name == name:
+            segment.refresh()
+            return segment
+        self._close_writer()
+        self._writer = _Segment(self.path / name, writable=True)
+        return self._writer
+
+    def _close_writer(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    @staticmethod
+    def _copy_changes(segment: _Segment, since: datetime) -> tuple[int, datetime]:
+        """Upsert rows changed after ``since``, keyset-paged; returns (applied, newest)."""
+        applied = 0
+        since_id = ZERO_ID
+        while True:
+            page = db_fetchall(PAGE_SQL, (since, since_id, SYNC_PAGE))
+            if not page:
+                return applied, since
+            applied += segment.upsert(page)
+            since, since_id = page[-1]["updated_at"], str(page[-1]["id"])
+            if len(page) < SYNC_PAGE:
+                return applied, since
+
+    @contextmanager
+    def _writer_lock(self, blocking: bool = False) -> Iterator[bool]:
+        """Cross-process writer lock; threads of this process also serialize."""
+        if not self._sync_lock.acquire(blocking=blocking):
+            yield False
+            return
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            with open(self.path / "sync.lock", "w") as handle:
+                flags = fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB)
+                try:
+                    fcntl.flock(handle, flags)
+                except BlockingIOError:
+                    yield False
+                    return
+                try:
+                    yield True
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+        finally:
+            self._sync_lock.release()
+
+    # -- reader side -------------------------------------------------------------------
+
+    def _read_current(self) -> Optional[str]:
+        try:
+            name = (self.path / "CURRENT").read_text().strip()
+        except FileNotFoundError:
+            return None
+        return name if (self.path / name / "meta.json").exists() else None
+
+    def _current(self) -> Optional[_Segment]:
+        now = time.monotonic()
+        if self._segment is not None and now - self._checked < REFRESH_SECONDS:
+            return self._segment
+        with self._lock:
+            self._checked = now
+            name = self._read_current()
+            if name is None:
+                return self._segment
+            segment = self._segment
+            if segment is None or segment.directory.name != name:
+                self._segment = _Segment(self.path / name)
+                if segment is not None:
+                    segment.close()
+            else:
+                segment.refresh()
+            return self._segment
+
+
+def _top_rows(
+    segment: _Segment,
+    queries: np.ndarray,
+    take: int,
+    rows: int,
+    candidates: Optional[np.ndarray],
+) -> tuple[np.ndarray, np.ndarray]:
+    """Best ``take`` (score, row) pairs per query, best first; dead rows score -inf."""
+    count = len(queries)
+    best_scores = np.empty((count, 0), dtype=np.float32)
+    best_rows = np.empty((count, 0), dtype=np.int64)
+    if take <= 0:
+        return best_scores, best_rows
+    total = rows if candidates is None else len(candidates)
+    for start in range(0, total, BLOCK_ROWS):
+        if candidates is None:
+            block_rows = np.arange(start, min(start + BLOCK_ROWS, rows))
+            block = segment.vectors[start:start + len(block_rows)]
+        else:
+            block_rows = candidates[start:start + BLOCK_ROWS]
+            block = segment.vectors[block_rows]
+        scores = (block.astype(np.float32) @ queries.T).T
+        scores[:, segment.arrays["alive"][block_rows] == 0] = -np.inf
+        best_scores = np.concatenate([best_scores, scores], axis=1)
+        best_rows = np.concatenate([best_rows, np.broadcast_to(block_rows, scores.shape)], axis=1)
+        if best_scores.shape[1] > take:
+            keep = np.argpartition(-best_scores, take - 1, axis=1)[:, :take]
+            best_scores = np.take_along_axis(best_scores, keep, axis=1)
+            best_rows = np.take_along_axis(best_rows, keep, axis=1)
+    order = np.argsort(-best_scores, axis=1)
+    return (
+        np.take_along_axis(best_scores, order, axis=1),
+        np.take_along_axis(best_rows, order, axis=1),
+    )
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _write_json(path: Path, data: dict) -> None:
+    _write_text(path, json.dumps(data))
+
+
+def _write_text(path: Path, text: str) -> None:
+    temp = path.with_suffix(path.suffix + ".tmp")
+    temp.write_text(text)
+    os.replace(temp, path)
+
+
+@lru_cache(maxsize=1)
+def get_local_index() -> LocalVectorIndex:
+    settings = get_settings()
+    return LocalVectorIndex(
+        settings.local_index_path,
+        dtype=settings.local_index_dtype,
+        ivf_lists=settings.local_index_ivf_lists,
+        nprobe=settings.local_index_nprobe,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage the in-process vector index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="rebuild from the documents table (retrains IVF lists)")
+    sub.add_parser("sync", help="apply document changes since the last sync")
+    sub.add_parser("status", help="show the current generation")
+    args = parser.parse_args()
+
+    index = get_local_index()
+    if args.command == "status":
+        print(index.stats())
+        return
+    init_pool(get_settings().database_url)
+    try:
+        print(index.rebuild() if args.command == "rebuild" else index.sync())
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
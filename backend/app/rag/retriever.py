@@ -1,33 +1,527 @@
-from typing import List
+import asyncio
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
 
 from pgvector.psycopg import to_db
 
 from app.core.config import get_settings
-from app.core.db import db_execute, db_fetchall
+from app.core.db import adb_fetchall, db_fetchall
 from app.embeddings.encoder import EmbeddingEncoder
+from app.rag.cache import get_query_cache, get_result_cache, normalize_query, result_key
+from app.rag.filters import build_filter_clause
+from app.rag.index import (
+    HNSW_DEFAULT_EF_SEARCH,
+    HNSW_MAX_EF_SEARCH,
+    Representation,
+    profile_settings,
+    representation,
+)
+from app.rag.ingest import BulkIngestor, IngestReport
+
+
+# pgvector >= 0.8: keep scanning the ANN index until enough rows pass the filter.
+ITERATIVE_SCAN_SETTINGS = {
+    "hnsw.iterative_scan": "relaxed_order",
+    "ivfflat.iterative_scan": "relaxed_order",
+}
+# Last resort when a filtered ANN scan still comes back short: exact scan, GIN still usable.
+EXACT_SCAN_SETTINGS = {"enable_indexscan": "off"}
+# The exact retry runs only if more rows match the filter than the ANN scan found, i.e. the
+# scan was cut short (ef_search, or max_scan_tuples with iterative scans). The uncorrelated
+# count is a one-time filter, evaluated first; a filter that simply matches fewer than
+# top_k rows costs a count of at most top_k rows instead of a full scan.
+EXACT_RETRY_SQL = """
+select * from ({search}) as exact
+where (
+    select count(*) from (select 1 from documents where {where} limit %s) as matching
+) > %s
+"""
+
+
+@dataclass
+class SearchPlan:
+    sql: str
+    params: Sequence[Any]
+    limit: int
+    cache_key: tuple
+    mode: str = "vector"
+    filtered: bool = False
+    where_sql: str = "true"
+    where_params: Sequence[Any] = ()
+    local_settings: Dict[str, str] = field(default_factory=dict)
+    local_index: bool = False
 
 
 class Retriever:
     def __init__(self, encoder: EmbeddingEncoder) -> None:
         self.encoder = encoder
         self.settings = get_settings()
+        self.local_index = None
+        if self.settings.retrieval_backend == "local":
+            # Imported here: the local backend needs POSIX file locking.
+            from app.rag.local_index import get_local_index
+
+            self.local_index = get_local_index()
+
+    def index_documents(
+        self, documents: list[object], batch_size: int | None = None
+    ) -> IngestReport:
+        return BulkIngestor(self.encoder, batch_size=batch_size).ingest(documents)
+
+    def embed_query(self, query: str) -> List[float]:
+        cache = get_query_cache()
+        key = self._query_key(query)
+        vector = cache.get(key)
+        if vector is None:
+            vector = self.encoder.embed(query)
+            cache.set(key, vector)
+        return vector
+
+    async def aembed_query(self, query: str) -> List[float]:
+        cache = get_query_cache()
+        key = self._query_key(query)
+        vector = cache.get(key)
+        if vector is None:
+            vector = await self.encoder.aembed(query)
+            cache.set(key, vector)
+        return vector
+
+    def embed_queries(self, queries: Sequence[str]) -> List[List[float]]:
+        """``embed_query`` for many queries; the uncached ones are encoded in one batch."""
+        cache = get_query_cache()
+        keys = [self._query_key(query) for query in queries]
+        vectors = {key: cache.get(key) for key in keys}
+        missing = {key: query for key, query in zip(keys, queries) if vectors[key] is None}
+        if missing:
+            for key, vector in zip(missing, self.encoder.embed_batch(list(missing.values()))):
+                cache.set(key, vector)
+                vectors[key] = vector
+        return [vectors[key] for key in keys]
+
+    async def aembed_queries(self, queries: Sequence[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed_queries, queries)
+
+    def search(
+        self,
+        query: str,
+        top_k: int | None = None,
+        mode: str | None = None,
+        filters: Optional[Dict[str, Any]] = None,
+        profile: str | None = None,
+    ) -> List[dict]:
+        vector = self.embed_query(query)
+        plan = self._plan(query, vector, top_k, mode, filters, profile)
+        cache = get_result_cache()
+        generation = cache.generation
+        rows = cache.get(plan.cache_key)
+        if rows is None and plan.local_index:
+            rows = self.local_index.search(vector, plan.limit, filters)
+            cache.set(plan.cache_key, rows, generation)
+        elif rows is None:
+            rows = db_fetchall(plan.sql, plan.params, plan.local_settings)
+            if plan.filtered and len(rows) < plan.limit:
+                sql, params = _exact_statement(plan, len(rows))
+                rows = db_fetchall(sql, params, EXACT_SCAN_SETTINGS) or rows
+            cache.set(plan.cache_key, rows, generation)
+        return [dict(row) for row in rows]
+
+    async def asearch(
+        self,
+        query: str,
+        top_k: int | None = None,
+        mode: str | None = None,
+        filters: Optional[Dict[str, Any]] = None,
+        profile: str | None = None,
+    ) -> List[dict]:
+        vector = await self.aembed_query(query)
+        plan = self._plan(query, vector, top_k, mode, filters, profile)
+        cache = get_result_cache()
+        generation = cache.generation
+        rows = cache.get(plan.cache_key)
+        if rows is None and plan.local_index:
+            rows = await asyncio.to_thread(self.local_index.search, vector, plan.limit, filters)
+            cache.set(plan.cache_key, rows, generation)
+        elif rows is None:
+            rows = await adb_fetchall(plan.sql, plan.params, plan.local_settings)
+            if plan.filtered and len(rows) < plan.limit:
+                sql, params = _exact_statement(plan, len(rows))
+                rows = await adb_fetchall(sql, params, EXACT_SCAN_SETTINGS) or rows
+            cache.set(plan.cache_key, rows, generation)
+        return [dict(row) for row in rows]
+
+    def search_batch(self, queries: Sequence[Dict[str, Any]]) -> List[List[dict]]:
+        """Run several searches with one encoder batch and one database round trip.
 
-    def index_documents(self, documents: list[object]) -> int:
-        contents = [doc.content for doc in documents]
-        vectors = self.encoder.embed_batch(contents)
-        for doc, vector in zip(documents, vectors):
-            db_execute(
-                "insert into documents (content, metadata, embedding) values (%s, %s, %s)",
-                (doc.content, doc.metadata, to_db(vector)),
+        Each query is a dict with ``query`` plus any of ``top_k``, ``mode``, ``filters`` and
+        ``profile``; the results are returned in the same order.
+        """
+        vectors = self.embed_queries([query["query"] for query in queries])
+        generation = get_result_cache().generation
+        plans, results = self._batch_plans(queries, vectors)
+        self._search_local(plans, vectors, queries, results, generation)
+        pending = [i for i, rows in enumerate(results) if rows is None]
+        for sql, params, local_settings, members in _batch_statements(plans, pending):
+            _assign_rows(results, plans, members, db_fetchall(sql, params, local_settings))
+        retry = _short_filtered(plans, results, pending)
+        for sql, params, local_settings, members in _batch_statements(plans, retry, results):
+            rows = db_fetchall(sql, params, local_settings)
+            _assign_rows(results, plans, members, rows, exact=True)
+        return self._finish_batch(plans, results, pending, generation)
+
+    async def asearch_batch(self, queries: Sequence[Dict[str, Any]]) -> List[List[dict]]:
+        vectors = await self.aembed_queries([query["query"] for query in queries])
+        generation = get_result_cache().generation
+        plans, results = self._batch_plans(queries, vectors)
+        await asyncio.to_thread(self._search_local, plans, vectors, queries, results, generation)
+        pending = [i for i, rows in enumerate(results) if rows is None]
+        for sql, params, local_settings, members in _batch_statements(plans, pending):
+            rows = await adb_fetchall(sql, params, local_settings)
+            _assign_rows(results, plans, members, rows)
+        retry = _short_filtered(plans, results, pending)
+        for sql, params, local_settings, members in _batch_statements(plans, retry, results):
+            rows = await adb_fetchall(sql, params, local_settings)
+            _assign_rows(results, plans, members, rows, exact=True)
+        return self._finish_batch(plans, results, pending, generation)
+
+    def _batch_plans(
+        self, queries: Sequence[Dict[str, Any]], vectors: List[List[float]]
+    ) -> tuple[List[SearchPlan], List[Optional[list]]]:
+        if len(queries) > self.settings.search_batch_max_queries:
+            raise ValueError(
+                f"At most {self.settings.search_batch_max_queries} queries per batch"
+            )
+        plans = [
+            self._plan(
+                query["query"],
+                vector,
+                query.get("top_k"),
+                query.get("mode"),
+                query.get("filters"),
+                query.get("profile"),
             )
-        return len(documents)
+            for query, vector in zip(queries, vectors)
+        ]
+        cache = get_result_cache()
+        return plans, [cache.get(plan.cache_key) for plan in plans]
+
+    def _search_local(
+        self,
+        plans: List[SearchPlan],
+        vectors: List[List[float]],
+        queries: Sequence[Dict[str, Any]],
+        results: List[Optional[list]],
+        generation: int,
+    ) -> None:
+        """Answer local-index plans, one matrix product per (top_k, filters) group."""
+        groups: Dict[tuple, List[int]] = {}
+        for i, plan in enumerate(plans):
+            if plan.local_index and results[i] is None:
+                filters = queries[i].get("filters") or {}
+                group = (plan.limit, json.dumps(filters, sort_keys=True))
+                groups.setdefault(group, []).append(i)
+        cache = get_result_cache()
+        for (limit, _), members in groups.items():
+            found = self.local_index.search_batch(
+                [vectors[i] for i in members], limit, queries[members[0]].get("filters")
+            )
+            for i, rows in zip(members, found):
+                results[i] = rows
+                cache.set(plans[i].cache_key, rows, generation)
+
+    @staticmethod
+    def _finish_batch(
+        plans: List[SearchPlan],
+        results: List[Optional[list]],
+        fetched: List[int],
+        generation: int,
+    ) -> List[List[dict]]:
+        cache = get_result_cache()
+        for i in fetched:
+            cache.set(plans[i].cache_key, results[i], generation)
+        return [[dict(row) for row in rows or []] for rows in results]
 
-    def search(self, query: str, top_k: int | None = None) -> List[dict]:
-        vector = self.encoder.embed(query)
+    def _query_key(self, query: str) -> tuple[str, str]:
+        return normalize_query(query), self.encoder.model_name
+
+    def _plan(
+        self,
+        query: str,
+        vector: List[float],
+        top_k: int | None,
+        mode: str | None,
+        filters: Optional[Dict[str, Any]],
+        profile: str | None,
+    ) -> SearchPlan:
         limit = top_k or self.settings.rag_top_k
-        rows = db_fetchall(
-            "select id, content, metadata, 1 - (embedding <=> %s) as score "
-            "from documents order by embedding <=> %s limit %s",
-            (to_db(vector), to_db(vector), limit),
+        mode = mode or self.settings.rag_search_mode
+        profile = profile or self.settings.rag_search_profile
+        if mode == "vector" and self.local_index is not None and self.local_index.ready:
+            # Hybrid search needs full-text matching and stays in Postgres.
+            key = result_key(vector, limit, mode=mode, filters=filters or {}, backend="local")
+            return SearchPlan(
+                "", (), limit, key, mode, filtered=bool(filters), local_index=True
+            )
+        where_sql, where_params = build_filter_clause(filters)
+        rep = representation(self.settings.rag_quantization)
+        rescore = max(1, self.settings.rag_rescore_factor)
+        key_options: Dict[str, Any] = {
+            "mode": mode,
+            "filters": filters or {},
+            "profile": profile,
+            "quantization": self.settings.rag_quantization,
+            "rescore": rescore,
+        }
+        if mode == "vector":
+            nearest = limit
+            first_stage = limit * rescore
+            nearest_sql, params = _nearest_statement(
+                "id, content, metadata", vector, limit, rep, first_stage, where_sql, where_params
+            )
+            sql = VECTOR_SEARCH_SQL.format(nearest=nearest_sql)
+        elif mode == "hybrid":
+            candidates = max(limit, self.settings.rag_hybrid_candidates)
+            nearest = candidates
+            first_stage = candidates * rescore
+            sql, params = _hybrid_statement(
+                vector, query, limit, candidates, self.settings.rag_rrf_k, rep, first_stage,
+                where_sql, where_params,
+            )
+            key_options["query"] = normalize_query(query)
+        else:
+            raise ValueError(f"Unknown search mode: {mode}")
+        plan = SearchPlan(
+            sql,
+            params,
+            limit,
+            result_key(vector, limit, **key_options),
+            mode,
+            where_sql=where_sql,
+            where_params=where_params,
         )
-        return rows
+        plan.local_settings.update(profile_settings(profile))
+        # An HNSW scan returns at most ef_search rows, so it must cover every row the plan
+        # reads from the index: the shortlist when quantized, else the nearest rows (the
+        # vector candidates of a hybrid search). (Set whatever the engine: the live index
+        # may not be VECTOR_INDEX_ENGINE.)
+        scanned = first_stage if rep.column != "embedding" else nearest
+        ef_search = int(plan.local_settings.get("hnsw.ef_search", HNSW_DEFAULT_EF_SEARCH))
+        ef_search = min(max(ef_search, scanned), HNSW_MAX_EF_SEARCH)
+        plan.local_settings["hnsw.ef_search"] = str(ef_search)
+        if filters:
+            plan.filtered = True
+            if self.settings.rag_iterative_scan:
+                plan.local_settings.update(ITERATIVE_SCAN_SETTINGS)
+        return plan
+
+
+# The inner ORDER BY/LIMIT is what the ANN index serves; the outer sort restores exact
+# order when an iterative (relaxed-order) scan was needed to satisfy a filter.
+VECTOR_SEARCH_SQL = """
+select id, content, metadata, 1 - distance as score
+from ({nearest}) as hits
+order by score desc
+"""
+
+# With quantization the index serves a shortlist ranked by the compact representation
+# (Hamming distance for bits, halfvec cosine), which is then re-ranked by exact cosine
+# distance on the stored float vectors.
+NEAREST_SQL = """
+select {columns}, embedding <=> %s as distance
+from documents
+where {where}
+order by embedding <=> %s
+limit %s
+"""
+
+RESCORED_NEAREST_SQL = """
+select {columns}, embedding <=> %s as distance
+from (
+    select {columns}, embedding
+    from documents
+    where {where}
+    order by {first_stage}
+    limit %s
+) as shortlist
+order by distance
+limit %s
+"""
+
+
+def _nearest_statement(
+    columns: str,
+    vector: List[float],
+    limit: int,
+    rep: Representation,
+    shortlist: int,
+    where_sql: str,
+    where_params: Sequence[Any],
+) -> tuple[str, Sequence[Any]]:
+    """Rows of ``columns`` plus exact cosine ``distance``, nearest first."""
+    if rep.column == "embedding":
+        return (
+            NEAREST_SQL.format(columns=columns, where=where_sql),
+            (to_db(vector), *where_params, to_db(vector), limit),
+        )
+    first_stage = f"{rep.column} {rep.operator} {rep.query}"
+    return (
+        RESCORED_NEAREST_SQL.format(columns=columns, where=where_sql, first_stage=first_stage),
+        (to_db(vector), *where_params, to_db(vector), max(shortlist, limit), limit),
+    )
+
+
+# Both candidate lists come from one statement: the ANN scan over ``embedding`` and the
+# GIN-indexed full-text match over ``content_tsv``. They are fused with reciprocal-rank
+# fusion, score = sum(1 / (k + rank)), so a document ranked well by either stage rises.
+HYBRID_SEARCH_SQL = """
+with vector_candidates as (
+    {nearest}
+),
+vector_hits as (
+    select id, 1 - distance as vector_score,
+           row_number() over (order by distance) as vector_rank
+    from vector_candidates
+),
+lexical_hits as (
+    select id, ts_rank_cd(content_tsv, query) as lexical_score,
+           row_number() over (order by ts_rank_cd(content_tsv, query) desc) as lexical_rank
+    from documents, websearch_to_tsquery('simple', %s) as query
+    where content_tsv @@ query and {where}
+    order by lexical_score desc
+    limit %s
+),
+fused as (
+    select id, v.vector_score, v.vector_rank, l.lexical_score, l.lexical_rank,
+           (coalesce(1.0 / (%s + v.vector_rank), 0)
+             + coalesce(1.0 / (%s + l.lexical_rank), 0))::float8 as rrf_score
+    from vector_hits v
+    full outer join lexical_hits l using (id)
+)
+select d.id, d.content, d.metadata, f.rrf_score as score,
+       f.vector_score, f.vector_rank, f.lexical_score, f.lexical_rank
+from fused f
+join documents d on d.id = f.id
+order by f.rrf_score desc
+limit %s
+"""
+
+
+def _hybrid_statement(
+    vector: List[float],
+    query: str,
+    limit: int,
+    candidates: int,
+    rrf_k: int,
+    rep: Representation,
+    shortlist: int,
+    where_sql: str,
+    where_params: Sequence[Any],
+) -> tuple[str, Sequence[Any]]:
+    nearest_sql, nearest_params = _nearest_statement(
+        "id", vector, candidates, rep, shortlist, where_sql, where_params
+    )
+    return (
+        HYBRID_SEARCH_SQL.format(nearest=nearest_sql, where=where_sql),
+        (*nearest_params, query, *where_params, candidates, rrf_k, rrf_k, limit),
+    )
+
+
+# Batch search: every query becomes one branch of a UNION ALL, so N searches (each with
+# its own top_k, filters and mode) cost one round trip while each branch still gets its
+# own ANN index scan. Vector branches pad the hybrid-only columns with nulls.
+BATCH_BRANCH_SQL = "(select %s::int as query_index, {columns} from ({search}) as hits)"
+BATCH_SEARCH_SQL = """
+select * from (
+{branches}
+) as batch
+order by query_index, score desc
+"""
+HYBRID_ONLY_COLUMNS = ("vector_score", "vector_rank", "lexical_score", "lexical_rank")
+BATCH_COLUMNS = {
+    "vector": "id, content, metadata, score, null::float8 as vector_score, "
+    "null::bigint as vector_rank, null::float8 as lexical_score, null::bigint as lexical_rank",
+    "hybrid": "id, content, metadata, score, " + ", ".join(HYBRID_ONLY_COLUMNS),
+}
+
+
+def _batch_statements(
+    plans: List[SearchPlan],
+    members: List[int],
+    found: Optional[List[Optional[list]]] = None,
+) -> List[tuple[str, List[Any], Dict[str, str], List[int]]]:
+    """Statements answering ``members`` of ``plans``, normally just one.
+
+    Plans share a statement when they override the same session settings; the values are
+    merged (see ``_merge_settings``). Only a batch mixing server-default and explicitly
+    tuned ANN settings needs a second statement. Given ``found`` (the rows each member's
+    ANN scan returned), the members are retried exactly instead (``_exact_statement``).
+    """
+    exact = found is not None
+    groups: Dict[frozenset, List[int]] = {}
+    for i in members:
+        local_settings = EXACT_SCAN_SETTINGS if exact else plans[i].local_settings
+        names = frozenset(local_settings) - frozenset(ITERATIVE_SCAN_SETTINGS)
+        groups.setdefault(names, []).append(i)
+    statements = []
+    for group in groups.values():
+        branches, params = [], []
+        merged: Dict[str, str] = {}
+        for i in group:
+            plan = plans[i]
+            columns = BATCH_COLUMNS[plan.mode]
+            search, search_params = (
+                _exact_statement(plan, len(found[i])) if exact else (plan.sql, plan.params)
+            )
+            branches.append(BATCH_BRANCH_SQL.format(columns=columns, search=search))
+            params.extend([i, *search_params])
+            _merge_settings(merged, EXACT_SCAN_SETTINGS if exact else plan.local_settings)
+        sql = BATCH_SEARCH_SQL.format(branches="\nunion all\n".join(branches))
+        statements.append((sql, params, merged, group))
+    return statements
+
+
+def _merge_settings(merged: Dict[str, str], local_settings: Dict[str, str]) -> None:
+    """Keep the largest ef_search/probes any branch asked for.
+
+    A longer candidate list costs the cheaper queries some latency but never lowers their
+    recall; iterative scans only change anything for filtered branches.
+    """
+    for name, value in local_settings.items():
+        current = merged.get(name)
+        if current is not None and current.isdigit() and str(value).isdigit():
+            value = max(int(current), int(value))
+        merged[name] = str(value)
+
+
+def _exact_statement(plan: SearchPlan, found: int) -> tuple[str, Sequence[Any]]:
+    """``plan`` as an exact retry that returns nothing unless ``found`` rows fall short."""
+    return (
+        EXACT_RETRY_SQL.format(search=plan.sql, where=plan.where_sql),
+        (*plan.params, *plan.where_params, plan.limit, found),
+    )
+
+
+def _assign_rows(
+    results: List[Optional[list]],
+    plans: List[SearchPlan],
+    members: List[int],
+    rows: list,
+    exact: bool = False,
+) -> None:
+    """Split ``rows`` by query; an exact retry that returned nothing keeps the ANN rows."""
+    hits: Dict[int, list] = {i: [] for i in members}
+    for row in rows:
+        i = row.pop("query_index")
+        if plans[i].mode == "vector":
+            row = {key: value for key, value in row.items() if key not in HYBRID_ONLY_COLUMNS}
+        hits[i].append(row)
+    for i, found in hits.items():
+        if found or not exact:
+            results[i] = found
+
+
+def _short_filtered(
+    plans: List[SearchPlan], results: List[Optional[list]], members: List[int]
+) -> List[int]:
+    """Filtered searches whose ANN scan came back short; they get a (gated) exact retry."""
+    return [i for i in members if plans[i].filtered and len(results[i]) < plans[i].limit]
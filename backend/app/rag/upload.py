@@ -0,0 +1,222 @@
+import asyncio
+import codecs
+import hashlib
+import json
+from dataclasses import asdict, dataclass
+from itertools import chain
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from psycopg.types.json import Jsonb
+
+from app.api.schemas import DocumentInput
+from app.core.config import get_settings
+from app.core.db import adb_fetchall
+from app.rag.cache import invalidate_results
+from app.rag.chunker import TokenChunker, markdown_heading
+
+
+FORMATS = ("text", "markdown", "ndjson")
+CONTENT_TYPES = {
+    "text/markdown": "markdown",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+# Chunks left over from a longer previous version of a parent are deleted in batches.
+PRUNE_BATCH = 500
+
+PRUNE_SQL = """
+delete from documents d
+using jsonb_to_recordset(%s) as p(parent text, chunks int)
+where d.metadata @> jsonb_build_object('parent', p.parent)
+  and (d.metadata->>'chunk')::int >= p.chunks
+returning d.id
+"""
+
+
+@dataclass
+class UploadStats:
+    parents: int = 0
+    chunks: int = 0
+    pruned: int = 0
+
+
+def format_for(content_type: Optional[str]) -> str:
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return CONTENT_TYPES.get(media_type, "text")
+
+
+async def iter_lines(
+    stream: AsyncIterator[bytes], max_line_chars: int, split_long: bool = True
+) -> AsyncIterator[str]:
+    """Decode a byte stream into lines (newline kept), holding at most one line in memory.
+
+    With ``split_long`` lines longer than ``max_line_chars`` are cut at the last whitespace
+    so plain text without newlines still streams; otherwise (NDJSON) they are rejected.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buffer = ""
+    async for data in stream:
+        buffer += decoder.decode(data)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line + "\n"
+        while len(buffer) > max_line_chars:
+            cut = max(buffer.rfind(" ", 0, max_line_chars), buffer.rfind("\t", 0, max_line_chars))
+            if not split_long or cut <= 0:
+                raise ValueError(f"Line longer than {max_line_chars} characters")
+            yield buffer[: cut + 1]
+            buffer = buffer[cut + 1:]
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+
+class UploadChunker:
+    """Turn an uploaded stream into chunk ``DocumentInput``s linked to their parent.
+
+    Chunk keys are ``<parent>#<n>`` and chunk metadata carries ``parent`` and ``chunk``
+    (plus ``section`` for markdown), so re-uploading a parent upserts its chunks in place.
+    """
+
+    def __init__(
+        self,
+        fmt: str,
+        key: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        chunk_tokens: Optional[int] = None,
+        overlap_tokens: Optional[int] = None,
+    ) -> None:
+        settings = get_settings()
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown upload format: {fmt}")
+        if fmt != "ndjson" and not key:
+            raise ValueError("key is required for text and markdown uploads")
+        self.format = fmt
+        self.key = key
+        self.metadata = metadata or {}
+        self.chunk_tokens = chunk_tokens or settings.chunk_tokens
+        self.overlap_tokens = (
+            settings.chunk_overlap_tokens if overlap_tokens is None else overlap_tokens
+        )
+        # Validates the sizes before any of the body is read.
+        TokenChunker(self.chunk_tokens, self.overlap_tokens)
+        self.max_line_chars = settings.upload_max_line_chars
+        self.stats = UploadStats()
+        self._finished: List[Dict[str, Any]] = []
+
+    async def documents(self, stream: AsyncIterator[bytes]) -> AsyncIterator[DocumentInput]:
+        ndjson = self.format == "ndjson"
+        lines = iter_lines(stream, self.max_line_chars, split_long=not ndjson)
+        if ndjson:
+            chunks = self._ndjson_chunks(lines)
+        else:
+            chunks = self._text_chunks(lines)
+        async for document in chunks:
+            self.stats.chunks += 1
+            yield document
+            if len(self._finished) >= PRUNE_BATCH:
+                await self.prune()
+        await self.prune()
+
+    async def prune(self) -> None:
+        finished, self._finished = self._finished, []
+        if finished:
+            deleted = await adb_fetchall(PRUNE_SQL, (Jsonb(finished),))
+            if deleted:
+                self.stats.pruned += len(deleted)
+                invalidate_results()
+
+    async def _text_chunks(self, lines: AsyncIterator[str]) -> AsyncIterator[DocumentInput]:
+        chunker = TokenChunker(self.chunk_tokens, self.overlap_tokens)
+        number = 0
+        section: Optional[str] = None
+        async for line in lines:
+            heading = markdown_heading(line) if self.format == "markdown" else None
+            if heading is not None:
+                # Start a fresh chunk per section so a chunk never straddles two headings.
+                for text in chunker.flush():
+                    yield self._chunk(self.key, number, text, self.metadata, section)
+                    number += 1
+                section = heading
+            for text in chunker.feed(line):
+                yield self._chunk(self.key, number, text, self.metadata, section)
+                number += 1
+        for text in chunker.flush():
+            yield self._chunk(self.key, number, text, self.metadata, section)
+            number += 1
+        self._finish(self.key, number)
+
+    async def _ndjson_chunks(self, lines: AsyncIterator[str]) -> AsyncIterator[DocumentInput]:
+        line_number = 0
+        async for line in lines:
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise ValueError(f"Invalid JSON on line {line_number}: {exc.msg}") from exc
+            content = record.get("content") if isinstance(record, dict) else None
+            if not isinstance(content, str) or not content.strip():
+                raise ValueError(f"Line {line_number}: 'content' must be a non-empty string")
+            parent = record.get("key") or (
+                "sha256:" + hashlib.sha256(content.encode()).hexdigest()
+            )
+            metadata = {**self.metadata, **(record.get("metadata") or {})}
+            chunker = TokenChunker(self.chunk_tokens, self.overlap_tokens)
+            number = 0
+            for text in chain(chunker.feed(content), chunker.flush()):
+                yield self._chunk(parent, number, text, metadata, None)
+                number += 1
+            self._finish(parent, number)
+
+    def _chunk(
+        self,
+        parent: str,
+        number: int,
+        text: str,
+        metadata: Dict[str, Any],
+        section: Optional[str],
+    ) -> DocumentInput:
+        chunk_metadata = {**metadata, "parent": parent, "chunk": number}
+        if section is not None:
+            chunk_metadata["section"] = section
+        return DocumentInput(key=f"{parent}#{number}", content=text, metadata=chunk_metadata)
+
+    def _finish(self, parent: str, chunks: int) -> None:
+        self.stats.parents += 1
+        self._finished.append({"parent": parent, "chunks": chunks})
+
+
+def iterate_in_thread(
+    agen: AsyncIterator[DocumentInput], loop: asyncio.AbstractEventLoop
+) -> Iterator[DocumentInput]:
+    """Pull items from an async generator running on ``loop`` from a worker thread.
+
+    One item is requested at a time, so the reader never runs ahead of the ingestor.
+    """
+    while True:
+        future = asyncio.run_coroutine_threadsafe(agen.__anext__(), loop)
+        try:
+            yield future.result()
+        except StopAsyncIteration:
+            return
+
+
+async def ingest_upload(
+    retriever: Any,
+    stream: AsyncIterator[bytes],
+    chunker: UploadChunker,
+    batch_size: Optional[int] = None,
+) -> dict:
+    """Chunk ``stream`` as it arrives and index it in bounded batches."""
+    loop = asyncio.get_running_loop()
+    documents = chunker.documents(stream)
+    try:
+        report = await asyncio.to_thread(
+            retriever.index_documents, iterate_in_thread(documents, loop), batch_size
+        )
+    finally:
+        await documents.aclose()
+    return {**report.as_dict(), **asdict(chunker.stats)}
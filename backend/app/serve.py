@@ -0,0 +1,128 @@
+"""Run the API, with several workers sharing one embedding process.
+
+    cd backend
+    python -m app.serve --workers 4 --port 8000
+
+With one worker this is plain uvicorn. With more, it first starts
+``python -m app.embeddings.remote serve`` (the only process that loads the embedding
+model), waits until it answers on its Unix socket, then runs uvicorn with ``--workers``
+API processes that embed through it (``EMBEDDINGS_SOCKET``). The embedding process is
+restarted if it dies, and stopped when uvicorn exits.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import uvicorn
+
+from app.core.config import get_settings
+
+
+RESTART_DELAY_SECONDS = 1.0
+
+
+class EmbeddingProcess:
+    """Keep ``python -m app.embeddings.remote serve`` running until ``stop``."""
+
+    def __init__(self, socket_path: str) -> None:
+        self.socket_path = socket_path
+        self.restarts = 0
+        self._process: Optional[subprocess.Popen] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+
+    def start(self, ready_timeout: float) -> None:
+        self._spawn()
+        self._wait_ready(ready_timeout)
+        self._watcher = threading.Thread(target=self._watch, name="embedder-watch", daemon=True)
+        self._watcher.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        with self._lock:  # no respawn can start once this is set
+            self._stopping.set()
+            process = self._process
+        if process is not None and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def _spawn(self) -> None:
+        # The embedding process loads the model itself, so it must not be pointed at a socket.
+        env = {**os.environ, "EMBEDDINGS_SOCKET": ""}
+        command = [sys.executable, "-m", "app.embeddings.remote", "serve"]
+        self._process = subprocess.Popen([*command, "--socket", self.socket_path], env=env)
+
+    def _wait_ready(self, timeout: float) -> None:
+        from app.embeddings.remote import RemoteEncoder, RemoteEncoderError
+
+        deadline = time.monotonic() + timeout
+        while True:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"embedding process exited with {self._process.returncode}")
+            try:
+                RemoteEncoder(self.socket_path, connect_timeout=0)
+                return
+            except RemoteEncoderError:
+                if time.monotonic() >= deadline:
+                    self.stop()
+                    raise RuntimeError(f"embedding process not ready after {timeout}s")
+                time.sleep(0.5)
+
+    def _watch(self) -> None:
+        while not self._stopping.is_set():
+            code = self._process.wait()
+            if self._stopping.is_set():
+                return
+            print(f"embedding process exited with {code}; restarting", file=sys.stderr)
+            self.restarts += 1
+            if self._stopping.wait(RESTART_DELAY_SECONDS):
+                return
+            with self._lock:
+                if self._stopping.is_set():
+                    return
+                self._spawn()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument(
+        "--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", 1))
+    )
+    parser.add_argument(
+        "--socket",
+        default=settings.embeddings_socket
+        or str(Path(tempfile.gettempdir()) / f"ai-rag-embeddings-{os.getpid()}.sock"),
+    )
+    parser.add_argument("--ready-timeout", type=float, default=300.0)
+    args = parser.parse_args(argv)
+
+    if args.workers <= 1:
+        uvicorn.run("app.main:app", host=args.host, port=args.port)
+        return
+
+    embedder = EmbeddingProcess(args.socket)
+    embedder.start(args.ready_timeout)
+    # Inherited by the worker processes uvicorn spawns.
+    os.environ["EMBEDDINGS_SOCKET"] = args.socket
+    try:
+        uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        embedder.stop()
+
+
+if __name__ == "__main__":
+    main()
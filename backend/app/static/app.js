@@ -110,7 +110,7 @@ async function loadDemoData() {
         const result = await indexRes.json();
         
         const statusEl = document.getElementById('indexStatus');
-        statusEl.textContent = `✅ Loaded ${result.indexed} demo documents! Try searching or chatting.`;
+        statusEl.textContent = `✅ Loaded demo documents (${result.inserted} new, ${result.updated} updated, ${result.skipped} unchanged). Try searching or chatting.`;
         statusEl.className = 'success';
     } catch (error) {
         const statusEl = document.getElementById('indexStatus');
@@ -146,7 +146,9 @@ async function indexDocument() {
 
         if (!response.ok) throw new Error('Failed to index');
         const data = await response.json();
-        statusEl.textContent = `✅ Indexed ${data.indexed} document(s)`;
+        statusEl.textContent = data.skipped
+            ? '✅ Already indexed, nothing changed'
+            : `✅ Indexed ${data.indexed} document(s)`;
         statusEl.className = 'success';
         document.getElementById('docContent').value = '';
     } catch (error) {
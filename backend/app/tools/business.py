@@ -1,15 +1,16 @@
 from typing import Any, Dict
 
-from app.core.db import db_execute, db_fetchone
+from app.core.db import db_fetchone
+from app.core.writer import BufferFullError, get_writer
 
 
 def log_event(args: Dict[str, Any]) -> Dict[str, Any]:
     event_type = args.get("event_type", "generic")
     payload = args.get("payload") or {}
-    db_execute(
-        "insert into events (event_type, payload) values (%s, %s)",
-        (event_type, payload),
-    )
+    try:
+        get_writer().write("events", (event_type, payload))
+    except BufferFullError as exc:
+        return {"error": str(exc)}
     return {"status": "logged", "event_type": event_type}
 
 
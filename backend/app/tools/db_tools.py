@@ -1,9 +1,11 @@
 from typing import Any, Dict
 
-from pgvector.psycopg import to_db
-
-from app.core.db import db_execute, db_fetchall, db_fetchone
+from app.api.schemas import SEARCH_MAX_TOP_K, DocumentInput
+from app.core.db import db_fetchone
 from app.embeddings.encoder import get_encoder
+from app.embeddings.scheduler import get_scheduler
+from app.rag.ingest import BulkIngestor
+from app.rag.retriever import Retriever
 
 
 def save_document(args: Dict[str, Any]) -> Dict[str, Any]:
@@ -11,28 +13,55 @@ def save_document(args: Dict[str, Any]) -> Dict[str, Any]:
     metadata = args.get("metadata") or {}
     if not content:
         return {"error": "content is required"}
-    encoder = get_encoder()
-    vector = encoder.embed(content)
-    db_execute(
-        "insert into documents (content, metadata, embedding) values (%s, %s, %s)",
-        (content, metadata, to_db(vector)),
-    )
-    return {"status": "saved"}
+    document = DocumentInput(key=args.get("key"), content=content, metadata=metadata)
+    report = BulkIngestor(get_encoder()).ingest([document])
+    return {"status": "saved" if report.indexed else "unchanged"}
 
 
 def search_documents(args: Dict[str, Any]) -> Dict[str, Any]:
+    if args.get("queries") is not None:
+        return _search_documents_batch(args)
     query = args.get("query", "")
-    top_k = int(args.get("top_k") or 4)
-    encoder = get_encoder()
-    vector = encoder.embed(query)
-    rows = db_fetchall(
-        "select id, content, metadata, 1 - (embedding <=> %s) as score "
-        "from documents order by embedding <=> %s limit %s",
-        (to_db(vector), to_db(vector), top_k),
-    )
+    mode = args.get("mode")
+    filters = args.get("filters")
+    profile = args.get("profile")
+    try:
+        rows = Retriever(get_scheduler()).search(
+            query, top_k=_top_k(args.get("top_k")), mode=mode, filters=filters, profile=profile
+        )
+    except ValueError as exc:
+        return {"error": str(exc)}
     return {"results": rows}
 
 
+def _search_documents_batch(args: Dict[str, Any]) -> Dict[str, Any]:
+    """``queries`` mode: a list of query strings or objects, results keyed by id/query."""
+    queries = []
+    for item in args["queries"]:
+        query = {"query": item} if isinstance(item, str) else dict(item)
+        if not query.get("query"):
+            return {"error": "every query needs a query string"}
+        query.setdefault("top_k", args.get("top_k") or 4)
+        for option in ("mode", "filters", "profile"):
+            query.setdefault(option, args.get(option))
+        queries.append(query)
+    keys = [query.pop("id", None) or query["query"] for query in queries]
+    if len(set(keys)) != len(keys):
+        return {"error": "query ids must be unique"}
+    try:
+        for query in queries:
+            query["top_k"] = _top_k(query["top_k"])
+        results = Retriever(get_scheduler()).search_batch(queries)
+    except ValueError as exc:
+        return {"error": str(exc)}
+    return {"results": dict(zip(keys, results))}
+
+
+def _top_k(value: Any) -> int:
+    """The caller's (or model's) ``top_k``, held to the API's limits."""
+    return min(max(int(value or 4), 1), SEARCH_MAX_TOP_K)
+
+
 def get_user(args: Dict[str, Any]) -> Dict[str, Any]:
     user_id = args.get("user_id")
     if not user_id:
@@ -1,6 +1,17 @@
-from dataclasses import dataclass
-from typing import Any, Callable, Dict, List
+import asyncio
+import contextvars
+import inspect
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence
 
+from app.agent.prompting import tools_json
+from app.core.config import get_settings
+from app.core.metrics import metrics, percentile, timed
 from app.tools.db_tools import get_user, save_document, search_documents
 from app.tools.business import create_ticket, log_event
 
@@ -10,15 +21,64 @@ class Tool:
     name: str
     description: str
     args_schema: Dict[str, Any]
-    handler: Callable[[Dict[str, Any]], Dict[str, Any]]
+    # Sync handlers run on the registry's thread pool; ``async def`` handlers on the loop.
+    handler: Callable[[Dict[str, Any]], Any]
+    # Overrides TOOL_TIMEOUT_SECONDS for this tool.
+    timeout_seconds: Optional[float] = None
+
+
+class ToolTimeoutError(TimeoutError):
+    """Raised by ``aexecute`` when a tool does not finish within its timeout."""
+
+
+# Latency percentiles are computed over each tool's most recent calls.
+LATENCY_WINDOW = 512
+
+
+@dataclass
+class ToolStats:
+    calls: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    total_seconds: float = 0.0
+    recent: Deque[float] = field(default_factory=lambda: deque(maxlen=LATENCY_WINDOW))
+
+    def as_dict(self) -> dict:
+        recent = sorted(self.recent)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "mean_ms": round(self.total_seconds / self.calls * 1000, 3) if self.calls else 0.0,
+            "p50_ms": round(percentile(recent, 50) * 1000, 3),
+            "p95_ms": round(percentile(recent, 95) * 1000, 3),
+        }
 
 
 class ToolRegistry:
-    def __init__(self) -> None:
+    """Named tools, run one at a time (``execute``/``aexecute``) or concurrently.
+
+    Sync handlers share a bounded thread pool, so a burst of tool calls cannot take over
+    the event loop's default executor. A timed-out call is abandoned: if it has not
+    started it never will, but a handler already running in a thread finishes in the
+    background (it is counted under ``calls``, the caller's wait under ``timeouts``).
+    """
+
+    def __init__(
+        self, max_workers: Optional[int] = None, timeout_seconds: Optional[float] = None
+    ) -> None:
+        settings = get_settings()
         self._tools: Dict[str, Tool] = {}
+        self.max_workers = max_workers or settings.tool_max_workers
+        self.timeout_seconds = timeout_seconds or settings.tool_timeout_seconds
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._prompt_json: Optional[str] = None
+        self._stats: Dict[str, ToolStats] = {}
+        self._lock = threading.Lock()
 
     def register(self, tool: Tool) -> None:
         self._tools[tool.name] = tool
+        self._prompt_json = None
 
     def list_for_prompt(self) -> List[Dict[str, Any]]:
         return [
@@ -30,10 +90,117 @@ class ToolRegistry:
             for tool in self._tools.values()
         ]
 
+    def prompt_json(self) -> str:
+        """``list_for_prompt`` serialized once (until the next ``register``)."""
+        if self._prompt_json is None:
+            self._prompt_json = tools_json(self.list_for_prompt())
+        return self._prompt_json
+
     def execute(self, name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        tool = self._get(name)
+        started = time.perf_counter()
+        try:
+            with timed("tool_execute_seconds", breakdown=f"tool.{name}", tool=name):
+                result = tool.handler(args)
+                if inspect.isawaitable(result):
+                    result = asyncio.run(result)
+        except Exception:
+            self._record(name, time.perf_counter() - started, failed=True)
+            raise
+        self._record(name, time.perf_counter() - started, failed=False)
+        return result
+
+    async def aexecute(
+        self, name: str, args: Dict[str, Any], timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        tool = self._get(name)
+        timeout = timeout or tool.timeout_seconds or self.timeout_seconds
+        if inspect.iscoroutinefunction(tool.handler):
+            call = self._acall(tool, args)
+        else:
+            # Like asyncio.to_thread, carry the context along (per-request timings).
+            context = contextvars.copy_context()
+            call = asyncio.get_running_loop().run_in_executor(
+                self._pool(), context.run, self.execute, name, args
+            )
+        try:
+            return await asyncio.wait_for(call, timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._stats.setdefault(name, ToolStats()).timeouts += 1
+            metrics.inc("tool_timeouts_total", help_text="Tool calls abandoned", tool=name)
+            raise ToolTimeoutError(f"Tool {name} timed out after {timeout:g}s") from None
+
+    async def aexecute_many(
+        self, calls: Sequence[Dict[str, Any]], timeout: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """Run ``{"tool_name", "tool_args"}`` calls concurrently; results keep their order.
+
+        One failing call does not affect the others: it gets ``{"error": ...}`` instead of
+        ``{"result": ...}``.
+        """
+        outcomes = await asyncio.gather(
+            *(
+                self.aexecute(call["tool_name"], call.get("tool_args") or {}, timeout)
+                for call in calls
+            ),
+            return_exceptions=True,
+        )
+        results = []
+        for call, outcome in zip(calls, outcomes):
+            if isinstance(outcome, asyncio.CancelledError):
+                raise outcome
+            if isinstance(outcome, BaseException):
+                results.append({"tool_name": call["tool_name"], "error": str(outcome)})
+            else:
+                results.append({"tool_name": call["tool_name"], "result": outcome})
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "timeout_seconds": self.timeout_seconds,
+                "tools": {name: stats.as_dict() for name, stats in self._stats.items()},
+            }
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _get(self, name: str) -> Tool:
         if name not in self._tools:
             raise ValueError(f"Unknown tool: {name}")
-        return self._tools[name].handler(args)
+        return self._tools[name]
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="tool"
+                )
+            return self._executor
+
+    async def _acall(self, tool: Tool, args: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            with timed("tool_execute_seconds", breakdown=f"tool.{tool.name}", tool=tool.name):
+                result = await tool.handler(args)
+        except Exception:
+            # A cancelled (timed-out) call is not an Exception; aexecute counts it.
+            self._record(tool.name, time.perf_counter() - started, failed=True)
+            raise
+        self._record(tool.name, time.perf_counter() - started, failed=False)
+        return result
+
+    def _record(self, name: str, seconds: float, failed: bool) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(name, ToolStats())
+            stats.calls += 1
+            stats.errors += failed
+            stats.total_seconds += seconds
+            stats.recent.append(seconds)
 
 
 def build_registry() -> ToolRegistry:
@@ -42,15 +209,24 @@ def build_registry() -> ToolRegistry:
         Tool(
             name="save_document",
             description="Save a document to the knowledge base",
-            args_schema={"content": "string", "metadata": "object"},
+            args_schema={"content": "string", "metadata": "object", "key": "string"},
             handler=save_document,
         )
     )
     registry.register(
         Tool(
             name="search_documents",
-            description="Search the knowledge base using a query",
-            args_schema={"query": "string", "top_k": "number"},
+            description=(
+                "Search the knowledge base using a query, or several at once with queries"
+            ),
+            args_schema={
+                "query": "string",
+                "queries": "array of strings or {id, query, top_k, mode, filters, profile}",
+                "top_k": "number (1-100)",
+                "mode": "vector|hybrid",
+                "filters": "object (metadata key -> value | {in: [...]} | {exists: bool})",
+                "profile": "fast|balanced|accurate",
+            },
             handler=search_documents,
         )
     )
@@ -81,5 +257,6 @@ def build_registry() -> ToolRegistry:
     return registry
 
 
+@lru_cache(maxsize=1)
 def get_tool_registry() -> ToolRegistry:
     return build_registry()
@@ -0,0 +1,65 @@
+"""Compare two ``bench.run`` result files and flag latency/throughput regressions.
+
+    python -m bench.compare bench/results/base.json bench/results/head.json --threshold 10
+
+Exits with status 1 when any p95 grows, or throughput drops, by more than ``--threshold``
+percent, so it can gate CI.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Optional
+
+
+def _load(path: Path) -> tuple[dict, dict]:
+    report = json.loads(path.read_text())
+    rows = {
+        (row["scenario"], row["corpus_size"], row["concurrency"]): row
+        for row in report["results"]
+    }
+    return report["meta"], rows
+
+
+def _change(base: float, head: float) -> float:
+    return (head - base) / base * 100 if base else 0.0
+
+
+def compare(base_path: Path, head_path: Path, threshold: float) -> int:
+    base_meta, base_rows = _load(base_path)
+    head_meta, head_rows = _load(head_path)
+    print(f"base {base_meta.get('commit')}  head {head_meta.get('commit')}")
+    print(
+        f"{'scenario':<12} {'corpus':>7} {'c':>4} "
+        f"{'p50 ms':>18} {'p95 ms':>18} {'p99 ms':>18} {'req/s':>18}"
+    )
+    regressions = 0
+    for key in sorted(base_rows.keys() & head_rows.keys()):
+        base, head = base_rows[key], head_rows[key]
+        cells = []
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+            delta = _change(base[metric], head[metric])
+            cells.append(f"{head[metric]:>9.2f} ({delta:+6.1f}%)")
+        p95_worse = _change(base["p95_ms"], head["p95_ms"]) > threshold
+        rps_worse = -_change(base["throughput_rps"], head["throughput_rps"]) > threshold
+        flag = "  REGRESSION" if p95_worse or rps_worse else ""
+        regressions += bool(flag)
+        scenario, corpus_size, concurrency = key
+        print(f"{scenario:<12} {corpus_size:>7} {concurrency:>4} {' '.join(cells)}{flag}")
+    missing = base_rows.keys() ^ head_rows.keys()
+    if missing:
+        print(f"{len(missing)} measurement(s) only present in one file were skipped")
+    return 1 if regressions else 0
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base", type=Path)
+    parser.add_argument("head", type=Path)
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent")
+    args = parser.parse_args(argv)
+    sys.exit(compare(args.base, args.head, args.threshold))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Measure LLM dispatch (retries, failover, hedging) against local HTTP stand-ins.
+
+    cd backend
+    python -m bench.llm_dispatch --requests 400 --concurrency 16 --slow-rate 0.05
+
+Two stand-in providers are started: an HF-style primary where a ``--slow-rate`` share of
+requests take ``--slow-ms`` and a ``--fail-rate`` share return 503, and a healthy
+Ollama-style secondary. The same load runs through ``LLMDispatcher`` once per strategy
+(``single`` is the old behaviour: one provider, one attempt) and the report lists latency
+percentiles, errors and per-provider stats. No database, network or API token is needed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from bench.run import summarize
+from bench.standins import StandinLLMServer
+
+
+STRATEGIES = ("single", "retry", "failover", "hedged")
+
+
+def strategy_settings(strategy: str, primary: str, secondary: str, args: argparse.Namespace):
+    from app.core.config import Settings
+
+    providers = f"hf={primary}"
+    if strategy in ("failover", "hedged"):
+        providers += f",ollama={secondary}"
+    return Settings(
+        DATABASE_URL=os.environ.get("DATABASE_URL", "postgresql://unused"),
+        LLM_PROVIDERS=providers,
+        LLM_RETRIES=0 if strategy == "single" else args.retries,
+        LLM_RETRY_BACKOFF_MS=args.backoff_ms,
+        LLM_ATTEMPT_TIMEOUT_SECONDS=args.attempt_timeout,
+        LLM_TIMEOUT_SECONDS=args.timeout,
+        LLM_HEDGE=strategy == "hedged",
+        LLM_HEDGE_MIN_MS=args.hedge_min_ms,
+        LLM_PROVIDER_MAX_CONCURRENCY=args.provider_concurrency,
+        LLM_BREAKER_FAILURES=args.breaker_failures,
+    )
+
+
+async def run_strategy(settings, args: argparse.Namespace) -> dict:
+    from app.agent.dispatch import LLMDispatcher
+
+    dispatcher = LLMDispatcher.from_settings(settings)
+    latencies: list[float] = []
+    errors = 0
+    slots = asyncio.Semaphore(args.concurrency)
+
+    async def one(client: httpx.AsyncClient, index: int) -> None:
+        nonlocal errors
+        async with slots:
+            started = time.perf_counter()
+            try:
+                if args.stream:
+                    async for _ in dispatcher.astream(client, f"prompt {index}", 64, 0.2):
+                        pass
+                else:
+                    await dispatcher.agenerate(client, f"prompt {index}", 64, 0.2)
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(client, index) for index in range(args.requests)))
+        elapsed = time.perf_counter() - started
+    return {**summarize(latencies, errors, elapsed), "dispatch": dispatcher.stats()}
+
+
+async def run_benchmarks(args: argparse.Namespace) -> list[dict]:
+    results = []
+    for strategy in args.strategies:
+        primary = StandinLLMServer(
+            latency_ms=args.latency_ms,
+            slow_ms=args.slow_ms,
+            slow_rate=args.slow_rate,
+            fail_rate=args.fail_rate,
+        )
+        secondary = StandinLLMServer(latency_ms=args.secondary_latency_ms)
+        with primary, secondary:
+            settings = strategy_settings(strategy, primary.url, secondary.url, args)
+            result = {"strategy": strategy, **await run_strategy(settings, args)}
+        results.append(result)
+        print(
+            f"{strategy:<9} p50={result['p50_ms']:>9.2f}ms p95={result['p95_ms']:>9.2f}ms "
+            f"p99={result['p99_ms']:>9.2f}ms max={result['max_ms']:>9.2f}ms "
+            f"errors={result['errors']}",
+            flush=True,
+        )
+    return results
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--strategies", type=lambda value: value.split(","), default=list(STRATEGIES)
+    )
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--stream", action="store_true", help="measure astream")
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--slow-ms", type=float, default=2000.0)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--fail-rate", type=float, default=0.05)
+    parser.add_argument("--secondary-latency-ms", type=float, default=150.0)
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--backoff-ms", type=float, default=50.0)
+    parser.add_argument("--attempt-timeout", type=float, default=5.0)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--hedge-min-ms", type=float, default=50.0)
+    parser.add_argument("--provider-concurrency", type=int, default=32)
+    parser.add_argument("--breaker-failures", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    results = asyncio.run(run_benchmarks(args))
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        report = {"args": vars(args), "results": results}
+        args.output.write_text(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Recall@k versus latency for each retrieval quantization, on the corpus already indexed.
+
+Ground truth is an exact (index-free) cosine scan. Build the quantized indexes first:
+
+    cd backend
+    python -m app.rag.index rebuild --quantization halfvec
+    python -m app.rag.index rebuild --quantization binary
+    python -m bench.recall --queries 200 --top-k 10 --rescore 1,4,8,16
+"""
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+from bench.run import git_revision, percentile
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(part) for part in value.split(",") if part]
+
+
+def sample_queries(count: int, words: int) -> list[str]:
+    from app.core.db import db_fetchall
+
+    rows = db_fetchall(
+        "select content from documents order by random() limit %s", (count,)
+    )
+    # A prefix of a stored document: close to it, but not an exact duplicate.
+    return [" ".join(row["content"].split()[:words]) for row in rows]
+
+
+def exact_neighbours(vector: list[float], top_k: int) -> list[str]:
+    from pgvector.psycopg import to_db
+
+    from app.core.db import db_fetchall
+    from app.rag.retriever import EXACT_SCAN_SETTINGS
+
+    rows = db_fetchall(
+        "select id from documents order by embedding <=> %s limit %s",
+        (to_db(vector), top_k),
+        EXACT_SCAN_SETTINGS,
+    )
+    return [row["id"] for row in rows]
+
+
+def evaluate(args: argparse.Namespace) -> dict:
+    from app.core.config import get_settings
+    from app.core.db import close_pool, init_pool
+    from app.embeddings.encoder import get_encoder
+    from app.rag.retriever import Retriever
+
+    settings = get_settings()
+    init_pool(settings.database_url, max_size=settings.db_pool_max_size)
+    try:
+        retriever = Retriever(get_encoder())
+        queries = sample_queries(args.queries, args.query_words)
+        vectors = [retriever.embed_query(query) for query in queries]
+        truth = [set(exact_neighbours(vector, args.top_k)) for vector in vectors]
+
+        results = []
+        for quantization in args.quantizations:
+            factors = [1] if quantization == "none" else args.rescore
+            for factor in factors:
+                retriever.settings = settings.model_copy(
+                    update={"rag_quantization": quantization, "rag_rescore_factor": factor}
+                )
+                latencies, hits = [], 0
+                for query, expected in zip(queries, truth):
+                    started = time.perf_counter()
+                    rows = retriever.search(
+                        query, top_k=args.top_k, mode="vector", profile=args.profile
+                    )
+                    latencies.append(time.perf_counter() - started)
+                    hits += len(expected & {row["id"] for row in rows})
+                latencies.sort()
+                total = sum(len(expected) for expected in truth)
+                row = {
+                    "quantization": quantization,
+                    "rescore_factor": factor,
+                    "recall_at_k": round(hits / total, 4) if total else 0.0,
+                    "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+                    "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+                }
+                results.append(row)
+                print(
+                    f"{quantization:<8} rescore={factor:<3} recall@{args.top_k}="
+                    f"{row['recall_at_k']:.4f} p50={row['p50_ms']:.2f}ms "
+                    f"p95={row['p95_ms']:.2f}ms",
+                    flush=True,
+                )
+    finally:
+        close_pool()
+    return {"queries": len(queries), "top_k": args.top_k, "results": results}
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-words", type=int, default=12)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument(
+        "--quantizations",
+        type=lambda value: value.split(","),
+        default=["none", "halfvec", "binary"],
+    )
+    parser.add_argument("--rescore", type=_int_list, default=[1, 4, 8, 16])
+    parser.add_argument("--profile", choices=("fast", "balanced", "accurate"))
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+
+    # Every query must reach the database, so keep the result cache out of the way.
+    os.environ["RESULT_CACHE_MAX_MB"] = "0"
+    report = {"meta": git_revision(), **evaluate(args)}
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
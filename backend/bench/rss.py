@@ -0,0 +1,101 @@
+"""Report memory per process for a running server (``python -m app.serve`` or uvicorn).
+
+    cd backend
+    python -m app.serve --workers 4 --port 8000 &
+    curl -s localhost:8000/api/health    # after warm-up
+    python -m bench.rss --pid $!
+
+Walks the process tree under ``--pid`` and reads ``/proc/<pid>/smaps_rollup`` (Linux).
+RSS counts shared pages in full for every process that maps them, so summing it
+overstates a multi-process server; PSS splits each shared page between its users and
+adds up to the real footprint, and USS is what a process would free if it exited.
+"""
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+FIELDS = {
+    "Rss": "rss_mb",
+    "Pss": "pss_mb",
+    "Private_Clean": "uss_mb",
+    "Private_Dirty": "uss_mb",
+}
+
+
+def parents() -> Dict[int, int]:
+    """pid -> parent pid for every process, from ``/proc/<pid>/stat``."""
+    found = {}
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except (FileNotFoundError, ProcessLookupError):  # exited meanwhile
+            continue
+        # The command name may contain spaces; fields after it are fixed.
+        found[int(entry.name)] = int(stat.rsplit(")", 1)[1].split()[1])
+    return found
+
+
+def process_tree(root: int) -> List[int]:
+    parent_of = parents()
+    pids, pending = [], [root]
+    while pending:
+        pid = pending.pop()
+        pids.append(pid)
+        pending.extend(child for child, parent in parent_of.items() if parent == pid)
+    return pids
+
+
+def role(command: str) -> str:
+    if "app.embeddings.remote" in command:
+        return "embedder"
+    if "resource_tracker" in command:
+        return "helper"
+    if "spawn_main" in command:
+        return "api worker"
+    return "supervisor"
+
+
+def memory(pid: int) -> Optional[Dict[str, object]]:
+    try:
+        rollup = Path(f"/proc/{pid}/smaps_rollup").read_text()
+        command = Path(f"/proc/{pid}/cmdline").read_bytes().replace(b"\0", b" ").decode()
+    except (FileNotFoundError, ProcessLookupError):
+        return None
+    usage: Dict[str, object] = {"pid": pid, "role": role(command)}
+    usage.update(rss_mb=0.0, pss_mb=0.0, uss_mb=0.0)
+    for line in rollup.splitlines():
+        name, _, value = line.partition(":")
+        if name in FIELDS:
+            usage[FIELDS[name]] += int(value.split()[0]) / 1024
+    for key in ("rss_mb", "pss_mb", "uss_mb"):
+        usage[key] = round(usage[key], 1)
+    usage["command"] = command.strip()[:120]
+    return usage
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pid", type=int, required=True, help="launcher or uvicorn pid")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    rows = [usage for pid in process_tree(args.pid) if (usage := memory(pid))]
+    totals = {key: round(sum(row[key] for row in rows), 1) for key in ("rss_mb", "pss_mb")}
+    if args.json:
+        print(json.dumps({"processes": rows, "total": totals}, indent=2))
+        return
+    print(f"{'pid':>8} {'role':<11} {'rss_mb':>9} {'pss_mb':>9} {'uss_mb':>9}")
+    for row in rows:
+        print(
+            f"{row['pid']:>8} {row['role']:<11} {row['rss_mb']:>9} {row['pss_mb']:>9} "
+            f"{row['uss_mb']:>9}"
+        )
+    print(f"{'total':>8} {'':<11} {totals['rss_mb']:>9} {totals['pss_mb']:>9}")
+
+
+if __name__ == "__main__":
+    main()
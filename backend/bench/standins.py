@@ -0,0 +1,192 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import AsyncIterator, Optional
+
+from app.agent.llm import LLMClient
+
+
+TOPICS = ("billing", "support", "pricing", "policies", "sla", "shipping", "security", "api")
+VOCABULARY = (
+    "account invoice refund payment plan upgrade downgrade subscription trial card paypal "
+    "wire transfer receipt order return warranty replacement shipping delivery tracking "
+    "carrier customs region latency uptime outage incident escalation ticket priority agent "
+    "hours weekend holiday email phone chat portal password login token key rotation "
+    "webhook integration export import report dashboard quota limit storage backup restore "
+    "migration region compliance audit encryption gdpr contract renewal discount enterprise"
+).split()
+
+
+class FakeLLMClient(LLMClient):
+    """LLM stand-in: answers after ``latency_ms`` and streams ``tokens`` evenly over it."""
+
+    def __init__(self, latency_ms: float = 300.0, tokens: int = 32) -> None:
+        super().__init__()
+        self.latency = latency_ms / 1000
+        self.tokens = max(1, tokens)
+
+    def generate(self, prompt: str, max_tokens: int = 512, temperature: float = 0.2) -> str:
+        with self._timed("generate"):
+            time.sleep(self.latency)
+        return self._answer(prompt)
+
+    async def agenerate(
+        self, prompt: str, max_tokens: int = 512, temperature: float = 0.2
+    ) -> str:
+        with self._timed("generate"):
+            await asyncio.sleep(self.latency)
+        return self._answer(prompt)
+
+    async def astream(
+        self, prompt: str, max_tokens: int = 512, temperature: float = 0.2
+    ) -> AsyncIterator[str]:
+        delay = self.latency / self.tokens
+        with self._timed("stream"):
+            for index in range(self.tokens):
+                await asyncio.sleep(delay)
+                yield f"tok{index} "
+
+    def _answer(self, prompt: str) -> str:
+        return " ".join(f"tok{index}" for index in range(self.tokens))
+
+
+class StandinLLMServer:
+    """Local HTTP stand-in for the HF (``/models/<model>``) and Ollama (``/api/generate``)
+    text-generation APIs, streaming included, for exercising ``LLMDispatcher``.
+
+    A request answers after ``latency_ms``, or ``slow_ms`` for a ``slow_rate`` share of
+    them (cold starts, stragglers), and a ``fail_rate`` share fails with ``fail_status``.
+    Use it as a context manager and point ``HF_BASE_URL``/``OLLAMA_BASE_URL`` (or an
+    ``LLM_PROVIDERS`` entry) at ``url``.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 100.0,
+        tokens: int = 16,
+        slow_ms: float = 0.0,
+        slow_rate: float = 0.0,
+        fail_rate: float = 0.0,
+        fail_status: int = 503,
+        seed: int = 3,
+    ) -> None:
+        self.latency = latency_ms / 1000
+        self.tokens = max(1, tokens)
+        self.slow = slow_ms / 1000
+        self.slow_rate = slow_rate
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        if self._server is None:
+            raise RuntimeError("Stand-in server is not running")
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "StandinLLMServer":
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _plan(self) -> tuple[float, bool]:
+        with self._lock:
+            self.requests += 1
+            slow = self._rng.random() < self.slow_rate
+            failed = self._rng.random() < self.fail_rate
+        return (self.slow if slow else self.latency), failed
+
+    def _handler(self) -> type:
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                try:
+                    self._respond()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client gave up, e.g. the losing side of a hedged request
+
+            def _respond(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                delay, failed = standin._plan()
+                ollama = self.path.startswith("/api/generate")
+                if not ollama and not self.path.startswith("/models/"):
+                    self.send_error(404)
+                    return
+                if failed:
+                    time.sleep(delay / 4)
+                    self.send_error(standin.fail_status)
+                    return
+                words = [f"tok{index}" for index in range(standin.tokens)]
+                if not body.get("stream"):
+                    time.sleep(delay)
+                    text = " ".join(words)
+                    data = {"response": text, "done": True} if ollama else [
+                        {"generated_text": text}
+                    ]
+                    self._send(json.dumps(data).encode())
+                    return
+                self.send_response(200)
+                self.end_headers()
+                for index, word in enumerate(words):
+                    time.sleep(delay / len(words))
+                    last = index == len(words) - 1
+                    if ollama:
+                        line = json.dumps({"response": f"{word} ", "done": last})
+                    else:
+                        event = {"token": {"text": f"{word} ", "special": False}}
+                        event["generated_text"] = " ".join(words) if last else None
+                        line = f"data: {json.dumps(event)}\n"
+                    self.wfile.write(f"{line}\n".encode())
+                    self.wfile.flush()
+
+            def _send(self, payload: bytes) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format: str, *args: object) -> None:
+                pass
+
+        return Handler
+
+
+def make_corpus(size: int, seed: int = 7, words: int = 40) -> list[dict]:
+    """Deterministic synthetic documents with a ``topic`` and ``doc`` metadata key."""
+    rng = random.Random(seed)
+    documents = []
+    for index in range(size):
+        topic = TOPICS[index % len(TOPICS)]
+        body = " ".join(rng.choice(VOCABULARY) for _ in range(words))
+        documents.append(
+            {
+                "key": f"bench/{index}",
+                "content": f"{topic} {body}",
+                "metadata": {"source": "bench", "topic": topic, "doc": index},
+            }
+        )
+    return documents
+
+
+def make_queries(count: int, seed: int = 11, words: int = 5) -> list[str]:
+    rng = random.Random(seed)
+    return [
+        " ".join([rng.choice(TOPICS)] + [rng.choice(VOCABULARY) for _ in range(words - 1)])
+        for _ in range(count)
+    ]
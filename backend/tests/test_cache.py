@@ -0,0 +1,54 @@
+import time
+
+from app.rag.cache import SemanticAnswerCache, TTLCache
+
+
+def test_lru_eviction_by_size() -> None:
+    cache = TTLCache("test", max_bytes=30, ttl_seconds=60, sizeof=lambda value: 10)
+    for key in "abc":
+        cache.set(key, key.upper())
+    cache.get("a")  # now the most recently used
+    cache.set("d", "D")
+
+    assert [cache.get(key) for key in "abcd"] == ["A", None, "C", "D"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire() -> None:
+    cache = TTLCache("test", max_bytes=1024, ttl_seconds=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_set_after_clear_is_dropped() -> None:
+    cache = TTLCache("test", max_bytes=1024, ttl_seconds=60)
+    generation = cache.generation
+    cache.clear()  # e.g. an ingest finished while the value was being read
+    cache.set("a", "stale", generation)
+    cache.set("b", "fresh", cache.generation)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == "fresh"
+    assert cache.stats()["stale_sets"] == 1
+
+
+def test_answer_needs_similar_question_and_same_sources() -> None:
+    cache = SemanticAnswerCache(max_entries=4, ttl_seconds=60, threshold=0.9)
+    cache.set("how do refunds work", [1.0, 0.0], [1, 2], "answer", 1.5)
+
+    assert cache.get([0.99, 0.14], [1, 2]).answer == "answer"
+    assert cache.get([0.99, 0.14], [1, 3]) is None
+    assert cache.get([0.0, 1.0], [1, 2]) is None
+
+
+def test_answer_generated_across_clear_is_dropped() -> None:
+    cache = SemanticAnswerCache(max_entries=4, ttl_seconds=60, threshold=0.9)
+    generation = cache.generation
+    cache.clear()
+    cache.set("question", [1.0, 0.0], [1], "stale", 1.0, generation)
+
+    assert cache.get([1.0, 0.0], [1]) is None
+    assert cache.stats()["stale_sets"] == 1
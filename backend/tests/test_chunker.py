@@ -0,0 +1,30 @@
+from app.rag.chunker import TokenChunker, count_tokens
+
+
+def chunk(chunker: TokenChunker, *parts: str) -> list[str]:
+    chunks = [text for part in parts for text in chunker.feed(part)]
+    return chunks + list(chunker.flush())
+
+
+def test_chunks_overlap() -> None:
+    words = [f"w{n}" for n in range(10)]
+    chunks = chunk(TokenChunker(4, 1), " ".join(words))
+
+    assert chunks == ["w0 w1 w2 w3", "w3 w4 w5 w6", "w6 w7 w8 w9"]
+
+
+def test_feeding_in_parts_matches_feeding_at_once() -> None:
+    text = "".join(f"line {n}, with punctuation.\n" for n in range(50))
+    lines = text.splitlines(keepends=True)
+
+    assert chunk(TokenChunker(20, 5), *lines) == chunk(TokenChunker(20, 5), text)
+
+
+def test_run_without_whitespace_is_split_between_tokens() -> None:
+    line = ",".join(f"field{n}" for n in range(3000))  # one CSV line, 5999 tokens
+    chunks = chunk(TokenChunker(200, 40), line)
+
+    assert max(count_tokens(text) for text in chunks) == 200
+    assert chunks[0].endswith("field99,")
+    assert chunks[1].startswith("field80,")  # the last 40 tokens of the first chunk
+    assert chunks[-1].endswith("field2999")
@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+import httpx
+
+from app.agent.dispatch import CircuitBreaker, LLMDispatcher, build_providers
+from app.core.config import Settings
+from bench.standins import StandinLLMServer
+
+
+def make_dispatcher(primary: str, secondary: str, **overrides: object) -> LLMDispatcher:
+    settings = Settings(
+        DATABASE_URL="postgresql://unused",
+        LLM_PROVIDERS=f"hf={primary},ollama={secondary}",
+        LLM_BREAKER_FAILURES=overrides.pop("breaker_failures", 5),
+    )
+    options = {"retries": 1, "backoff_ms": 1.0, "attempt_timeout_seconds": 5.0, **overrides}
+    return LLMDispatcher(build_providers(settings), **options)
+
+
+def generate(dispatcher: LLMDispatcher, calls: int = 1) -> str:
+    async def run() -> str:
+        async with httpx.AsyncClient() as client:
+            for _ in range(calls):
+                text = await dispatcher.agenerate(client, "prompt", 16, 0.2)
+        return text
+
+    return asyncio.run(run())
+
+
+def test_breaker_lets_one_probe_through_after_reset() -> None:
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.available()
+    assert breaker.allow()  # the probe
+    assert breaker.state == "half_open"
+    assert not breaker.allow() and not breaker.available()
+
+    breaker.release()  # the probe was cancelled: the next call may probe instead
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.opened == 2
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_retries_then_fails_over() -> None:
+    with StandinLLMServer(latency_ms=5, fail_rate=1.0) as primary, StandinLLMServer(
+        latency_ms=5
+    ) as secondary:
+        dispatcher = make_dispatcher(primary.url, secondary.url)
+        assert generate(dispatcher).startswith("tok0")
+
+    assert primary.requests == 2 and secondary.requests == 1
+    stats = dispatcher.stats()["providers"]
+    assert stats["hf"]["retries"] == 1 and stats["hf"]["failures"] == 2
+
+
+def test_request_fault_fails_over_without_tripping_the_breaker() -> None:
+    with StandinLLMServer(
+        latency_ms=5, fail_rate=1.0, fail_status=400
+    ) as primary, StandinLLMServer(latency_ms=5) as secondary:
+        dispatcher = make_dispatcher(primary.url, secondary.url, breaker_failures=1)
+        generate(dispatcher, calls=3)
+
+    assert primary.requests == 3  # not retried, and still in the rotation
+    assert dispatcher.providers[0].breaker.state == "closed"
+
+
+def test_open_breaker_skips_the_provider() -> None:
+    with StandinLLMServer(latency_ms=5, fail_rate=1.0) as primary, StandinLLMServer(
+        latency_ms=5
+    ) as secondary:
+        dispatcher = make_dispatcher(primary.url, secondary.url, retries=0, breaker_failures=1)
+        generate(dispatcher, calls=3)
+
+    assert primary.requests == 1 and secondary.requests == 3
+    assert dispatcher.stats()["providers"]["hf"]["breaker"] == "open"
+
+
+def test_slow_attempt_is_hedged_on_the_next_provider() -> None:
+    with StandinLLMServer(latency_ms=5) as primary, StandinLLMServer(
+        latency_ms=5
+    ) as secondary:
+        dispatcher = make_dispatcher(primary.url, secondary.url, hedge=True, hedge_min_ms=50)
+        generate(dispatcher, calls=20)  # enough samples to estimate the primary's tail
+        assert secondary.requests == 0
+
+        primary.latency = 2.0
+        started = time.perf_counter()
+        generate(dispatcher)
+        elapsed = time.perf_counter() - started
+
+    assert elapsed < 1.0
+    assert secondary.requests == 1
+    stats = dispatcher.stats()["providers"]["hf"]
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
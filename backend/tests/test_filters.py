@@ -0,0 +1,70 @@
+import pytest
+
+from app.api.schemas import DocumentInput
+from app.core.db import db_fetchall
+from app.embeddings.encoder import HashingEncoder
+from app.rag.filters import build_filter_clause, matches_filter
+from app.rag.ingest import BulkIngestor
+
+
+METADATA = [
+    {"category": "billing", "source": "kb"},
+    {"category": "billing", "source": "demo", "sku": "A-1"},
+    {"category": "shipping", "source": "kb"},
+]
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        {"category": "billing"},
+        {"category": {"eq": "shipping"}, "source": "kb"},
+        {"source": {"in": ["demo", "kb"]}},
+        {"sku": {"exists": True}},
+        {"sku": {"exists": False}, "category": "billing"},
+    ],
+)
+def test_filter_clause_matches_python_semantics(key_prefix: str, filters: dict) -> None:
+    BulkIngestor(HashingEncoder()).ingest(
+        DocumentInput(key=f"{key_prefix}{n}", content=f"doc {n}", metadata=metadata)
+        for n, metadata in enumerate(METADATA)
+    )
+    clause, params = build_filter_clause(filters)
+    rows = db_fetchall(
+        f"select doc_key from documents where doc_key like %s and {clause} order by doc_key",
+        (key_prefix + "%", *params),
+    )
+    expected = [
+        f"{key_prefix}{n}"
+        for n, metadata in enumerate(METADATA)
+        if matches_filter(metadata, filters)
+    ]
+    assert [row["doc_key"] for row in rows] == expected
+
+
+@pytest.mark.parametrize(
+    ("metadata", "filters", "expected"),
+    [
+        ({"tags": ["a", "b"]}, {"tags": "a"}, False),  # jsonb: a string is not an array
+        ({"tags": ["a", "b"]}, {"tags": ["b"]}, True),
+        ({"n": 1}, {"n": 1.0}, True),
+        ({"flag": True}, {"flag": 1}, False),
+        ({"owner": {"id": 7, "team": "x"}}, {"owner": {"eq": {"id": 7}}}, True),
+        ({"category": "billing"}, {"category": {"in": ["sla", "billing"]}}, True),
+        ({}, {"category": {"exists": False}}, True),
+        (None, {"category": "billing"}, False),
+    ],
+)
+def test_matches_filter_follows_jsonb_containment(
+    metadata: dict, filters: dict, expected: bool
+) -> None:
+    assert matches_filter(metadata, filters) is expected
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [{"category": {"in": []}}, {"category": {"gt": 1}}, {"category": {"eq": 1, "in": [1]}}],
+)
+def test_matches_filter_rejects_unsupported_conditions(filters: dict) -> None:
+    with pytest.raises(ValueError):
+        matches_filter({"category": 1}, filters)
@@ -0,0 +1,35 @@
+from app.api.schemas import DocumentInput
+from app.core.db import db_fetchall
+from app.embeddings.encoder import HashingEncoder
+from app.rag.ingest import BulkIngestor
+
+
+def stored(prefix: str) -> dict:
+    rows = db_fetchall(
+        "select doc_key, content, metadata from documents where doc_key like %s",
+        (prefix + "%",),
+    )
+    return {row["doc_key"]: row for row in rows}
+
+
+def test_upsert_inserts_updates_and_skips(key_prefix: str) -> None:
+    ingestor = BulkIngestor(HashingEncoder(), batch_size=2)
+    documents = [
+        DocumentInput(key=f"{key_prefix}{n}", content=f"document {n}", metadata={"n": n})
+        for n in range(3)
+    ]
+
+    first = ingestor.ingest(documents)
+    assert (first.inserted, first.updated, first.skipped) == (3, 0, 0)
+
+    documents[0] = DocumentInput(key=f"{key_prefix}0", content="changed", metadata={"n": 0})
+    documents[1] = DocumentInput(
+        key=f"{key_prefix}1", content="document 1", metadata={"n": 1, "tag": "new"}
+    )
+    second = ingestor.ingest(documents)
+    assert (second.inserted, second.updated, second.skipped) == (0, 2, 1)
+
+    rows = stored(key_prefix)
+    assert rows[f"{key_prefix}0"]["content"] == "changed"
+    assert rows[f"{key_prefix}1"]["metadata"] == {"n": 1, "tag": "new"}
+    assert rows[f"{key_prefix}2"]["content"] == "document 2"
@@ -0,0 +1,36 @@
+import time
+
+from app.core.db import db_execute, db_fetchone
+from app.embeddings.encoder import HashingEncoder
+from app.rag.jobs import IngestJobQueue
+
+
+def test_unfinished_job_runs_once_across_queues(key_prefix: str) -> None:
+    documents = [{"key": f"{key_prefix}{n}", "content": f"doc {n}"} for n in range(20)]
+    job = db_fetchone(
+        "insert into ingest_jobs (total, batch_size, documents) values (%s, 5, %s) returning id",
+        (len(documents), documents),
+    )
+    # Two API workers booting at once both find the job; only one may run it.
+    queues = [IngestJobQueue(HashingEncoder(), workers=2) for _ in range(2)]
+    try:
+        for queue in queues:
+            queue.start()
+        deadline = time.monotonic() + 30
+        while True:
+            row = db_fetchone(
+                "select status, processed, inserted, owner from ingest_jobs where id = %s",
+                (job["id"],),
+            )
+            if row["status"] not in ("queued", "running"):
+                break
+            assert time.monotonic() < deadline, row
+            time.sleep(0.1)
+    finally:
+        for queue in queues:
+            queue.stop()
+        db_execute("delete from ingest_jobs where id = %s", (job["id"],))
+
+    assert row["status"] == "succeeded"
+    assert (row["processed"], row["inserted"]) == (20, 20)
+    assert row["owner"] in {queue.owner for queue in queues}
@@ -0,0 +1,43 @@
+from app.agent.memory import SessionMemoryCache
+
+
+def messages(count: int) -> list[dict]:
+    """Rows as the database returns them: newest first."""
+    return [{"role": "user", "content": f"m{n}"} for n in reversed(range(count))]
+
+
+def test_filled_session_is_appended_and_read_newest_first() -> None:
+    cache = SessionMemoryCache(max_sessions=4, max_messages=3, ttl_seconds=60)
+    assert cache.get("s", 2) is None
+
+    cache.fill("s", messages(5))
+    cache.append("s", "assistant", "m5")
+
+    assert [m["content"] for m in cache.get("s", 3)] == ["m5", "m4", "m3"]
+    assert cache.get("s", 4) is None  # more than it keeps: read from the database
+
+
+def test_fill_read_before_a_write_is_dropped() -> None:
+    cache = SessionMemoryCache(max_sessions=4, max_messages=3, ttl_seconds=60)
+    since = cache.sequence()
+    cache.append("s", "user", "written meanwhile")  # uncached: only remembered as written
+    cache.fill("s", messages(1), since)
+    assert not cache.contains("s")
+
+    since = cache.sequence()
+    cache.discard(None)  # another worker's change, or a reconnect
+    cache.fill("s", messages(1), since)
+    assert not cache.contains("s")
+
+    cache.fill("s", messages(1), cache.sequence())
+    assert cache.contains("s")
+
+
+def test_discarded_and_least_recent_sessions_are_dropped() -> None:
+    cache = SessionMemoryCache(max_sessions=2, max_messages=3, ttl_seconds=60)
+    for session in "abc":
+        cache.fill(session, messages(1))
+    cache.discard(["c"])
+
+    assert [cache.contains(session) for session in "abc"] == [False, True, False]
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,27 @@
+from app.api.schemas import DocumentInput
+from app.embeddings.encoder import HashingEncoder
+from app.rag.retriever import Retriever
+
+
+def test_filter_matching_fewer_than_top_k_returns_every_match(key_prefix: str) -> None:
+    retriever = Retriever(HashingEncoder())
+    filters = {"run": key_prefix}
+    retriever.index_documents(
+        [
+            DocumentInput(
+                key=f"{key_prefix}{n}", content=f"refund policy {n}", metadata={**filters, "n": n}
+            )
+            for n in range(3)
+        ]
+    )
+
+    single = retriever.search("refund policy", top_k=5, filters=filters)
+    batch = retriever.search_batch(
+        [
+            {"query": "refund policy", "top_k": 5, "filters": filters},
+            {"query": "refund", "top_k": 5, "mode": "hybrid", "filters": filters},
+        ]
+    )
+
+    for rows in (single, *batch):
+        assert sorted(row["metadata"]["n"] for row in rows) == [0, 1, 2]
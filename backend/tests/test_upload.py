@@ -0,0 +1,39 @@
+import asyncio
+import json
+
+from app.api.schemas import DocumentInput
+from app.core.config import get_settings
+from app.core.db import close_async_pool, db_fetchall, init_async_pool
+from app.embeddings.encoder import HashingEncoder
+from app.rag.ingest import BulkIngestor
+from app.rag.upload import UploadChunker
+
+
+async def chunk_keys(chunker: UploadChunker, body: bytes) -> list[str]:
+    async def stream():
+        yield body
+
+    await init_async_pool(get_settings().database_url, max_size=2)
+    try:
+        return [document.key async for document in chunker.documents(stream())]
+    finally:
+        await close_async_pool()
+
+
+def test_reupload_prunes_stale_chunks(key_prefix: str) -> None:
+    parent = f"{key_prefix}manual"
+    BulkIngestor(HashingEncoder()).ingest(
+        DocumentInput(
+            key=f"{parent}#{n}", content=f"old chunk {n}", metadata={"parent": parent, "chunk": n}
+        )
+        for n in range(3)
+    )
+
+    chunker = UploadChunker("ndjson")
+    body = json.dumps({"key": parent, "content": "a single short chunk"}).encode() + b"\n"
+    keys = asyncio.run(chunk_keys(chunker, body))
+
+    assert keys == [f"{parent}#0"]
+    assert chunker.stats.pruned == 2
+    rows = db_fetchall("select doc_key from documents where doc_key like %s", (parent + "%",))
+    assert [row["doc_key"] for row in rows] == [f"{parent}#0"]
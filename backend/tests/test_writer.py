@@ -0,0 +1,34 @@
+import uuid
+
+import pytest
+
+from app.core.db import db_execute, db_fetchall, db_fetchone
+from app.core.writer import RowRejectedError, WriteBehindWriter
+
+
+def test_rejected_row_fails_alone(db: None) -> None:
+    session = db_fetchone("insert into agent_sessions (user_id) values ('test') returning id")
+    writer = WriteBehindWriter(ack="flush", batch_size=50, flush_ms=200)
+    try:
+        futures = [
+            writer.submit("agent_messages", (session["id"], "user", f"message {n}"))
+            for n in range(10)
+        ]
+        # Unknown session: a foreign key violation, in the middle of the same batch.
+        futures.insert(5, writer.submit("agent_messages", (str(uuid.uuid4()), "user", "lost")))
+        for n, future in enumerate(futures):
+            if n == 5:
+                with pytest.raises(RowRejectedError):
+                    future.result(10)
+            else:
+                future.result(10)
+
+        rows = db_fetchall(
+            "select content from agent_messages where session_id = %s order by created_at",
+            (session["id"],),
+        )
+        assert [row["content"] for row in rows] == [f"message {n}" for n in range(10)]
+        assert writer.stats()["failed_rows"] == 1
+    finally:
+        writer.close()
+        db_execute("delete from agent_sessions where id = %s", (session["id"],))
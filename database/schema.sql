@@ -19,6 +19,66 @@ create table if not exists documents (
     created_at timestamptz default now()
 );
 
+-- Upsert identity: caller-supplied key (or a content digest) plus a hash of the embedded
+-- text, so re-indexing skips unchanged documents. Rows from before this have a null key.
+alter table documents add column if not exists doc_key text;
+alter table documents add column if not exists content_hash text;
+
+create unique index if not exists documents_doc_key_idx
+    on documents (doc_key);
+
+-- Change feed for the in-process vector index (RETRIEVAL_BACKEND=local): rows changed
+-- since its watermark by updated_at, deletions from document_deletions. A null id
+-- records a TRUNCATE and makes the index rebuild.
+alter table documents add column if not exists updated_at timestamptz default now();
+
+create index if not exists documents_updated_at_idx
+    on documents (updated_at, id);
+
+create table if not exists document_deletions (
+    id uuid,
+    deleted_at timestamptz not null default now()
+);
+
+create index if not exists document_deletions_deleted_at_idx
+    on document_deletions (deleted_at);
+
+create or replace function log_document_deletion() returns trigger as $$
+begin
+    if tg_op = 'TRUNCATE' then
+        insert into document_deletions (id) values (null);
+        return null;
+    end if;
+    insert into document_deletions (id) values (old.id);
+    return old;
+end;
+$$ language plpgsql;
+
+drop trigger if exists documents_log_delete on documents;
+create trigger documents_log_delete
+    after delete on documents
+    for each row execute function log_document_deletion();
+
+drop trigger if exists documents_log_truncate on documents;
+create trigger documents_log_truncate
+    after truncate on documents
+    for each statement execute function log_document_deletion();
+
+-- Full-text column for hybrid (lexical + vector) retrieval. The 'simple' configuration
+-- keeps SKUs, error codes and plan names as-is instead of stemming them.
+alter table documents
+    add column if not exists content_tsv tsvector
+    generated always as (to_tsvector('simple', content)) stored;
+
+create index if not exists documents_content_tsv_idx
+    on documents
+    using gin (content_tsv);
+
+-- Metadata filter pushdown: jsonb_ops GIN serves both @> (equality / in) and ? (exists)
+create index if not exists documents_metadata_idx
+    on documents
+    using gin (metadata);
+
 -- Agent sessions and memory
 create table if not exists agent_sessions (
     id uuid primary key default gen_random_uuid(),
@@ -34,6 +94,28 @@ create table if not exists agent_messages (
     created_at timestamptz default now()
 );
 
+-- Chat memory reads the newest messages of one session; the same index serves the
+-- cascade when the retention job deletes sessions.
+create index if not exists agent_messages_session_created_idx
+    on agent_messages (session_id, created_at);
+
+create index if not exists agent_sessions_created_at_idx
+    on agent_sessions (created_at);
+
+-- Messages of sessions removed by the retention job (MEMORY_RETENTION_ARCHIVE=true)
+create table if not exists agent_messages_archive (
+    id uuid primary key,
+    session_id uuid not null,
+    user_id text,
+    role text not null,
+    content text not null,
+    created_at timestamptz,
+    archived_at timestamptz not null default now()
+);
+
+create index if not exists agent_messages_archive_session_idx
+    on agent_messages_archive (session_id, created_at);
+
 -- Business events
 create table if not exists events (
     id uuid primary key default gen_random_uuid(),
@@ -42,6 +124,32 @@ create table if not exists events (
     created_at timestamptz default now()
 );
 
+-- Background ingestion jobs. ``documents`` holds the payload until the job succeeds so
+-- queued and interrupted jobs are resumed after a restart.
+create table if not exists ingest_jobs (
+    id uuid primary key default gen_random_uuid(),
+    status text not null default 'queued',
+    total integer not null,
+    processed integer not null default 0,
+    inserted integer not null default 0,
+    updated integer not null default 0,
+    skipped integer not null default 0,
+    batch_size integer,
+    documents jsonb,
+    error text,
+    created_at timestamptz default now(),
+    started_at timestamptz,
+    finished_at timestamptz
+);
+
+-- The API worker running a job, and when it last renewed its lease.
+alter table ingest_jobs add column if not exists owner text;
+alter table ingest_jobs add column if not exists heartbeat_at timestamptz;
+
+create index if not exists ingest_jobs_unfinished_idx
+    on ingest_jobs (created_at)
+    where status in ('queued', 'running');
+
 -- Tickets (business example)
 create table if not exists tickets (
     id uuid primary key default gen_random_uuid(),
@@ -54,7 +162,10 @@ create table if not exists tickets (
 );
 
 -- Vector index
+-- HNSW builds a usable graph even on an empty table, unlike IVFFlat whose centroids are
+-- trained on the rows present at build time. To switch engines or resize IVFFlat lists
+-- after a large ingest, run `python -m app.rag.index rebuild` (or POST /api/admin/index/rebuild).
 create index if not exists documents_embedding_idx
     on documents
-    using ivfflat (embedding vector_cosine_ops)
-    with (lists = 100);
+    using hnsw (embedding vector_cosine_ops)
+    with (m = 16, ef_construction = 64);